@@ -1,28 +1,32 @@
 from dotenv import load_dotenv
+import asyncio
 import os
-from langchain_openai import AzureChatOpenAI
+from typing import Any, AsyncIterator, Dict, List
 from langchain_core.prompts import ChatPromptTemplate
 
 # Local imports
 from app.models import CodeAnalyzerState
+from app.services.analysis_cache import analysis_key, get_analysis_cache
+from app.services.clients import clients
+from app.services.code_chunker import CodeUnit, chunk_code
+from app.services.tokens import count_tokens
 
 load_dotenv()
 
-# --- Initialize Azure Services ---
-llm = AzureChatOpenAI(
-    api_version="2024-10-21",
-    azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-    api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-    azure_deployment=os.getenv("AZURE_OPENAI_DEPLOYMENT"),
-    temperature=0.0
-)
+# --- Configuration ---
+# Files up to this size are analyzed with a single prompt; larger ones are chunked (map-reduce)
+SINGLE_PASS_TOKENS = int(os.getenv("CODE_ANALYZER_SINGLE_PASS_TOKENS", "6000"))
+# Maximum number of units analyzed at the same time
+CONCURRENCY = int(os.getenv("CODE_ANALYZER_CONCURRENCY", "4"))
+# Bump when the prompts below change so cached analyses are recomputed
+PROMPT_VERSION = "1"
+MODEL = os.getenv("AZURE_OPENAI_DEPLOYMENT", "")
 
+# --- Initialize Azure Services ---
+llm = clients.chat_llm(temperature=0.0)
 
-def analyze_code(state: CodeAnalyzerState) -> CodeAnalyzerState:
-    """Analyzes the given code and generates a high-level explanation."""
-    print("---ANALYZING CODE---")
 
-    prompt = ChatPromptTemplate.from_template("""You are an expert software engineer specializing in code review and documentation.
+ANALYSIS_PROMPT = ChatPromptTemplate.from_template("""You are an expert software engineer specializing in code review and documentation.
     Analyze the following code and provide a clear, high-level explanation. Structure your response in Markdown format.
 
     Your analysis should include:
@@ -35,9 +39,237 @@ def analyze_code(state: CodeAnalyzerState) -> CodeAnalyzerState:
         {code}
     """)
 
-    # Invoke the LLM with the formatted prompt
-    response=llm.invoke(prompt.format(code=state.code_content))
+# Archive uploads: the static index and the top-ranked files stand in for the raw source
+REPO_ANALYSIS_PROMPT = ChatPromptTemplate.from_template("""You are an expert software engineer specializing in code review and documentation.
+    Analyze the repository described below and provide a clear, high-level explanation. Structure your response in Markdown format.
+    You are given a static index of the whole repository (files ranked by import/call centrality and
+    cyclomatic complexity, CC) and the source of its most important files.
+
+    Your analysis should include:
+    1.  **Purpose**: What is the primary goal of this repository?
+    2.  **Key Components**: Describe the main modules and how they depend on each other.
+    3.  **Logic Flow**: Explain how a typical request or run moves through the code.
+    4.  **Potential Improvements**: Suggest two or three areas for refactoring or improvement, such as complexity hotspots or tangled dependencies.
+
+    Repository index:
+    {index}
+
+    Most important files:
+    {hot_files}
+    """)
+
+# Map step: one prompt per code unit
+UNIT_PROMPT = ChatPromptTemplate.from_template("""You are an expert software engineer reviewing one part of a larger file.
+    File: {filename}
+    Outline of the whole file:
+    {outline}
+
+    Write concise notes (at most 150 words, Markdown bullets) on the {unit} below:
+    - What it is responsible for and how the rest of the file uses it
+    - Its inputs, outputs and side effects
+    - The important steps of its logic
+    - Any bug, risk or refactoring opportunity you notice
+
+    Here is the code:
+        {code}
+    """)
+
+# Reduce step: one prompt per report section, all built from the unit notes
+SECTIONS = [
+    ("Purpose", "In one or two short paragraphs, explain the primary goal of this code."),
+    ("Key Components", "Describe the main functions, classes, or variables as a Markdown list, one item per important component."),
+    ("Logic Flow", "Explain how the code executes from start to finish, following the calls between components."),
+    ("Potential Improvements", "Suggest the two or three most valuable areas for refactoring or improvement, citing the components involved."),
+]
+
+SECTION_PROMPT = ChatPromptTemplate.from_template("""You are an expert software engineer specializing in code review and documentation.
+    The file {filename} was analyzed part by part. Here are the notes for each part, in file order:
+
+    {notes}
+
+    Write only the **{section}** section of a report on the whole file. {instructions}
+    Use Markdown, do not repeat the section title and do not describe the parts one by one unless asked.
+    """)
+
+
+class CacheReport:
+    """Per-request tally of analysis cache hits and the tokens they saved."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.tokens_saved = 0
+        self.tokens_spent = 0
+
+    def hit(self, tokens: int) -> None:
+        self.hits += 1
+        self.tokens_saved += tokens
+
+    def miss(self, tokens: int) -> None:
+        self.misses += 1
+        self.tokens_spent += tokens
+
+    def as_dict(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "tokens_saved": self.tokens_saved, "tokens_spent": self.tokens_spent}
+
+
+def _prompt_key(kind: str, prompt: str) -> str:
+    return analysis_key(kind, prompt, PROMPT_VERSION, MODEL)
+
+
+def _outline(units: List[CodeUnit]) -> str:
+    return "\n".join(f"- {unit.label()}" for unit in units)
+
+
+def _unit_prompt(state: CodeAnalyzerState, unit: CodeUnit, outline: str) -> str:
+    return UNIT_PROMPT.format(filename=state.filename or "(unnamed)", outline=outline, unit=unit.label(),
+                              code=unit.source)
+
+
+def _section_prompts(state: CodeAnalyzerState, units: List[CodeUnit], notes: List[str]) -> List[str]:
+    joined = "\n\n".join(f"### {unit.label()}\n{note}" for unit, note in zip(units, notes))
+    return [SECTION_PROMPT.format(filename=state.filename or "(unnamed)", notes=joined, section=title,
+                                  instructions=instructions)
+            for title, instructions in SECTIONS]
+
+
+def _section_heading(index: int) -> str:
+    return ("" if index == 0 else "\n\n") + f"## {SECTIONS[index][0]}\n\n"
+
+
+def _repo_prompt(state: CodeAnalyzerState) -> str:
+    return REPO_ANALYSIS_PROMPT.format(index=state.repo_index, hot_files=state.code_content)
+
+
+def _needs_chunking(state: CodeAnalyzerState) -> bool:
+    return count_tokens(state.code_content) > SINGLE_PASS_TOKENS
+
+
+async def analyze_unit(state: CodeAnalyzerState, unit: CodeUnit, outline: str, report: CacheReport) -> str:
+    """Map step: returns the notes for one code unit, from the cache when its prompt is unchanged."""
+    cache = get_analysis_cache()
+    # The notes depend on the filename and outline in the prompt, so the whole prompt is the key
+    prompt = _unit_prompt(state, unit, outline)
+    key = _prompt_key("unit", prompt)
+    entry = await asyncio.to_thread(cache.get, key)
+    if entry is not None:
+        report.hit(entry["tokens"])
+        return entry["result"]
+
+    response = await llm.ainvoke(prompt)
+    tokens = count_tokens(prompt) + count_tokens(response.content)
+    await asyncio.to_thread(cache.put, key, "unit", response.content, tokens)
+    report.miss(tokens)
+    return response.content
+
+
+async def _astream_cached(kind: str, key: str, prompt: str, report: CacheReport) -> AsyncIterator[str]:
+    """Streams the LLM output for `prompt`, or replays the cached result in one piece."""
+    cache = get_analysis_cache()
+    entry = await asyncio.to_thread(cache.get, key)
+    if entry is not None:
+        report.hit(entry["tokens"])
+        yield entry["result"]
+        return
+
+    result = ""
+    async for chunk in llm.astream(prompt):
+        if chunk.content:
+            result += chunk.content
+            yield chunk.content
+    tokens = count_tokens(prompt) + count_tokens(result)
+    await asyncio.to_thread(cache.put, key, kind, result, tokens)
+    report.miss(tokens)
+
+
+async def _stream_sections(prompts: List[str], report: CacheReport) -> AsyncIterator[Dict[str, Any]]:
+    """Runs all section prompts at once but yields their output in report order.
+
+    The first section streams live; later ones are buffered in their queue
+    until the sections before them finish.
+    """
+    queues: List[asyncio.Queue] = [asyncio.Queue() for _ in prompts]
+
+    async def produce(prompt: str, out: asyncio.Queue) -> None:
+        try:
+            async for delta in _astream_cached("section", _prompt_key("section", prompt), prompt, report):
+                out.put_nowait(delta)
+        finally:
+            out.put_nowait(None)
+
+    tasks = [asyncio.create_task(produce(prompt, out)) for prompt, out in zip(prompts, queues)]
+    try:
+        for index, out in enumerate(queues):
+            yield {"section": SECTIONS[index][0]}
+            yield {"delta": _section_heading(index)}
+            while (delta := await out.get()) is not None:
+                yield {"delta": delta}
+            # Surface the producer's exception, if any
+            await tasks[index]
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def astream_analysis(state: CodeAnalyzerState) -> AsyncIterator[Dict[str, Any]]:
+    """Streams the analysis as events; state.analysis holds the full report when done.
+
+    Events are {"delta": text} for report text and, for chunked files,
+    {"progress": {...}} while units are analyzed and {"section": title}
+    when a report section starts. Unchanged units and sections come from
+    the analysis cache; state.cache_report summarizes the hits.
+    """
+    print("---STREAMING CODE ANALYSIS---")
+    analysis = ""
+    report = CacheReport()
+
+    if state.repo_index:
+        prompt = _repo_prompt(state)
+        async for delta in _astream_cached("repo", _prompt_key("repo", prompt), prompt, report):
+            analysis += delta
+            yield {"delta": delta}
+        state.analysis = analysis
+        state.cache_report = report.as_dict()
+        return
+
+    if not _needs_chunking(state):
+        prompt = ANALYSIS_PROMPT.format(code=state.code_content)
+        async for delta in _astream_cached("file", _prompt_key("file", state.code_content), prompt, report):
+            analysis += delta
+            yield {"delta": delta}
+        state.analysis = analysis
+        state.cache_report = report.as_dict()
+        return
+
+    # Map: analyze units concurrently, at most CONCURRENCY at a time
+    units = chunk_code(state.code_content, state.filename)
+    outline = _outline(units)
+    print(f"Analyzing {len(units)} code units")
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def run(index: int, unit: CodeUnit):
+        async with semaphore:
+            return index, await analyze_unit(state, unit, outline, report)
+
+    notes: List[str] = [""] * len(units)
+    tasks = [asyncio.create_task(run(i, unit)) for i, unit in enumerate(units)]
+    try:
+        for done, task in enumerate(asyncio.as_completed(tasks), 1):
+            index, note = await task
+            notes[index] = note
+            yield {"progress": {"units_done": done, "units_total": len(units), "unit": units[index].label(),
+                                "cached_units": report.hits}}
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    # Reduce: build the report section by section from the unit notes
+    async for event in _stream_sections(_section_prompts(state, units, notes), report):
+        if "delta" in event:
+            analysis += event["delta"]
+        yield event
+    state.analysis = analysis
+    state.cache_report = report.as_dict()
 
-    # Save the generated analysis to the state
-    state.analysis=response.content
-    return state
@@ -1,21 +1,190 @@
 from dotenv import load_dotenv
 from langgraph.graph import StateGraph, END
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_openai import AzureChatOpenAI
+from langchain_core.runnables import RunnableLambda
+import asyncio
+import json
 import os
+import re
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 # Local imports
 from app.models import DataGenState
+from app.services.clients import clients
 
 load_dotenv()
 
+# --- Configuration ---
+# Counts above SHARD_SIZE are generated in shards of at most SHARD_SIZE records
+SHARD_SIZE = int(os.getenv("DATA_GEN_SHARD_SIZE", "50"))
+# Maximum number of shards generated at the same time
+CONCURRENCY = int(os.getenv("DATA_GEN_CONCURRENCY", "4"))
+MAX_COUNT = int(os.getenv("DATA_GEN_MAX_COUNT", "10000"))
+# Extra rounds that replace records lost to duplicates, failed shards or truncated output
+TOP_UP_ROUNDS = int(os.getenv("DATA_GEN_TOP_UP_ROUNDS", "2"))
+
 # Initialize the Azure OpenAI LLM
-llm = AzureChatOpenAI(
-    api_version="2024-10-21",
-    azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-    api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-    azure_deployment=os.getenv("AZURE_OPENAI_DEPLOYMENT"),
-)
+llm = clients.chat_llm()
+
+SYSTEM_PROMPT = """You are an expert at generating synthetic JSON data.
+The user will provide a description of the data they want and a count of how many items to generate.
+You must return a single, valid JSON array of objects. Do not include any markdown, backticks, or other text outside of the JSON array itself.
+The generated data should be realistic and conform to the user's request."""
+
+# Planner: one small call fixes the record shape every shard must follow
+SCHEMA_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """You design the record format for a synthetic JSON dataset.
+Return a single JSON object with exactly these keys, and nothing else:
+- "fields": an object mapping each field name to a short description of its type and allowed values
+- "key_fields": the field names that identify a record, such as an id, email or name (used to drop duplicates)
+- "examples": an array of 3 example records that follow "fields" exactly
+Do not include any markdown, backticks, or other text outside of the JSON object itself."""),
+    ("user", "The dataset will hold {count} items based on this description: {prompt}"),
+])
+
+SHARD_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", SYSTEM_PROMPT + """
+Every object must have exactly the fields of this schema, with the same names and value types:
+{schema}
+Example records (for the format only, do not copy them):
+{examples}"""),
+    ("user", """Please generate {count} items based on this description: {prompt}
+This is batch {batch} of {batches} generated in parallel. Start any sequential ids or numbers at {offset}, and vary names and values so this batch does not repeat the others (variation seed: {seed})."""),
+])
+
+
+def needs_sharding(state: DataGenState) -> bool:
+    return state.count > SHARD_SIZE
+
+
+def plan_shards(count: int, shard_size: int = SHARD_SIZE) -> List[int]:
+    """Splits `count` into near-equal shard sizes no larger than `shard_size`."""
+    if count <= 0:
+        return []
+    shards = -(-count // shard_size)
+    base, extra = divmod(count, shards)
+    return [base + (1 if i < extra else 0) for i in range(shards)]
+
+
+def _strip_fences(text: str) -> str:
+    return re.sub(r"^\s*```(?:json)?\s*|\s*```\s*$", "", text or "")
+
+
+def parse_records(text: str) -> List[Dict[str, Any]]:
+    """Parses a JSON array of objects, salvaging the complete objects of a truncated array."""
+    text = _strip_fences(text)
+    try:
+        data = json.loads(text)
+        if isinstance(data, dict):
+            # Some answers wrap the array, e.g. {"items": [...]}
+            data = next((value for value in data.values() if isinstance(value, list)), [data])
+        return [item for item in data if isinstance(item, dict)] if isinstance(data, list) else []
+    except ValueError:
+        pass
+
+    start = text.find("[")
+    if start < 0:
+        return []
+    decoder = json.JSONDecoder()
+    records, position = [], start + 1
+    while True:
+        while position < len(text) and text[position] in " \t\r\n,":
+            position += 1
+        try:
+            item, position = decoder.raw_decode(text, position)
+        except ValueError:
+            return records
+        if isinstance(item, dict):
+            records.append(item)
+
+
+class ShardMerger:
+    """Merges shard output into one array, dropping records whose key fields repeat."""
+
+    def __init__(self, count: int, key_fields: List[str]):
+        self.count = count
+        self.key_fields = key_fields
+        self.records: List[Dict[str, Any]] = []
+        self._seen = set()
+        self.duplicates = 0
+
+    def _key(self, record: Dict[str, Any]) -> str:
+        fields = [f for f in self.key_fields if f in record] or sorted(record)
+        return json.dumps([(f, re.sub(r"\s+", " ", str(record.get(f))).strip().lower()) for f in fields])
+
+    def add(self, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Adds records and returns the ones that were new (never more than `count` in total)."""
+        fresh = []
+        for record in records:
+            if self.full:
+                break
+            key = self._key(record)
+            if key in self._seen:
+                self.duplicates += 1
+                continue
+            self._seen.add(key)
+            self.records.append(record)
+            fresh.append(record)
+        return fresh
+
+    @property
+    def full(self) -> bool:
+        return len(self.records) >= self.count
+
+    @property
+    def missing(self) -> int:
+        return self.count - len(self.records)
+
+
+def _shard_prompt(state: DataGenState, count: int, batch: int, batches: int, offset: int, seed: int) -> str:
+    schema = json.loads(state.record_schema) if state.record_schema else {}
+    return SHARD_PROMPT.format(
+        prompt=state.prompt, count=count, batch=batch, batches=batches, offset=offset, seed=seed,
+        schema=json.dumps(schema.get("fields", {}), indent=2) if schema else "(follow the description)",
+        examples=json.dumps(schema.get("examples", [])[:3], indent=2) if schema else "(none)",
+    )
+
+
+def _apply_schema(state: DataGenState, text: str) -> DataGenState:
+    try:
+        schema = json.loads(_strip_fences(text))
+        fields = schema.get("fields") or {}
+        state.record_schema = json.dumps({"fields": fields, "examples": schema.get("examples") or []})
+        state.key_fields = [f for f in schema.get("key_fields") or [] if f in fields]
+    except (ValueError, AttributeError) as e:
+        # Shards still run, just without a shared schema; dedup then compares whole records
+        print(f"Could not parse the data schema: {e}")
+    return state
+
+
+def _plan_messages(state: DataGenState) -> str:
+    return SCHEMA_PROMPT.format(prompt=state.prompt, count=state.count)
+
+
+def plan_node(state: DataGenState) -> DataGenState:
+    """For sharded counts, fixes the shared schema, exemplar records and dedup key fields."""
+    state.count = min(state.count, MAX_COUNT)
+    if not needs_sharding(state):
+        return state
+    print("---PLANNING SHARDED DATA GENERATION---")
+    try:
+        return _apply_schema(state, llm.invoke(_plan_messages(state)).content)
+    except Exception as e:
+        print("LLM error:", e)
+        return state
+
+
+async def aplan_node(state: DataGenState) -> DataGenState:
+    state.count = min(state.count, MAX_COUNT)
+    if not needs_sharding(state):
+        return state
+    print("---PLANNING SHARDED DATA GENERATION---")
+    try:
+        return _apply_schema(state, (await llm.ainvoke(_plan_messages(state))).content)
+    except Exception as e:
+        print("LLM error:", e)
+        return state
 
 
 def generate_data_node(state: DataGenState):
@@ -23,10 +192,7 @@ def generate_data_node(state: DataGenState):
     print("---GENERATING SYNTHETIC DATA---")
 
     prompt = ChatPromptTemplate.from_messages([
-        ("system", """You are an expert at generating synthetic JSON data.
-The user will provide a description of the data they want and a count of how many items to generate.
-You must return a single, valid JSON array of objects. Do not include any markdown, backticks, or other text outside of the JSON array itself.
-The generated data should be realistic and conform to the user's request."""),
+        ("system", SYSTEM_PROMPT),
         ("user",
          "Please generate {count} items based on this description: {prompt}")
     ]).format(prompt=state.prompt, count=state.count)
@@ -45,11 +211,135 @@ The generated data should be realistic and conform to the user's request."""),
     return state
 
 
+def _finish(state: DataGenState, merger: ShardMerger, stats: Dict[str, Any], started: float,
+            error: Optional[Exception]) -> DataGenState:
+    stats.update(records=len(merger.records), duplicates_removed=merger.duplicates,
+                 seconds=round(time.perf_counter() - started, 3))
+    state.shard_stats = stats
+    if not merger.records and error is not None:
+        state.generated_json = f"LLM error: {error}"
+    else:
+        state.generated_json = json.dumps(merger.records)
+    return state
+
+
+def _rounds(merger: ShardMerger):
+    """Yields (round, shard sizes, first id offset) until the merger is full or top-ups run out."""
+    for round_number in range(TOP_UP_ROUNDS + 1):
+        if merger.full:
+            return
+        yield round_number, plan_shards(merger.missing), len(merger.records) + 1
+
+
+def sharded_generation_node(state: DataGenState) -> DataGenState:
+    """Sync version of the sharded generator: shards run one after another."""
+    print("---GENERATING SYNTHETIC DATA IN SHARDS---")
+    started = time.perf_counter()
+    merger = ShardMerger(state.count, state.key_fields)
+    stats = {"shards": 0, "failed_shards": 0, "rounds": 0}
+    error = None
+    for round_number, sizes, offset in _rounds(merger):
+        stats["rounds"] = round_number + 1
+        for index, size in enumerate(sizes):
+            if merger.full:
+                break
+            prompt = _shard_prompt(state, size, index + 1, len(sizes), offset + sum(sizes[:index]),
+                                   round_number * 1000 + index)
+            stats["shards"] += 1
+            try:
+                merger.add(parse_records(llm.invoke(prompt).content))
+            except Exception as e:
+                print("LLM error:", e)
+                stats["failed_shards"] += 1
+                error = e
+    return _finish(state, merger, stats, started, error)
+
+
+async def astream_shards(state: DataGenState) -> AsyncIterator[Dict[str, Any]]:
+    """Generates shards concurrently (at most CONCURRENCY at a time) and yields merged records.
+
+    Each event is {"shard", "records", "progress"} with only records not seen
+    before. Shards still running are cancelled once `count` unique records
+    exist; state.generated_json holds the merged array when done.
+    """
+    print("---GENERATING SYNTHETIC DATA IN SHARDS---")
+    started = time.perf_counter()
+    merger = ShardMerger(state.count, state.key_fields)
+    stats = {"shards": 0, "failed_shards": 0, "rounds": 0, "concurrency": CONCURRENCY}
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    error = None
+
+    async def run(shard: int, prompt: str) -> Tuple[int, List[Dict[str, Any]]]:
+        async with semaphore:
+            response = await llm.ainvoke(prompt)
+            return shard, parse_records(response.content)
+
+    for round_number, sizes, offset in _rounds(merger):
+        stats["rounds"] = round_number + 1
+        tasks = [
+            asyncio.create_task(run(stats["shards"] + index, _shard_prompt(
+                state, size, index + 1, len(sizes), offset + sum(sizes[:index]), round_number * 1000 + index)))
+            for index, size in enumerate(sizes)
+        ]
+        stats["shards"] += len(tasks)
+        try:
+            for task in asyncio.as_completed(tasks):
+                try:
+                    shard, records = await task
+                except Exception as e:
+                    print("LLM error:", e)
+                    stats["failed_shards"] += 1
+                    error = e
+                    continue
+                fresh = merger.add(records)
+                yield {"shard": shard, "records": fresh,
+                       "progress": {"records": len(merger.records), "count": state.count,
+                                    "duplicates_removed": merger.duplicates}}
+                if merger.full:
+                    break
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    _finish(state, merger, stats, started, error)
+
+
+async def asharded_generation_node(state: DataGenState) -> DataGenState:
+    async for _ in astream_shards(state):
+        pass
+    return state
+
+
+async def astream_data_generation(state: DataGenState) -> AsyncIterator[Tuple[str, Any]]:
+    """Runs the data-gen graph's steps outside the graph, streaming shard records as they merge.
+
+    Yields ("planner", state), then ("records", event) per finished shard and
+    finally ("sharded_generator", state).
+    """
+    state = await aplan_node(state)
+    yield "planner", state
+    if not needs_sharding(state):
+        yield "generator", await asyncio.to_thread(generate_data_node, state)
+        return
+    async for event in astream_shards(state):
+        yield "records", event
+    yield "sharded_generator", state
+
+
 def create_data_gen_graph():
     """Creates the data generation agent graph."""
     workflow = StateGraph(DataGenState)
+    workflow.add_node("planner", RunnableLambda(plan_node, afunc=aplan_node))
     workflow.add_node("generator", generate_data_node)
-    workflow.set_entry_point("generator")
+    # Async runs (the API) generate shards concurrently; sync runs stay serial
+    workflow.add_node("sharded_generator", RunnableLambda(sharded_generation_node, afunc=asharded_generation_node))
+    workflow.set_entry_point("planner")
+    workflow.add_conditional_edges(
+        "planner",
+        lambda state: "sharded_generator" if needs_sharding(state) else "generator",
+        {"generator": "generator", "sharded_generator": "sharded_generator"},
+    )
     workflow.add_edge("generator", END)
+    workflow.add_edge("sharded_generator", END)
     graph = workflow.compile()
     return graph
@@ -1,49 +1,95 @@
 from dotenv import load_dotenv
+import asyncio
 import os
-from langchain_openai import AzureChatOpenAI, AzureOpenAIEmbeddings
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import FAISS
 from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain.chains import create_retrieval_chain
 from fastapi import File, UploadFile
-from typing import List
+from typing import AsyncIterable, AsyncIterator, Callable, Optional
 from langchain.schema import Document
 
 # Local imports
 from app.models import DocIntelState
+from app.services import index_store
+from app.services.clients import clients
+from app.services.embedding_cache import CachedEmbeddings, get_embedding_cache
+from app.services.ingestion import IngestionProgress, embed_and_index
 
 load_dotenv()
 
 
-llm = AzureChatOpenAI(
-    api_version="2024-10-21",
-    azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-    api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-    azure_deployment=os.getenv("AZURE_OPENAI_DEPLOYMENT"),
-    temperature=0.0
-)
+llm = clients.chat_llm(temperature=0.0)
+
+EMBEDDING_DEPLOYMENT = os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT", "text-embedding-3-small")
 
 # Initialize the embeddings model for vectorizing the document
-embeddings = AzureOpenAIEmbeddings(
-    api_version="2024-10-21",
-    azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-    api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-    azure_deployment="text-embedding-3-small",
-)
+embeddings = clients.embeddings(EMBEDDING_DEPLOYMENT)
+
+# Chunks are content-addressed, so re-uploads only pay for text that changed
+cached_embeddings = CachedEmbeddings(embeddings, EMBEDDING_DEPLOYMENT, get_embedding_cache())
 
 # --- Agent Logic ---
 
-def process_document(docs: List[Document]) -> DocIntelState:
-    """Processes the uploaded document and creates a searchable vector store."""
-    print("---PROCESSING DOCUMENT---")
+async def aprocess_document(pages: AsyncIterable[Document], progress: IngestionProgress) -> DocIntelState:
+    """Async ingestion: chunks pages as they are extracted, then embeds chunks in concurrent batches."""
+    print("---PROCESSING DOCUMENT (PIPELINED)---")
     text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-    splits = text_splitter.split_documents(docs)
-    vectorstore = FAISS.from_documents(documents=splits, embedding=embeddings)
-    
-    # Return a new state object with the retriever
+    splits = []
+    async for page in pages:
+        # Pages keep their number in metadata, so chunks stay attributable to a page.
+        # Splitting a long page is CPU-bound, so it runs off the event loop.
+        splits.extend(await asyncio.to_thread(text_splitter.split_documents, [page]))
+    vectorstore = await embed_and_index(
+        splits, embeddings, EMBEDDING_DEPLOYMENT, get_embedding_cache(), progress,
+        query_embeddings=cached_embeddings,
+    )
     return DocIntelState(retriever=vectorstore.as_retriever())
 
+def save_document_index(state: DocIntelState) -> None:
+    """Persists the session's vector store so it can be hibernated and reloaded."""
+    if state.retriever is None:
+        return
+    index_store.save_index(state.thread_id, state.retriever.vectorstore)
+
+def hibernate_document(thread_id: str, state: DocIntelState) -> None:
+    """Eviction hook: makes sure an evicted session is on disk before it leaves memory."""
+    if index_store.has_index(thread_id):
+        index_store.touch_index(thread_id)
+    else:
+        print(f"---HIBERNATING DOCUMENT {thread_id}---")
+        save_document_index(state)
+
+def discard_document(thread_id: str, state: DocIntelState) -> None:
+    """Eviction hook for expired sessions: deletes the persisted index."""
+    print(f"---DELETING EXPIRED DOCUMENT {thread_id}---")
+    index_store.delete_index(thread_id)
+
+def prune_documents(max_idle: float, is_active: Callable[[str], bool]) -> None:
+    """Deletes hibernated indexes that nobody reloaded within `max_idle` seconds."""
+    pruned = index_store.prune_indexes(max_idle, is_active)
+    if pruned:
+        print(f"---PRUNED {pruned} HIBERNATED DOCUMENT(S)---")
+
+def load_document_state(thread_id: str) -> Optional[DocIntelState]:
+    """Reloads a hibernated session from disk, or returns None if it was never persisted."""
+    vectorstore = index_store.load_index(thread_id, cached_embeddings)
+    if vectorstore is None:
+        return None
+    print(f"---RELOADED DOCUMENT {thread_id} FROM DISK---")
+    return DocIntelState(thread_id=thread_id, retriever=vectorstore.as_retriever())
+
+def build_retrieval_chain(retriever):
+    """Creates the retrieval chain used to answer questions about a document."""
+    prompt = ChatPromptTemplate.from_template("""Answer the following question based only on the provided context:
+    <context>
+    {context}
+    </context>
+    Question: {input}""")
+
+    document_chain = create_stuff_documents_chain(llm, prompt)
+    return create_retrieval_chain(retriever, document_chain)
+
 def answer_question(state: DocIntelState) -> DocIntelState:
     """Answers a question based on the document context."""
     print("---ANSWERING QUESTION---")
@@ -52,17 +98,27 @@ def answer_question(state: DocIntelState) -> DocIntelState:
         return state
 
     # Create a retrieval chain
-    prompt = ChatPromptTemplate.from_template("""Answer the following question based only on the provided context:
-    <context>
-    {context}
-    </context>
-    Question: {input}""")
-    
-    document_chain = create_stuff_documents_chain(llm, prompt)
-    retrieval_chain = create_retrieval_chain(state.retriever, document_chain)
+    retrieval_chain = build_retrieval_chain(state.retriever)
     
     # Invoke the chain
     response = retrieval_chain.invoke({"input": state.question})
     
     state.answer = response["answer"]
-    return state
\ No newline at end of file
+    return state
+
+async def astream_answer(state: DocIntelState) -> AsyncIterator[str]:
+    """Streams the answer token by token; state.answer holds the full answer when done."""
+    print("---STREAMING ANSWER---")
+    if not state.retriever:
+        state.answer = "Error: Document not processed yet. Please upload a document first."
+        yield state.answer
+        return
+
+    answer = ""
+    # The retrieval chain streams dict fragments; only "answer" fragments carry tokens
+    async for chunk in build_retrieval_chain(state.retriever).astream({"input": state.question}):
+        delta = chunk.get("answer")
+        if delta:
+            answer += delta
+            yield delta
+    state.answer = answer
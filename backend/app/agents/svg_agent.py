@@ -1,22 +1,60 @@
 from dotenv import load_dotenv
 from langgraph.graph import StateGraph, END
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_openai import AzureChatOpenAI
+from langchain_core.runnables import RunnableLambda
 import xml.etree.ElementTree as ET
+import asyncio
 import re
 import os
+import time
+from typing import List, Optional, Tuple
 from ..models import AgentState
+from ..services.clients import clients
+from ..services.svg_stream import (
+    BARE_AMPERSAND_RE, SVG_NAMESPACE, XLINK_NAMESPACE, MalformedSvgError, ProgressiveSvgParser,
+)
+from ..services import vector_convert
+from ..services import pdf_sandbox
+import base64
 
 load_dotenv()
 
 # Initialize LLM
-llm = AzureChatOpenAI(
-    api_version="2024-10-21",
-    azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-    api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-    azure_deployment=os.getenv("AZURE_OPENAI_DEPLOYMENT"),
-    temperature=0.1  # Lower temperature for more consistent code generation
-)
+llm = clients.chat_llm(temperature=0.1)  # Lower temperature for more consistent code generation
+
+# Token usage of the latest LLM call, moved into the attempt log by the calling node
+USAGE_KEY = "_usage"
+
+REPAIR_PROMPT = """The following {format} code failed validation with these errors:
+{errors}
+
+Fix only these problems and return the complete corrected {format} code, keeping everything else unchanged.
+Do not include markdown, backticks, or explanatory text.
+
+Original request: {prompt}
+
+Code:
+{code}"""
+
+# Prefix of the error recorded when a progressive stream is cut off; such code is only a fragment
+STREAM_ABORTED = "Malformed SVG stream"
+
+_TAG_RE = re.compile(r'<!--.*?-->|<!\[CDATA\[.*?\]\]>|<([/!?]?)([A-Za-z][\w:.-]*)((?:"[^"]*"|\'[^\']*\'|[^<>"\'])*?)(/?)>', re.DOTALL)
+
+
+def usage_of(response) -> dict:
+    usage = getattr(response, "usage_metadata", None) or {}
+    return {key: usage.get(key, 0) for key in ("input_tokens", "output_tokens", "total_tokens")}
+
+# --- Speculative generation ---
+# Upper bound on concurrent candidates a request may ask for
+MAX_SPECULATIVE_CANDIDATES = int(os.getenv("SVG_MAX_SPECULATIVE_CANDIDATES", "4"))
+# Extra candidates sample at a higher temperature so they differ from the first one
+SPECULATIVE_TEMPERATURE = float(os.getenv("SVG_SPECULATIVE_TEMPERATURE", "0.7"))
+
+# Generated reportlab code is executed in sandboxed workers to produce the actual PDF;
+# without reportlab installed, PDF results stay code-only
+PDF_EXECUTION = pdf_sandbox.PdfSandbox.available()
 
 class VectorGraphicsAgent:
     def __init__(self):
@@ -25,12 +63,19 @@ class VectorGraphicsAgent:
             "eps": self.generate_eps_code,
             "pdf": self.generate_pdf_code
         }
+        # (prompt builder, response handler) per format, shared by the sync and async paths
+        self.format_steps = {
+            "svg": (self.svg_prompt, self.apply_svg_response),
+            "eps": (self.eps_prompt, self.apply_eps_response),
+            "pdf": (self.pdf_prompt, self.apply_pdf_response)
+        }
         
     def generate_vector_graphics_node(self, state: AgentState) -> AgentState:
         """Main vector graphics generation node with format selection."""
         print(f"---GENERATING {state.vector_format.upper()} VECTOR GRAPHICS---")
         
         state.generation_attempts += 1
+        started = time.perf_counter()
         
         # Select appropriate generator based on format
         if state.vector_format in self.format_generators:
@@ -42,96 +87,111 @@ class VectorGraphicsAgent:
             
         # Validate the generated code
         state = self.validate_vector_code(state)
+        self.record_attempt(state, "generate", started, state.generation_metadata.pop(USAGE_KEY, {}))
         
         return state
     
     def generate_svg_code(self, state: AgentState) -> AgentState:
         """Enhanced SVG generation with style and complexity considerations."""
-        
+        try:
+            response = llm.invoke(self.svg_prompt(state))
+            state = self.apply_svg_response(state, response.content)
+            state.generation_metadata[USAGE_KEY] = usage_of(response)
+        except Exception as e:
+            state.validation_errors.append(f"SVG generation error: {str(e)}")
+            
+        return state
+    
+    def svg_prompt(self, state: AgentState) -> str:
         # Create enhanced prompt based on user preferences
         system_prompt = self.create_svg_system_prompt(state.style, state.complexity, state.color_scheme)
         
-        prompt = ChatPromptTemplate.from_messages([
+        return ChatPromptTemplate.from_messages([
             ("system", system_prompt),
             ("user", "{prompt}")
         ]).format(prompt=state.prompt)
+    
+    def apply_svg_response(self, state: AgentState, content: str) -> AgentState:
+        state.svg_code = self.clean_svg_response(content)
+        state.vector_code = state.svg_code
+        state.format_specific_code["svg"] = state.svg_code
         
+        # Add generation metadata
+        state.generation_metadata.update({
+            "format": "svg",
+            "style": state.style,
+            "complexity": state.complexity,
+            "color_scheme": state.color_scheme
+        })
+        return state
+    
+    def generate_eps_code(self, state: AgentState) -> AgentState:
+        """Generate EPS (Encapsulated PostScript) code."""
         try:
-            response = llm.invoke(prompt)
-            state.svg_code = self.clean_svg_response(response.content)
-            state.vector_code = state.svg_code
-            state.format_specific_code["svg"] = state.svg_code
-            
-            # Add generation metadata
-            state.generation_metadata.update({
-                "format": "svg",
-                "style": state.style,
-                "complexity": state.complexity,
-                "color_scheme": state.color_scheme
-            })
-            
+            response = llm.invoke(self.eps_prompt(state))
+            state = self.apply_eps_response(state, response.content)
+            state.generation_metadata[USAGE_KEY] = usage_of(response)
         except Exception as e:
-            state.validation_errors.append(f"SVG generation error: {str(e)}")
+            state.validation_errors.append(f"EPS generation error: {str(e)}")
             
         return state
     
-    def generate_eps_code(self, state: AgentState) -> AgentState:
-        """Generate EPS (Encapsulated PostScript) code."""
-        
+    def eps_prompt(self, state: AgentState) -> str:
         system_prompt = """You are an expert at creating EPS (Encapsulated PostScript) vector graphics code. 
         Generate clean, valid EPS code that creates the requested vector graphic. 
         Start with proper EPS headers (%!PS-Adobe-3.0 EPSF-3.0) and include bounding box information.
         Use PostScript drawing commands like moveto, lineto, curveto, fill, stroke, etc.
         Keep the code clean and well-structured."""
         
-        prompt = ChatPromptTemplate.from_messages([
+        return ChatPromptTemplate.from_messages([
             ("system", system_prompt),
             ("user", "Create EPS code for: {prompt}")
         ]).format(prompt=state.prompt)
+    
+    def apply_eps_response(self, state: AgentState, content: str) -> AgentState:
+        eps_code = self.clean_eps_response(content)
+        state.vector_code = eps_code
+        state.format_specific_code["eps"] = eps_code
         
+        state.generation_metadata.update({
+            "format": "eps",
+            "style": state.style
+        })
+        return state
+    
+    def generate_pdf_code(self, state: AgentState) -> AgentState:
+        """Generate PDF vector graphics using reportlab or similar approach."""
         try:
-            response = llm.invoke(prompt)
-            eps_code = self.clean_eps_response(response.content)
-            state.vector_code = eps_code
-            state.format_specific_code["eps"] = eps_code
-            
-            state.generation_metadata.update({
-                "format": "eps",
-                "style": state.style
-            })
-            
+            response = llm.invoke(self.pdf_prompt(state))
+            state = self.apply_pdf_response(state, response.content)
+            state.generation_metadata[USAGE_KEY] = usage_of(response)
         except Exception as e:
-            state.validation_errors.append(f"EPS generation error: {str(e)}")
+            state.validation_errors.append(f"PDF generation error: {str(e)}")
             
         return state
     
-    def generate_pdf_code(self, state: AgentState) -> AgentState:
-        """Generate PDF vector graphics using reportlab or similar approach."""
-        
+    def pdf_prompt(self, state: AgentState) -> str:
         system_prompt = """You are an expert at creating Python code that generates PDF vector graphics using reportlab.
         Generate clean Python code that uses reportlab to create vector graphics in PDF format.
         Include proper imports, canvas setup, and drawing commands.
-        Use reportlab's graphics capabilities like drawString, line, rect, circle, etc."""
+        Use reportlab's graphics capabilities like drawString, line, rect, circle, etc.
+        The code is executed as a script: write the PDF to a file in the current directory (e.g. 'output.pdf') and call save().
+        Do not read other files or use the network."""
         
-        prompt = ChatPromptTemplate.from_messages([
+        return ChatPromptTemplate.from_messages([
             ("system", system_prompt),
             ("user", "Create reportlab Python code to generate PDF vector graphics for: {prompt}")
         ]).format(prompt=state.prompt)
+    
+    def apply_pdf_response(self, state: AgentState, content: str) -> AgentState:
+        pdf_code = self.clean_code_response(content)
+        state.vector_code = pdf_code
+        state.format_specific_code["pdf"] = pdf_code
         
-        try:
-            response = llm.invoke(prompt)
-            pdf_code = self.clean_code_response(response.content)
-            state.vector_code = pdf_code
-            state.format_specific_code["pdf"] = pdf_code
-            
-            state.generation_metadata.update({
-                "format": "pdf",
-                "library": "reportlab"
-            })
-            
-        except Exception as e:
-            state.validation_errors.append(f"PDF generation error: {str(e)}")
-            
+        state.generation_metadata.update({
+            "format": "pdf",
+            "library": "reportlab"
+        })
         return state
     
     def create_svg_system_prompt(self, style: str, complexity: str, color_scheme: str) -> str:
@@ -175,47 +235,75 @@ class VectorGraphicsAgent:
         """Validate generated vector code based on format."""
         
         if state.vector_format == "svg" and state.svg_code:
-            state.is_valid = self.validate_svg(state.svg_code)
+            state.is_valid = self.validate_svg(state.svg_code, state.validation_errors)
         elif state.vector_format == "eps" and state.vector_code:
-            state.is_valid = self.validate_eps(state.vector_code)
+            state.is_valid = self.validate_eps(state.vector_code, state.validation_errors)
         elif state.vector_format == "pdf" and state.vector_code:
-            state.is_valid = self.validate_pdf_code(state.vector_code)
+            state.is_valid = self.validate_pdf_code(state.vector_code, state.validation_errors)
+            if state.is_valid and PDF_EXECUTION:
+                state = self.render_pdf(state)
         
         return state
     
-    def validate_svg(self, svg_code: str) -> bool:
-        """Validate SVG code structure."""
+    def render_pdf(self, state: AgentState) -> AgentState:
+        """Runs the reportlab code in the sandbox; a runtime failure makes the result invalid."""
+        result = pdf_sandbox.get_sandbox().render(state.vector_code)
+        state.generation_metadata["pdf_render"] = {
+            "ok": result.ok,
+            "seconds": result.seconds,
+            "cached": result.cached,
+            "bytes": len(result.pdf) if result.pdf else 0
+        }
+        if result.ok:
+            state.pdf_base64 = base64.b64encode(result.pdf).decode("ascii")
+        else:
+            state.pdf_base64 = None
+            state.is_valid = False
+            state.validation_errors.append(f"PDF code failed to run: {result.error}")
+        return state
+    
+    def validate_svg(self, svg_code: str, errors: Optional[List[str]] = None) -> bool:
+        """Validate SVG code structure, appending any problems to `errors`."""
+        errors = errors if errors is not None else []
         try:
             # Basic XML validation
             ET.fromstring(svg_code)
             
             # Check for required SVG elements
             if not svg_code.strip().startswith('<svg'):
-                self.add_validation_error("SVG must start with <svg> tag")
+                errors.append("SVG must start with <svg> tag")
                 return False
                 
             if '</svg>' not in svg_code:
-                self.add_validation_error("SVG must end with </svg> tag")
+                errors.append("SVG must end with </svg> tag")
                 return False
                 
             return True
             
         except ET.ParseError as e:
-            self.add_validation_error(f"Invalid XML structure: {str(e)}")
+            errors.append(f"Invalid XML structure: {str(e)}")
             return False
     
-    def validate_eps(self, eps_code: str) -> bool:
+    def validate_eps(self, eps_code: str, errors: Optional[List[str]] = None) -> bool:
         """Basic EPS validation."""
+        errors = errors if errors is not None else []
         if not eps_code.startswith('%!PS-Adobe'):
+            errors.append("EPS must start with a %!PS-Adobe header")
             return False
+        # EPSF 3.0 requires a bounding box; importers (LaTeX, Illustrator) reject files without one
         if '%%BoundingBox:' not in eps_code:
+            errors.append("EPS must include a %%BoundingBox comment")
             return False
         return True
     
-    def validate_pdf_code(self, pdf_code: str) -> bool:
+    def validate_pdf_code(self, pdf_code: str, errors: Optional[List[str]] = None) -> bool:
         """Basic PDF code validation."""
+        errors = errors if errors is not None else []
         required_imports = ['reportlab', 'canvas']
-        return any(imp in pdf_code for imp in required_imports)
+        if not any(imp in pdf_code for imp in required_imports):
+            errors.append("PDF code must use reportlab's canvas")
+            return False
+        return True
     
     def clean_svg_response(self, response: str) -> str:
         """Clean and extract SVG code from LLM response."""
@@ -240,61 +328,389 @@ class VectorGraphicsAgent:
         return response.strip()
 
     def refinement_node(self, state: AgentState) -> AgentState:
-        """Refine the generated vector graphics if validation fails."""
+        """Repair the generated vector graphics if validation fails.
+
+        Cheap local fixes are tried first; if the code is still invalid the LLM
+        gets the previous code and its errors and is asked only for a fix.
+        """
         
         if state.is_valid or state.generation_attempts >= state.max_attempts:
             return state
             
         print(f"---REFINING {state.vector_format.upper()} (Attempt {state.generation_attempts})---")
         
-        # Create refinement prompt
-        errors = "; ".join(state.validation_errors)
-        refinement_prompt = f"""The previous {state.vector_format.upper()} code had these issues: {errors}
-        Please fix these issues and generate a corrected version.
-        Original request: {state.prompt}"""
+        build_prompt, apply_response = self.format_steps.get(state.vector_format, (None, None))
+        if apply_response is None or not state.vector_code:
+            # Nothing to repair (the generation itself failed); start over
+            state.validation_errors = []
+            return self.generate_vector_graphics_node(state)
+        
+        state.generation_attempts += 1
+        started = time.perf_counter()
+        state, errors = self.try_local_repair(state)
+        if state.is_valid:
+            self.record_attempt(state, "local_repair", started, {})
+            return state
         
-        # Clear previous errors
+        # LLM repair: previous code plus the specific errors
         state.validation_errors = []
+        usage = {}
+        try:
+            response = llm.invoke(self.repair_prompt(state, errors))
+            usage = usage_of(response)
+            fixed = self.local_repair(state.vector_format, response.content)
+            state = apply_response(state, fixed)
+        except Exception as e:
+            state.validation_errors.append(f"{state.vector_format.upper()} repair error: {str(e)}")
+        state = self.validate_vector_code(state)
+        self.record_attempt(state, "llm_repair", started, usage)
+        return state
+    
+    def try_local_repair(self, state: AgentState) -> Tuple[AgentState, List[str]]:
+        """Applies local fixes (no LLM call) and revalidates.
+
+        Returns the state and the errors still to be fixed by the LLM.
+        """
+        errors = list(state.validation_errors)
+        _, apply_response = self.format_steps[state.vector_format]
+        # An aborted stream is incomplete, so closing its tags would "fix" it into a
+        # fragment of the requested image; let the LLM finish it.
+        aborted = any(error.startswith(STREAM_ABORTED) for error in errors)
+        repaired = state.vector_code if aborted else self.local_repair(state.vector_format, state.vector_code)
+        if repaired != state.vector_code:
+            state.validation_errors = []
+            state = self.validate_vector_code(apply_response(state, repaired))
+            if not state.is_valid:
+                errors = list(state.validation_errors)
+        return state, errors
+    
+    def repair_prompt(self, state: AgentState, errors: List[str]) -> str:
+        return REPAIR_PROMPT.format(
+            format=state.vector_format.upper(),
+            errors="\n".join(f"- {error}" for error in errors) or "- Unknown validation failure",
+            prompt=state.prompt,
+            code=state.vector_code
+        )
+    
+    def record_attempt(self, state: AgentState, mode: str, started: float, usage: dict) -> None:
+        """Appends per-attempt mode, tokens, latency and outcome to the generation metadata."""
+        state.generation_metadata.setdefault("attempts", []).append({
+            "attempt": state.generation_attempts,
+            "mode": mode,
+            "latency_ms": round((time.perf_counter() - started) * 1000),
+            **(usage or {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}),
+            "valid": state.is_valid
+        })
+    
+    # --- Local repair ---
+    
+    def local_repair(self, vector_format: str, code: str) -> str:
+        """Applies deterministic fixes for common LLM mistakes."""
+        code = re.sub(r'```[\w-]*\n?', '', code).strip()
+        if vector_format == "svg":
+            return self.repair_svg(code)
+        if vector_format == "eps":
+            # Drop chatter before the PostScript header
+            header = code.find('%!PS-Adobe')
+            return code[header:] if header > 0 else code
+        return code
+    
+    def repair_svg(self, code: str) -> str:
+        """Trims stray text, adds missing namespaces, escapes bare '&' and closes unclosed tags."""
+        start = code.lower().find('<svg')
+        if start < 0:
+            return code
+        code = code[start:]
+        end = code.lower().rfind('</svg>')
+        if end >= 0:
+            code = code[:end + len('</svg>')]
+        
+        # A tag cut off by truncation can't be recovered
+        last_open, last_close = code.rfind('<'), code.rfind('>')
+        if last_open > last_close:
+            code = code[:last_open]
+        
+        code = BARE_AMPERSAND_RE.sub('&amp;', code)
+        
+        # Re-emit the document, dropping stray closing tags and closing anything left open
+        out, stack, position = [], [], 0
+        for match in _TAG_RE.finditer(code):
+            out.append(code[position:match.start()])
+            position = match.end()
+            kind, name, _, self_closing = match.groups()
+            if name is None or kind in ("!", "?") or self_closing:
+                out.append(match.group(0))
+            elif kind == "/":
+                if name in stack:
+                    while stack:
+                        open_name = stack.pop()
+                        if open_name == name:
+                            break
+                        out.append(f"</{open_name}>")
+                    out.append(match.group(0))
+            else:
+                stack.append(name)
+                out.append(match.group(0))
+        out.append(code[position:])
+        out.extend(f"</{name}>" for name in reversed(stack))
+        code = "".join(out)
         
-        # Re-generate with refinement
-        return self.generate_vector_graphics_node(state)
+        root = re.match(r'<svg\b[^>]*>', code, re.IGNORECASE)
+        if root:
+            tag = root.group(0)
+            fixed = tag
+            if 'xmlns=' not in tag:
+                fixed = fixed.replace('<svg', f'<svg xmlns="{SVG_NAMESPACE}"', 1)
+            if 'xlink:' in code and 'xmlns:xlink=' not in tag:
+                fixed = fixed.replace('<svg', f'<svg xmlns:xlink="{XLINK_NAMESPACE}"', 1)
+            code = fixed + code[len(tag):]
+        return code
+
+    # --- Local format conversion ---
+
+    def convert_formats_node(self, state: AgentState) -> AgentState:
+        """Converts the validated SVG to each target format locally (no LLM calls)."""
+        targets = [fmt for fmt in state.target_formats if fmt in ("eps", "pdf")]
+        if not state.is_valid or not state.svg_code or not targets:
+            return state
+        print(f"---CONVERTING SVG TO {', '.join(fmt.upper() for fmt in targets)}---")
+        started = time.perf_counter()
+        errors = []
+        try:
+            drawing = vector_convert.svg_to_drawing(state.svg_code)
+            if "eps" in targets:
+                eps_code = vector_convert.drawing_to_eps(drawing)
+                if self.validate_eps(eps_code, errors):
+                    state.format_specific_code["eps"] = eps_code
+            if "pdf" in targets:
+                state.pdf_base64 = base64.b64encode(vector_convert.drawing_to_pdf(drawing)).decode("ascii")
+        except (vector_convert.ConversionError, ArithmeticError) as e:
+            errors.append(str(e))
+        state.generation_metadata["conversion"] = {
+            "formats": targets,
+            "latency_ms": round((time.perf_counter() - started) * 1000),
+            "errors": errors
+        }
+        return state
+
+    # --- Progressive SVG streaming ---
+
+    async def astream_svg(self, state: AgentState):
+        """Streams an SVG generation, yielding ("svg_root" | "svg_element", payload) as they parse.
+
+        The generation is aborted as soon as the token stream can no longer be
+        well-formed. Afterwards the usual ("generator", state) and, while the
+        result is invalid, ("refiner", state) steps are yielded.
+        """
+        print("---STREAMING SVG VECTOR GRAPHICS---")
+        state.generation_attempts += 1
+        started = time.perf_counter()
+        parser = ProgressiveSvgParser()
+        usage = {}
+        stream = llm.astream(self.svg_prompt(state))
+        try:
+            async for chunk in stream:
+                if getattr(chunk, "usage_metadata", None):
+                    usage = usage_of(chunk)
+                for kind, payload in parser.feed(chunk.content):
+                    yield f"svg_{kind}", payload
+                if parser.finished:
+                    break
+            parser.close()
+        except MalformedSvgError as e:
+            print(f"---ABORTING MALFORMED SVG STREAM: {e}---")
+            state.validation_errors.append(f"{STREAM_ABORTED}: {str(e)}")
+        except Exception as e:
+            state.validation_errors.append(f"SVG generation error: {str(e)}")
+        finally:
+            if hasattr(stream, "aclose"):
+                await stream.aclose()
+        
+        if parser.code:
+            state = self.apply_svg_response(state, parser.code)
+            state = self.validate_vector_code(state)
+        state.generation_metadata["progressive"] = parser.stats()
+        self.record_attempt(state, "generate", started, usage)
+        yield "generator", state
+        
+        while not state.is_valid and state.generation_attempts < state.max_attempts:
+            state = await asyncio.to_thread(self.refinement_node, state)
+            yield "refiner", state
+        
+        if state.is_valid and state.target_formats:
+            yield "converter", await asyncio.to_thread(self.convert_formats_node, state)
+
+    # --- Speculative generation ---
+
+    def speculative_width(self, state: AgentState) -> int:
+        return max(1, min(state.speculative_candidates, MAX_SPECULATIVE_CANDIDATES))
+
+    async def generate_candidate(self, state: AgentState, index: int,
+                                 prompt: Optional[str] = None) -> Tuple[AgentState, dict]:
+        """Generates (or, given a repair `prompt`, repairs) and validates one candidate on a copy
+        of the state; returns it with its token usage."""
+        candidate = state.model_copy(deep=True)
+        candidate.validation_errors = []
+        model = llm if index == 0 else clients.chat_llm(temperature=SPECULATIVE_TEMPERATURE)
+        build_prompt, apply_response = self.format_steps[state.vector_format]
+        response = await model.ainvoke(prompt or build_prompt(candidate))
+        candidate = apply_response(candidate, self.local_repair(state.vector_format, response.content))
+        # Validation may execute PDF code in the sandbox; keep it off the event loop
+        candidate = await asyncio.to_thread(self.validate_vector_code, candidate)
+        return candidate, usage_of(response)
+
+    async def speculative_generation_node(self, state: AgentState, prompt: Optional[str] = None,
+                                          mode: str = "generate") -> AgentState:
+        """Generates several candidates concurrently and keeps the first valid one.
+
+        Remaining candidates are cancelled as soon as one validates, or once the
+        candidates that finished have used up `max_candidate_tokens`. With a
+        repair `prompt`, every candidate is an LLM repair of the current code.
+        """
+        width = self.speculative_width(state)
+        if width == 1 or state.vector_format not in self.format_steps:
+            return await asyncio.to_thread(self.generate_vector_graphics_node, state)
+
+        speculation = state.generation_metadata.setdefault(
+            "speculation", {"candidates": 0, "cancelled": 0, "tokens": 0, "waves": []})
+        budget = state.max_candidate_tokens - speculation["tokens"] if state.max_candidate_tokens else None
+        if budget is not None and budget <= 0:
+            state.validation_errors.append("Speculative token budget exhausted")
+            state.generation_attempts = state.max_attempts
+            return state
+
+        print(f"---{'REPAIRING' if prompt else 'GENERATING'} {width} {state.vector_format.upper()} CANDIDATES---")
+        state.generation_attempts += 1
+        started = time.perf_counter()
+        tasks = [asyncio.create_task(self.generate_candidate(state, i, prompt)) for i in range(width)]
+        winner: Optional[AgentState] = None
+        errors: List[str] = []
+        usage = {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+        spent = 0
+        finished = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                try:
+                    candidate, candidate_usage = await next_done
+                except Exception as e:
+                    finished += 1
+                    errors.append(f"{state.vector_format.upper()} generation error: {str(e)}")
+                    continue
+                finished += 1
+                for key in usage:
+                    usage[key] += candidate_usage.get(key, 0)
+                spent = usage["total_tokens"]
+                if candidate.is_valid:
+                    winner = candidate
+                    break
+                errors.extend(candidate.validation_errors)
+                if budget is not None and spent >= budget:
+                    errors.append("Speculative token budget exhausted")
+                    break
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        speculation["candidates"] += width
+        speculation["cancelled"] += width - finished
+        speculation["tokens"] += spent
+        speculation["waves"].append({
+            "candidates": width,
+            "finished": finished,
+            "tokens": spent,
+            "latency_ms": round((time.perf_counter() - started) * 1000),
+            "valid": winner is not None,
+        })
+
+        if winner is None:
+            state.is_valid = False
+            state.validation_errors.extend(dict.fromkeys(errors))
+            if budget is not None and spent >= budget:
+                state.generation_attempts = state.max_attempts
+            self.record_attempt(state, mode, started, usage)
+            return state
+
+        winner.generation_attempts = state.generation_attempts
+        winner.generation_metadata = {**winner.generation_metadata, "speculation": speculation}
+        self.record_attempt(winner, mode, started, usage)
+        return winner
+
+    async def aspeculative_refinement_node(self, state: AgentState) -> AgentState:
+        if state.is_valid or state.generation_attempts >= state.max_attempts:
+            return state
+        if self.speculative_width(state) == 1:
+            return await asyncio.to_thread(self.refinement_node, state)
+        print(f"---REFINING {state.vector_format.upper()} SPECULATIVELY (Attempt {state.generation_attempts})---")
+        if state.vector_format not in self.format_steps or not state.vector_code:
+            # Nothing to repair (the generation itself failed); start over
+            state.validation_errors = []
+            return await self.speculative_generation_node(state)
+
+        # Same repair-first order as refinement_node: local fixes, then LLM repairs of the
+        # current code and its errors, raced across the candidates
+        started = time.perf_counter()
+        state, errors = await asyncio.to_thread(self.try_local_repair, state)
+        if state.is_valid:
+            state.generation_attempts += 1
+            self.record_attempt(state, "local_repair", started, {})
+            return state
+        state.validation_errors = []
+        return await self.speculative_generation_node(state, self.repair_prompt(state, errors), "llm_repair")
 
 def create_vector_graphics_graph() -> StateGraph:
     """Create the enhanced vector graphics generation graph."""
     
     agent = VectorGraphicsAgent()
+    # Warm the PDF sandbox along with the graph (registry load/warm-up), not at import;
+    # render() starts it on demand otherwise
+    if PDF_EXECUTION:
+        pdf_sandbox.get_sandbox().start()
     
     workflow = StateGraph(AgentState)
     
     # Add nodes
-    workflow.add_node("generator", agent.generate_vector_graphics_node)
+    # Async runs (the API) can generate speculative candidates; sync runs stay serial
+    workflow.add_node("generator", RunnableLambda(
+        agent.generate_vector_graphics_node, afunc=agent.speculative_generation_node))
     workflow.add_node("validator", agent.validate_vector_code)
-    workflow.add_node("refiner", agent.refinement_node)
+    workflow.add_node("refiner", RunnableLambda(
+        agent.refinement_node, afunc=agent.aspeculative_refinement_node))
+    workflow.add_node("converter", agent.convert_formats_node)
     
     # Set entry point
     workflow.set_entry_point("generator")
     
+    def finished(state: AgentState) -> str:
+        return "converter" if state.is_valid and state.target_formats else "end"
+    
     # Add conditional edges
     workflow.add_conditional_edges(
         "generator",
-        lambda state: "end" if state.is_valid else ("refiner" if state.generation_attempts < state.max_attempts else "end"),
+        lambda state: finished(state) if state.is_valid else ("refiner" if state.generation_attempts < state.max_attempts else "end"),
         {
             "refiner": "refiner",
+            "converter": "converter",
             "end": END
         }
     )
     
     workflow.add_conditional_edges(
         "refiner",
-        lambda state: "end" if state.is_valid or state.generation_attempts >= state.max_attempts else "refiner",
+        lambda state: finished(state) if state.is_valid or state.generation_attempts >= state.max_attempts else "refiner",
         {
             "refiner": "refiner",
+            "converter": "converter",
             "end": END
         }
     )
+    workflow.add_edge("converter", END)
     
     return workflow.compile()
 
+def astream_svg_generation(state: AgentState):
+    """Progressive SVG generation outside the graph (see VectorGraphicsAgent.astream_svg)."""
+    return VectorGraphicsAgent().astream_svg(state)
+
 def generate_vector_graphics(
     prompt: str,
     vector_format: str = "svg",
@@ -1,55 +1,47 @@
 from dotenv import load_dotenv
+import asyncio
 import os
-import tempfile
+import re
+from typing import AsyncIterator, Callable, List
 import whisper
-import ffmpeg
-from langchain_openai import AzureChatOpenAI
-from elevenlabs.client import ElevenLabs
+
+# Local imports
+from app.services.clients import clients
+from app.services.stt import STTService, WHISPER_MODEL
+from app.services.audio import decode_audio_bytes
+from app.services.vad import split_for_inference
 
 # Load environment variables
 load_dotenv()
 
 # Whisper STT
-whisper_model = whisper.load_model("base")
+# Transcription runs on a worker pool; the model loaded at import serves the first worker
+# and is only ever used through the pool
+stt_service = STTService(lambda: whisper.load_model(WHISPER_MODEL))
+stt_service.seed_model(whisper.load_model(WHISPER_MODEL))
 ELEVEN_VOICE_ID = os.getenv("ELEVENLABS_VOICE_ID")
-ELEVEN_API_KEY = os.getenv("ELEVENLABS_API_KEY")
+ELEVEN_MODEL_ID = "eleven_multilingual_v2"
+ELEVEN_VOICE_SETTINGS = {"stability": 0.5, "similarity_boost": 0.75}
+
+# Pipelined mode: sentences shorter than this are merged with the next one
+# so TTS isn't asked for a string of tiny clips
+MIN_SENTENCE_CHARS = int(os.getenv("TTS_MIN_SENTENCE_CHARS", "40"))
+TTS_MAX_CONCURRENCY = int(os.getenv("TTS_MAX_CONCURRENCY", "3"))
 
 # Chat
-llm = AzureChatOpenAI(
-    api_version="2024-02-01",
-    azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-    api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-    azure_deployment=os.getenv("AZURE_OPENAI_DEPLOYMENT"),
-    temperature=0.7
-)
-
-def transcribe_audio(audio_file):
-    """Transcribe using local Whisper model."""
-    print("---TRANSCRIBING AUDIO with Whisper local---")
-    
-    temp_path = ""
-    wav_file = ""
-    try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".webm") as temp:
-            temp.write(audio_file.read())
-            temp_path = temp.name
-
-        wav_file = temp_path.replace(".webm", ".wav")
-        
-        (
-            ffmpeg
-            .input(temp_path)
-            .output(wav_file, acodec='pcm_s16le', ac=1, ar='16k')
-            .run(quiet=True, overwrite_output=True)
-        )
-        
-        result = whisper_model.transcribe(wav_file)
-        return result["text"]
-    finally:
-        if temp_path and os.path.exists(temp_path):
-            os.remove(temp_path)
-        if wav_file and os.path.exists(wav_file):
-            os.remove(wav_file)
+llm = clients.chat_llm(temperature=0.7, api_version="2024-02-01")
+
+async def atranscribe_audio(audio_file):
+    """Transcribes an upload without blocking the event loop, via the STT worker pool."""
+    print("---TRANSCRIBING AUDIO with Whisper worker pool---")
+    audio = await asyncio.to_thread(lambda: decode_audio_bytes(audio_file.read()))
+    # Silence is trimmed before inference; long recordings are split at pauses
+    # and the pieces are micro-batched together by the STT service
+    segments = await asyncio.to_thread(split_for_inference, audio)
+    if not segments:
+        return ""
+    texts = await asyncio.gather(*(stt_service.transcribe(segment) for segment in segments))
+    return " ".join(text for text in texts if text)
 
 
 def get_chat_response(history: list, user_input: str):
@@ -63,16 +55,123 @@ def synthesize_speech(text_input: str):
     """Synthesizes speech using the ElevenLabs client."""
     print("---SYNTHESIZING SPEECH WITH 11LABS---")
 
-    client = ElevenLabs(api_key=ELEVEN_API_KEY)
-    
+    client = clients.elevenlabs()
+
     audio_stream = client.text_to_speech.stream(
         text=text_input,
-        voice_id=ELEVEN_VOICE_ID,      
-        model_id="eleven_multilingual_v2", 
-        voice_settings={             
-            "stability": 0.5,
-            "similarity_boost": 0.75
-        }
+        voice_id=ELEVEN_VOICE_ID,
+        model_id=ELEVEN_MODEL_ID,
+        voice_settings=ELEVEN_VOICE_SETTINGS
     )
 
-    return audio_stream
\ No newline at end of file
+    return audio_stream
+
+
+# --- Pipelined LLM -> TTS ---
+
+_SENTENCE_END = re.compile(r"(?<=[.!?…])[\"')\]]*\s+|\n+")
+
+
+class SentenceBuffer:
+    """Accumulates streamed tokens and releases complete sentences."""
+
+    def __init__(self, min_chars: int = MIN_SENTENCE_CHARS):
+        self.min_chars = min_chars
+        self._buffer = ""
+
+    def feed(self, delta: str) -> List[str]:
+        self._buffer += delta
+        sentences = []
+        start = 0
+        for match in _SENTENCE_END.finditer(self._buffer):
+            candidate = self._buffer[start:match.end()].strip()
+            if len(candidate) >= self.min_chars:
+                sentences.append(candidate)
+                start = match.end()
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self) -> List[str]:
+        rest, self._buffer = self._buffer.strip(), ""
+        return [rest] if rest else []
+
+
+async def astream_chat_response(history: list, user_input: str) -> AsyncIterator[str]:
+    """Streams the chat model's reply token by token."""
+    print("---STREAMING CHAT RESPONSE---")
+    messages = history + [{"role": "user", "content": user_input}]
+    async for chunk in llm.astream(messages):
+        if chunk.content:
+            yield chunk.content
+
+
+async def asynthesize_speech(text_input: str) -> AsyncIterator[bytes]:
+    """Streams MP3 audio for `text_input` from the shared async ElevenLabs client."""
+    client = clients.async_elevenlabs()
+    async for chunk in client.text_to_speech.stream(
+        text=text_input,
+        voice_id=ELEVEN_VOICE_ID,
+        model_id=ELEVEN_MODEL_ID,
+        voice_settings=ELEVEN_VOICE_SETTINGS
+    ):
+        yield chunk
+
+
+async def stream_reply_audio(history: list, user_input: str, on_complete: Callable[[str], None]) -> AsyncIterator[bytes]:
+    """Pipelines the reply: sentences go to TTS while the LLM is still generating.
+
+    Audio is yielded in sentence order as soon as it is available. `on_complete`
+    receives the full reply text once the LLM has finished.
+    """
+    print("---PIPELINED CHAT RESPONSE -> SPEECH---")
+    # One audio queue per sentence, queued in order; None marks the end of the reply
+    sentence_queues: asyncio.Queue = asyncio.Queue()
+    tts_slots = asyncio.Semaphore(TTS_MAX_CONCURRENCY)
+    tasks = []
+
+    async def speak(sentence: str, audio: asyncio.Queue):
+        try:
+            async with tts_slots:
+                async for chunk in asynthesize_speech(sentence):
+                    await audio.put(chunk)
+        except Exception as e:
+            print(f"Error synthesizing sentence: {e}")
+        finally:
+            await audio.put(None)
+
+    def start_sentence(sentence: str):
+        audio: asyncio.Queue = asyncio.Queue()
+        tasks.append(asyncio.create_task(speak(sentence, audio)))
+        sentence_queues.put_nowait(audio)
+
+    async def generate():
+        reply = ""
+        buffer = SentenceBuffer()
+        try:
+            async for delta in astream_chat_response(history, user_input):
+                reply += delta
+                for sentence in buffer.feed(delta):
+                    start_sentence(sentence)
+            for sentence in buffer.flush():
+                start_sentence(sentence)
+            on_complete(reply)
+        finally:
+            sentence_queues.put_nowait(None)
+
+    producer = asyncio.create_task(generate())
+    try:
+        while True:
+            audio = await sentence_queues.get()
+            if audio is None:
+                break
+            while True:
+                chunk = await audio.get()
+                if chunk is None:
+                    break
+                yield chunk
+        # Surface LLM errors after whatever audio was produced
+        await producer
+    finally:
+        producer.cancel()
+        for task in tasks:
+            task.cancel()
\ No newline at end of file
@@ -5,29 +5,95 @@ from fastapi.middleware.cors import CORSMiddleware
 from sse_starlette.sse import EventSourceResponse
 import json
 from pydantic import BaseModel
-from typing import Dict
-import pypdf
-from langchain_core.documents import Document
-from fastapi import File, UploadFile, Form, Query, APIRouter
+from typing import List
+from fastapi import File, UploadFile, Form, Query, APIRouter, WebSocket, WebSocketDisconnect
 import uuid
-from langchain_openai import AzureChatOpenAI
+import hashlib
+import asyncio
 from fastapi.responses import StreamingResponse
 from .models import AgentState
 import json
 from fastapi.responses import StreamingResponse
 from sse_starlette.sse import EventSourceResponse
+from contextlib import asynccontextmanager
 
 
 # Local imports
-from .models import CodeAnalyzerState, VoiceAssistantState, ChatState, ChatRequest
-from .agents.svg_agent import create_vector_graphics_graph
-from .agents.data_gen_agent import create_data_gen_graph
-from .agents.doc_intel_agent import process_document, answer_question
-from .agents.code_analyzer_agent import analyze_code
-from .agents.voice_assistant_agent import transcribe_audio, get_chat_response, synthesize_speech
+from .models import CodeAnalyzerState, VoiceAssistantState, ChatState, ChatRequest, DocIntelState, DataGenState
+from .services.session_store import session_store
+from .services.embedding_cache import get_embedding_cache
+from .services.analysis_cache import get_analysis_cache
+from .services import ingestion
+from .services import pdf_extraction
+from .services import pdf_sandbox
+from .services import repo_index
+from .services.clients import clients
+from .services import vad
+from .services import streaming_stt
+from .services.vector_cache import vector_cache, cache_key as vector_cache_key
+from .services.chat_history import HistoryManager
+from .services.semantic_cache import SemanticCache, replay_chunks
+from .services.agent_registry import AgentRegistry
+from fastapi.responses import JSONResponse
 
 load_dotenv()
-app = FastAPI(title="CogniSuite Backend", version="1.0.0")
+
+# Agents (and their LLM clients, graphs and Whisper model) load on first use
+agents = AgentRegistry()
+agents.register("svg", "app.agents.svg_agent", lambda m: m.create_vector_graphics_graph())
+agents.register("data_gen", "app.agents.data_gen_agent", lambda m: m.create_data_gen_graph())
+agents.register("doc_intel", "app.agents.doc_intel_agent")
+agents.register("code_analyzer", "app.agents.code_analyzer_agent")
+agents.register("voice", "app.agents.voice_assistant_agent")
+
+# Keeps Ava and Clara prompts within a token budget by summarizing older turns
+history_manager = HistoryManager(lambda: clients.chat_llm(temperature=0.0))
+
+# Replays Ava's answers to repeated first-turn questions instead of calling the LLM
+EMBEDDING_DEPLOYMENT = os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT", "text-embedding-3-small")
+answer_cache = SemanticCache(lambda: clients.embeddings(EMBEDDING_DEPLOYMENT))
+
+# Comma-separated agent names (or "all") to load in the background at startup
+WARMUP_AGENTS = [name.strip() for name in os.getenv("WARMUP_AGENTS", "").split(",") if name.strip()]
+if WARMUP_AGENTS == ["all"]:
+    WARMUP_AGENTS = agents.names()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Start the background sweeper that evicts idle and over-budget sessions
+    session_store.start_sweeper()
+    # Warm up in the background so uvicorn starts accepting connections immediately
+    warmup = asyncio.create_task(agents.warm_up(WARMUP_AGENTS))
+    yield
+    warmup.cancel()
+    await session_store.stop_sweeper()
+    pdf_extraction.shutdown_pool()
+    pdf_sandbox.shutdown_pool()
+    repo_index.shutdown_pool()
+    await clients.aclose()
+    if agents.is_ready("voice"):
+        await agents.get("voice").stt_service.stop()
+
+
+app = FastAPI(title="CogniSuite Backend", version="1.0.0", lifespan=lifespan)
+
+# Document sessions are persisted on upload. Memory pressure only drops them from memory
+# (they reload on the next question); idle expiry, in memory or on disk, deletes the index.
+session_store.on_evict(DocIntelState, lambda thread_id, state: agents.get("doc_intel").hibernate_document(thread_id, state),
+                       reasons=("lru", "memory"))
+session_store.on_evict(DocIntelState, lambda thread_id, state: agents.get("doc_intel").discard_document(thread_id, state),
+                       reasons=("ttl",))
+
+
+def prune_hibernated_documents() -> None:
+    if agents.is_ready("doc_intel"):
+        agents.get("doc_intel").prune_documents(session_store.ttl_for(DocIntelState),
+                                                lambda thread_id: thread_id in session_store)
+
+
+session_store.on_sweep(prune_hibernated_documents)
+
 router = APIRouter()
 
 
@@ -41,71 +107,112 @@ app.add_middleware(
 
 app.include_router(router)
 
-# Compile graphs on startup
-data_gen_graph = create_data_gen_graph()
-agent_states = {}
-
-
-# Initialize the enhanced vector graphics graph
-vector_graph = create_vector_graphics_graph()
-
-# Global state management for conversations
-conversation_states: Dict[str, VoiceAssistantState] = {}
-
-
 class VectorGraphicsRequest(BaseModel):
     prompt: str
     vector_format: str = "svg"
     style: str = "modern"
     complexity: str = "medium"
     color_scheme: str = "default"
+    use_cache: bool = True
+    # Speculative generation: concurrent candidates per attempt and their total token cap (0 = none)
+    candidates: int = 1
+    max_candidate_tokens: int = 0
+    # Stream SVG elements as they are generated (SVG only; speculative candidates don't apply)
+    progressive: bool = False
+    # Multi-format: generate one SVG and convert it locally to each listed format (e.g. ["svg", "eps", "pdf"])
+    formats: List[str] = []
+
+
+async def stream_vector_graphics(inputs: AgentState, thread_id: str, format_step, format_error,
+                                 use_cache: bool = True, progressive: bool = False):
+    """Runs the vector graphics graph (or replays a cached run) as SSE payloads.
+
+    `format_step(step, output_data, event)` builds each endpoint's event body;
+    cached runs replay the recorded steps through the same formatter. With
+    `progressive` (SVG only), `svg_root` and `svg_element` events are sent as
+    the document streams in, before the usual steps.
+    """
+    config = {"configurable": {"thread_id": thread_id}}
+    key = vector_cache_key(inputs.dict(), os.getenv("AZURE_OPENAI_DEPLOYMENT", ""))
+
+    cached = await asyncio.to_thread(vector_cache.get, key) if use_cache else None
+    if cached is not None:
+        for step, output_data in cached:
+            yield json.dumps(format_step(step, output_data, {}))
+        yield "[DONE]"
+        return
+
+    vector_graph = await agents.aget("svg")
+    steps = []
+    try:
+        if progressive and inputs.vector_format == "svg":
+            from .agents.svg_agent import astream_svg_generation
+
+            async for step, payload in astream_svg_generation(inputs):
+                if step == "svg_root":
+                    yield json.dumps({"step": step, "attributes": payload})
+                elif step == "svg_element":
+                    yield json.dumps({"step": step, "element": payload})
+                else:
+                    output_data = payload.model_dump()
+                    steps.append((step, output_data))
+                    yield json.dumps(format_step(step, output_data, {}))
+            await asyncio.to_thread(vector_cache.put, key, steps)
+            yield "[DONE]"
+            return
+
+        async for event in vector_graph.astream_events(inputs.dict(), config=config, version="v1"):
+            kind = event["event"]
+            if kind == "on_chain_end" and event["name"] != "LangGraph":
+                output = event["data"]["output"]
+                output_data = output.model_dump() if isinstance(output, BaseModel) else output
+                steps.append((event["name"], output_data))
+                yield json.dumps(format_step(event["name"], output_data, event))
+        # Only validated results are kept; the cache checks the final state
+        await asyncio.to_thread(vector_cache.put, key, steps)
+        yield "[DONE]"
+    except Exception as e:
+        print(f"Error during {inputs.vector_format.upper()} generation: {e}")
+        yield json.dumps(format_error(e))
+        yield "[ERROR]"
 
 
 @app.post("/api/generate-vector-graphics")
 async def generate_vector_graphics_endpoint(request: VectorGraphicsRequest):
     """Enhanced endpoint for generating vector graphics in multiple formats."""
 
-    config = {"configurable": {
-        "thread_id": f"cognisuite-vector-{request.vector_format}-thread"}}
+    # Multi-format requests make a single SVG generation and convert it locally
+    target_formats = sorted({fmt for fmt in request.formats if fmt in ("eps", "pdf")})
+    vector_format = "svg" if request.formats else request.vector_format
 
     # Create inputs using the enhanced AgentState
     inputs = AgentState(
         prompt=request.prompt,
-        vector_format=request.vector_format,
+        vector_format=vector_format,
+        target_formats=target_formats,
         style=request.style,
         complexity=request.complexity,
-        color_scheme=request.color_scheme
+        color_scheme=request.color_scheme,
+        speculative_candidates=request.candidates,
+        max_candidate_tokens=request.max_candidate_tokens
     )
 
-    async def event_stream():
-        try:
-            async for event in vector_graph.astream_events(inputs.dict(), config=config, version="v1"):
-                kind = event["event"]
-                if kind == "on_chain_end" and event["name"] != "LangGraph":
-                    output = event["data"]["output"]
-                    output_data = output.model_dump() if isinstance(output, BaseModel) else output
+    def format_step(step, output_data, event):
+        # Enhanced data structure with metadata
+        return {
+            "step": step,
+            "output": output_data,
+            "format": vector_format,
+            "timestamp": event.get("timestamp", ""),
+            "metadata": output_data.get("generation_metadata", {}) if isinstance(output_data, dict) else {}
+        }
 
-                    # Enhanced data structure with metadata
-                    data = json.dumps({
-                        "step": event["name"],
-                        "output": output_data,
-                        "format": request.vector_format,
-                        "timestamp": event.get("timestamp", ""),
-                        "metadata": output_data.get("generation_metadata", {}) if isinstance(output_data, dict) else {}
-                    })
-                    yield data
-            yield "[DONE]"
-        except Exception as e:
-            print(f"Error during vector graphics generation: {e}")
-            error_data = json.dumps({
-                "error": str(e),
-                "step": "error",
-                "format": request.vector_format
-            })
-            yield error_data
-            yield "[ERROR]"
+    def format_error(e):
+        return {"error": str(e), "step": "error", "format": vector_format}
 
-    return EventSourceResponse(event_stream())
+    return EventSourceResponse(stream_vector_graphics(
+        inputs, f"cognisuite-vector-{vector_format}-thread", format_step, format_error,
+        request.use_cache, request.progressive))
 
 
 @app.get("/api/generate-svg")
@@ -116,123 +223,108 @@ async def generate_svg_endpoint(
     complexity: str = Query(
         default="medium", description="Complexity: simple, medium, complex"),
     color_scheme: str = Query(
-        default="default", description="Colors: default, monochrome, vibrant, pastel")
+        default="default", description="Colors: default, monochrome, vibrant, pastel"),
+    use_cache: bool = Query(default=True, description="Replay a cached result for identical inputs"),
+    candidates: int = Query(default=1, description="Candidates generated concurrently; the first valid one wins"),
+    max_candidate_tokens: int = Query(default=0, description="Token cap across all candidates (0 = no cap)"),
+    progressive: bool = Query(default=False, description="Stream SVG elements as they are generated")
 ):
     """Enhanced SVG endpoint with backward compatibility and new style options."""
 
-    config = {"configurable": {"thread_id": "cognisuite-svg-thread"}}
-
     # Use AgentState for SVG generation
     inputs = AgentState(
         prompt=prompt,
         vector_format="svg",
         style=style,
         complexity=complexity,
-        color_scheme=color_scheme
+        color_scheme=color_scheme,
+        speculative_candidates=candidates,
+        max_candidate_tokens=max_candidate_tokens
     )
 
-    async def event_stream():
-        try:
-            async for event in vector_graph.astream_events(inputs.dict(), config=config, version="v1"):
-                kind = event["event"]
-                if kind == "on_chain_end" and event["name"] != "LangGraph":
-                    output = event["data"]["output"]
-                    output_data = output.model_dump() if isinstance(output, BaseModel) else output
+    def format_step(step, output_data, event):
+        # response with validation status
+        return {
+            "step": step,
+            "output": output_data,
+            "is_valid": output_data.get("is_valid", False) if isinstance(output_data, dict) else False,
+            "validation_errors": output_data.get("validation_errors", []) if isinstance(output_data, dict) else [],
+            "generation_attempts": output_data.get("generation_attempts", 1) if isinstance(output_data, dict) else 1
+        }
 
-                    # response with validation status
-                    data = json.dumps({
-                        "step": event["name"],
-                        "output": output_data,
-                        "is_valid": output_data.get("is_valid", False) if isinstance(output_data, dict) else False,
-                        "validation_errors": output_data.get("validation_errors", []) if isinstance(output_data, dict) else [],
-                        "generation_attempts": output_data.get("generation_attempts", 1) if isinstance(output_data, dict) else 1
-                    })
-                    yield data
-            yield "[DONE]"
-        except Exception as e:
-            print(f"Error during SVG generation: {e}")
-            error_data = json.dumps({
-                "error": str(e),
-                "step": "error",
-                "is_valid": False,
-                "validation_errors": [str(e)]
-            })
-            yield error_data
-            yield "[ERROR]"
+    def format_error(e):
+        return {"error": str(e), "step": "error", "is_valid": False, "validation_errors": [str(e)]}
 
-    return EventSourceResponse(event_stream())
+    return EventSourceResponse(stream_vector_graphics(
+        inputs, "cognisuite-svg-thread", format_step, format_error, use_cache, progressive))
 
 
 @app.get("/api/generate-eps")
 async def generate_eps_endpoint(
     prompt: str,
-    style: str = Query(default="modern", description="Style preference")
+    style: str = Query(default="modern", description="Style preference"),
+    use_cache: bool = Query(default=True, description="Replay a cached result for identical inputs"),
+    candidates: int = Query(default=1, description="Candidates generated concurrently; the first valid one wins"),
+    max_candidate_tokens: int = Query(default=0, description="Token cap across all candidates (0 = no cap)")
 ):
     """Endpoint specifically for EPS generation."""
 
-    config = {"configurable": {"thread_id": "cognisuite-eps-thread"}}
     inputs = AgentState(
         prompt=prompt,
         vector_format="eps",
-        style=style
+        style=style,
+        speculative_candidates=candidates,
+        max_candidate_tokens=max_candidate_tokens
     )
 
-    async def event_stream():
-        try:
-            async for event in vector_graph.astream_events(inputs.dict(), config=config, version="v1"):
-                kind = event["event"]
-                if kind == "on_chain_end" and event["name"] != "LangGraph":
-                    output = event["data"]["output"]
-                    output_data = output.model_dump() if isinstance(output, BaseModel) else output
-                    data = json.dumps({
-                        "step": event["name"],
-                        "output": output_data,
-                        "format": "eps"
-                    })
-                    yield data
-            yield "[DONE]"
-        except Exception as e:
-            print(f"Error during EPS generation: {e}")
-            yield json.dumps({"error": str(e), "format": "eps"})
-            yield "[ERROR]"
+    def format_step(step, output_data, event):
+        return {"step": step, "output": output_data, "format": "eps"}
 
-    return EventSourceResponse(event_stream())
+    def format_error(e):
+        return {"error": str(e), "format": "eps"}
+
+    return EventSourceResponse(stream_vector_graphics(
+        inputs, "cognisuite-eps-thread", format_step, format_error, use_cache))
 
 
 @app.get("/api/generate-pdf")
 async def generate_pdf_endpoint(
     prompt: str,
-    style: str = Query(default="modern", description="Style preference")
+    style: str = Query(default="modern", description="Style preference"),
+    use_cache: bool = Query(default=True, description="Replay a cached result for identical inputs"),
+    candidates: int = Query(default=1, description="Candidates generated concurrently; the first valid one wins"),
+    max_candidate_tokens: int = Query(default=0, description="Token cap across all candidates (0 = no cap)")
 ):
     """Endpoint specifically for PDF vector graphics generation."""
 
-    config = {"configurable": {"thread_id": "cognisuite-pdf-thread"}}
     inputs = AgentState(
         prompt=prompt,
         vector_format="pdf",
-        style=style
+        style=style,
+        speculative_candidates=candidates,
+        max_candidate_tokens=max_candidate_tokens
     )
 
-    async def event_stream():
-        try:
-            async for event in vector_graph.astream_events(inputs.dict(), config=config, version="v1"):
-                kind = event["event"]
-                if kind == "on_chain_end" and event["name"] != "LangGraph":
-                    output = event["data"]["output"]
-                    output_data = output.model_dump() if isinstance(output, BaseModel) else output
-                    data = json.dumps({
-                        "step": event["name"],
-                        "output": output_data,
-                        "format": "pdf"
-                    })
-                    yield data
-            yield "[DONE]"
-        except Exception as e:
-            print(f"Error during PDF generation: {e}")
-            yield json.dumps({"error": str(e), "format": "pdf"})
-            yield "[ERROR]"
+    def format_step(step, output_data, event):
+        return {"step": step, "output": output_data, "format": "pdf"}
 
-    return EventSourceResponse(event_stream())
+    def format_error(e):
+        return {"error": str(e), "format": "pdf"}
+
+    return EventSourceResponse(stream_vector_graphics(
+        inputs, "cognisuite-pdf-thread", format_step, format_error, use_cache))
+
+
+@app.get("/api/vector-cache/stats")
+async def vector_cache_stats():
+    """Reports hit rate and size of the vector graphics result cache."""
+    return vector_cache.stats()
+
+
+@app.get("/api/pdf-sandbox/stats")
+async def pdf_sandbox_stats():
+    """Reports sandboxed PDF rendering jobs, failures, timeouts and cache hits."""
+    return pdf_sandbox.get_sandbox().stats()
 
 
 @app.get("/api/supported-formats")
@@ -275,12 +367,31 @@ async def validate_vector_code(code: str, format: str):
 # --- Data Generator Endpoint ---
 @app.get("/api/generate-data")
 async def generate_data_endpoint(prompt: str, count: int):
-    """Endpoint to generate synthetic JSON data."""
+    """Endpoint to generate synthetic JSON data.
+
+    Counts above the shard size are generated in concurrent shards and
+    streamed as `records` events before the merged array.
+    """
     config = {"configurable": {"thread_id": "cognisuite-datagen-thread"}}
     inputs = {"prompt": prompt, "count": count}
 
+    data_gen_graph = await agents.aget("data_gen")
+
     async def event_stream():
         try:
+            from .agents.data_gen_agent import astream_data_generation, needs_sharding
+
+            state = DataGenState(**inputs)
+            if needs_sharding(state):
+                # Large counts: stream each shard's new (deduplicated) records as it finishes
+                async for step, payload in astream_data_generation(state):
+                    if step == "records":
+                        yield json.dumps({"step": step, **payload})
+                    else:
+                        yield json.dumps({"step": step, "output": payload.model_dump()})
+                yield "[DONE]"
+                return
+
             async for event in data_gen_graph.astream_events(inputs, config=config, version="v1"):
                 kind = event["event"]
                 if kind == "on_chain_end" and event["name"] != "LangGraph":
@@ -299,47 +410,120 @@ async def generate_data_endpoint(prompt: str, count: int):
     return EventSourceResponse(event_stream())
 
 
+# Keep references to background ingestions so they aren't garbage collected mid-flight
+ingestion_tasks = set()
+
+
+async def ingest_document(thread_id: str, pdf_bytes: bytes, progress: ingestion.IngestionProgress):
+    """Extracts, embeds, indexes, persists and stores a document session, reporting progress."""
+    try:
+        doc_agent = await agents.aget("doc_intel")
+
+        # Pages are extracted in a process pool and streamed into the chunker
+        pages = pdf_extraction.extract_pages(pdf_bytes, progress)
+
+        # Process the document and create the initial state
+        initial_state = await doc_agent.aprocess_document(pages, progress)
+        initial_state.thread_id = thread_id
+
+        # Persist the index so the session survives restarts and can be hibernated
+        progress.update(status="persisting")
+        await asyncio.to_thread(doc_agent.save_document_index, initial_state)
+
+        # Store the state
+        session_store.put(thread_id, initial_state)
+        ingestion.finish_progress(progress)
+    except Exception as e:
+        print(f"Error during document ingestion {thread_id}: {e}")
+        ingestion.finish_progress(progress, error=str(e))
+        raise
+
+
 @app.post("/api/doc-intel/upload")
-async def doc_intel_upload(file: UploadFile = File(...)):
-    """Handles PDF file upload, processes it, and returns a thread_id."""
+async def doc_intel_upload(file: UploadFile = File(...), background: bool = Query(default=False)):
+    """Handles PDF file upload, processes it, and returns a thread_id.
+
+    With `background=true` the call returns immediately and progress can be
+    followed over SSE at /api/doc-intel/progress.
+    """
     thread_id = str(uuid.uuid4())
     print(f"Starting new document session: {thread_id}")
 
     # Read PDF content
-    pdf_reader = pypdf.PdfReader(file.file)
-    text_content = "".join(page.extract_text() for page in pdf_reader.pages)
-    docs = [Document(page_content=text_content)]
-
-    # Process the document and create the initial state
-    initial_state = process_document(docs)
-    initial_state.thread_id = thread_id
+    try:
+        pdf_bytes = await pdf_extraction.read_upload(file)
+    except pdf_extraction.PdfTooLargeError as e:
+        return {"error": str(e)}
+    progress = ingestion.start_progress(thread_id)
+
+    if background:
+        task = asyncio.create_task(ingest_document(thread_id, pdf_bytes, progress))
+        ingestion_tasks.add(task)
+        task.add_done_callback(ingestion_tasks.discard)
+        return {
+            "thread_id": thread_id,
+            "message": "Document processing started.",
+            "progress_url": f"/api/doc-intel/progress?thread_id={thread_id}",
+        }
 
-    # Store the state
-    agent_states[thread_id] = initial_state
+    try:
+        await ingest_document(thread_id, pdf_bytes, progress)
+    except Exception as e:
+        return {"error": f"Document processing failed: {e}"}
 
     return {"thread_id": thread_id, "message": "Document processed successfully."}
 
 
+@app.get("/api/doc-intel/progress")
+async def doc_intel_progress(thread_id: str):
+    """Streams ingestion progress for a document upload until it finishes."""
+    progress = ingestion.get_progress(thread_id)
+    if progress is None:
+        return {"error": "No ingestion in progress for this session."}
+
+    async def event_stream():
+        while True:
+            yield json.dumps(progress.snapshot())
+            if progress.finished:
+                break
+            await progress.wait_for_change()
+        yield "[ERROR]" if progress.status == "failed" else "[DONE]"
+
+    return EventSourceResponse(event_stream())
+
+
 @app.get("/api/doc-intel/ask")
 async def doc_intel_ask(thread_id: str, question: str):
     """Answers a question about an uploaded document using streaming."""
-    if thread_id not in agent_states:
-        return {"error": "Invalid session ID."}
+    progress = ingestion.get_progress(thread_id)
+    if progress is not None and not progress.finished:
+        return {"error": "Document is still being processed."}
+
+    doc_agent = await agents.aget("doc_intel")
+    current_state = session_store.get(thread_id, DocIntelState)
+    if current_state is None:
+        # Hibernated or from before a restart: reload the index from disk lazily
+        try:
+            current_state = await asyncio.to_thread(doc_agent.load_document_state, thread_id)
+        except Exception as e:
+            print(f"Error reloading document {thread_id}: {e}")
+            current_state = None
+        if current_state is None:
+            return {"error": "Invalid session ID."}
+        session_store.put(thread_id, current_state)
 
-    # Get the current state
-    current_state = agent_states[thread_id]
     current_state.question = question
 
     async def event_stream():
         try:
-            # Get the answer from the agent function
-            updated_state = answer_question(current_state)
+            # Stream tokens as the model produces them
+            async for delta in doc_agent.astream_answer(current_state):
+                yield json.dumps({"delta": delta})
             # Save updated state if needed
-            agent_states[thread_id] = updated_state
+            session_store.put(thread_id, current_state)
 
-            # Stream the result
-            data = json.dumps({"answer": updated_state.answer})
-            yield data
+            # Final event carries the full answer for clients that don't accumulate deltas
+            yield json.dumps({"answer": current_state.answer})
             yield "[DONE]"
         except Exception as e:
             print(f"Error during doc-intel stream: {e}")
@@ -348,20 +532,44 @@ async def doc_intel_ask(thread_id: str, question: str):
     return EventSourceResponse(event_stream())
 
 
+@app.get("/api/doc-intel/cache-stats")
+async def doc_intel_cache_stats():
+    """Reports embedding cache size and hit rate."""
+    return await asyncio.to_thread(get_embedding_cache().stats)
+
+
 @app.post("/api/code-analyzer/upload")
 async def code_analyzer_upload(file: UploadFile = File(...)):
-    """Handles code file upload, reads it, and returns a thread_id."""
+    """Handles code file upload, reads it, and returns a thread_id.
+
+    Zip and tar archives are indexed as a repository: only a compact static
+    index and the highest-ranked files are kept for the analysis.
+    """
     thread_id = str(uuid.uuid4())
     print(f"Starting new code analysis session: {thread_id}")
 
+    head = await file.read(512)
+    await file.seek(0)
+    if repo_index.is_archive(file.filename, head):
+        try:
+            summary = await asyncio.to_thread(repo_index.summarize_archive, file.file, file.filename or "")
+        except repo_index.ArchiveError as e:
+            return {"error": str(e)}
+        initial_state = CodeAnalyzerState(
+            thread_id=thread_id, code_content=summary["hot_files"], filename=file.filename or "",
+            repo_index=summary["index"], repo_stats=summary["stats"])
+        session_store.put(thread_id, initial_state)
+        return {"thread_id": thread_id, "message": "Repository archive indexed successfully.",
+                "repository": summary["stats"]}
+
     # Read the content of the uploaded file
     code_content_bytes = await file.read()
     code_content = code_content_bytes.decode("utf-8")
 
     # Create and store the initial state
     initial_state = CodeAnalyzerState(
-        thread_id=thread_id, code_content=code_content)
-    agent_states[thread_id] = initial_state
+        thread_id=thread_id, code_content=code_content, filename=file.filename or "")
+    session_store.put(thread_id, initial_state)
 
     return {"thread_id": thread_id, "message": "Code file uploaded successfully."}
 
@@ -369,20 +577,22 @@ async def code_analyzer_upload(file: UploadFile = File(...)):
 @app.get("/api/code-analyzer/analyze")
 async def code_analyzer_analyze(thread_id: str):
     """Analyzes the code associated with a thread_id and streams the result."""
-    if thread_id not in agent_states:
+    current_state = session_store.get(thread_id, CodeAnalyzerState)
+    if current_state is None:
         return {"error": "Invalid session ID."}
 
-    current_state = agent_states[thread_id]
+    code_agent = await agents.aget("code_analyzer")
 
     async def event_stream():
         try:
-            # Get the analysis from the agent function
-            updated_state = analyze_code(current_state)
-            agent_states[thread_id] = updated_state 
-
-            # Stream the result
-            data = json.dumps({"analysis": updated_state.analysis})
-            yield data
+            # Stream tokens as the model produces them (plus progress/section events for large files)
+            async for event in code_agent.astream_analysis(current_state):
+                yield json.dumps(event)
+            session_store.put(thread_id, current_state)
+
+            # Final event carries the full report for clients that don't accumulate deltas,
+            # plus how much of it came from the analysis cache
+            yield json.dumps({"analysis": current_state.analysis, "cache": current_state.cache_report})
             yield "[DONE]"
         except Exception as e:
             print(f"Error during code analysis stream: {e}")
@@ -391,11 +601,13 @@ async def code_analyzer_analyze(thread_id: str):
     return EventSourceResponse(event_stream())
 
 
-@app.post("/api/voice-assistant/chat")
-async def voice_assistant_chat(thread_id: str = Form(...), file: UploadFile = File(...)):
-    """Handles a full voice chat interaction: STT -> LLM -> TTS"""
+@app.get("/api/code-analyzer/cache-stats")
+async def code_analyzer_cache_stats():
+    """Reports analysis cache size, hit rate and tokens saved."""
+    return await asyncio.to_thread(get_analysis_cache().stats)
 
-    system_prompt = """Your name is Clara. You are a voice AI assistant for the CogniSuite platform. Your personality is friendly, clear, and a little bit quirky. Keep your responses brief and conversational, suitable for a voice interface.
+
+CLARA_SYSTEM_PROMPT = """Your name is Clara. You are a voice AI assistant for the CogniSuite platform. Your personality is friendly, clear, and a little bit quirky. Keep your responses brief and conversational, suitable for a voice interface.
 
 **About Your Creator:**
 If a user asks who created or built you, you must respond in a playful tone. Explain that you are part of the CogniSuite project, which was masterfully created by Yatharth Mishra.
@@ -421,34 +633,148 @@ You must guide users and answer questions about the following tools available in
 **About Your Capabilities:**
 If asked what you can do, mention you can answer questions and hold a conversation through voice.
 """
-    if thread_id in agent_states and isinstance(agent_states[thread_id], VoiceAssistantState):
-        current_state = agent_states[thread_id]
-    else:
+
+
+@app.post("/api/voice-assistant/chat")
+async def voice_assistant_chat(thread_id: str = Form(...), file: UploadFile = File(...), pipelined: bool = Form(default=False)):
+    """Handles a full voice chat interaction: STT -> LLM -> TTS
+
+    With `pipelined=true` the reply is spoken sentence by sentence while the
+    LLM is still generating, which cuts time-to-first-audio on long answers.
+    """
+    current_state = session_store.get(thread_id, VoiceAssistantState)
+    if current_state is None:
         thread_id = str(uuid.uuid4())
         current_state = VoiceAssistantState(chat_history=[
-            {"role": "system", "content": system_prompt}
+            {"role": "system", "content": CLARA_SYSTEM_PROMPT}
         ])
-        agent_states[thread_id] = current_state
 
-    user_text = transcribe_audio(file.file)
-    current_state.chat_history.append({"role": "user", "content": user_text})
+    voice_agent = await agents.aget("voice")
+    user_text = await voice_agent.atranscribe_audio(file.file)
+    if not user_text.strip():
+        # Silent clip: nothing to send to the LLM
+        return StreamingResponse(voice_agent.synthesize_speech("Sorry, I didn't catch that. Could you say it again?"),
+                                 media_type="audio/mpeg")
+    history, _ = history_manager.build_prompt(current_state, user_text)
+
+    def save_turn(ai_text: str):
+        current_state.chat_history.append({"role": "user", "content": user_text})
+        current_state.chat_history.append(
+            {"role": "assistant", "content": ai_text})
+        session_store.put(thread_id, current_state)
+        history_manager.schedule_compaction(thread_id, current_state, lambda: session_store.put(thread_id, current_state))
 
-    ai_text = get_chat_response(current_state.chat_history, user_text)
-    current_state.chat_history.append(
-        {"role": "assistant", "content": ai_text})
+    if pipelined:
+        audio_stream = voice_agent.stream_reply_audio(history, user_text, save_turn)
+        return StreamingResponse(audio_stream, media_type="audio/mpeg")
 
-    audio_stream = synthesize_speech(ai_text)
+    ai_text = await asyncio.to_thread(voice_agent.get_chat_response, history, user_text)
+    save_turn(ai_text)
+
+    audio_stream = voice_agent.synthesize_speech(ai_text)
 
     return StreamingResponse(audio_stream, media_type="audio/mpeg")
 
-# --- AI Assistant Chat Endpoint ---
+@app.websocket("/api/voice-assistant/stream")
+async def voice_assistant_stream(websocket: WebSocket, encoding: str = "webm", thread_id: str = "new", respond: bool = False):
+    """Streaming speech-to-text over a WebSocket.
+
+    The client sends binary audio frames while recording (`encoding=webm` for
+    MediaRecorder output, `pcm_s16le` for raw 16 kHz mono) and the text frame
+    {"type": "end"} when it stops recording. The server sends
+    {"type": "partial", "text"} while the user speaks and {"type": "final", "text"}
+    when the utterance ends, either on "end" or after a pause detected by VAD.
+    With `respond=true` Clara answers each final transcript with
+    {"type": "reply_delta", "delta"} events and a closing {"type": "reply", "text", "thread_id"}.
+    """
+    await websocket.accept()
+    voice_agent = await agents.aget("voice")
+
+    def new_decoder():
+        return streaming_stt.PcmDecoder() if encoding == "pcm_s16le" else streaming_stt.FfmpegStreamDecoder()
+
+    decoder = new_decoder()
+    transcriber = streaming_stt.StreamingTranscriber(voice_agent.stt_service.transcribe)
+    background = set()
+
+    async def send_partial(task):
+        try:
+            text = await task
+        except asyncio.CancelledError:
+            return
+        except Exception as e:
+            print(f"Error during partial transcription: {e}")
+            return
+        if text:
+            await websocket.send_json({"type": "partial", "text": text})
+
+    async def reply(user_text: str):
+        nonlocal thread_id
+        current_state = session_store.get(thread_id, VoiceAssistantState)
+        if current_state is None:
+            thread_id = str(uuid.uuid4())
+            current_state = VoiceAssistantState(chat_history=[
+                {"role": "system", "content": CLARA_SYSTEM_PROMPT}
+            ])
+        history, _ = history_manager.build_prompt(current_state, user_text)
+        ai_text = ""
+        async for delta in voice_agent.astream_chat_response(history, user_text):
+            ai_text += delta
+            await websocket.send_json({"type": "reply_delta", "delta": delta})
+        current_state.chat_history.append({"role": "user", "content": user_text})
+        current_state.chat_history.append({"role": "assistant", "content": ai_text})
+        session_store.put(thread_id, current_state)
+        state_thread_id = thread_id
+        history_manager.schedule_compaction(
+            thread_id, current_state, lambda: session_store.put(state_thread_id, current_state))
+        await websocket.send_json({"type": "reply", "text": ai_text, "thread_id": thread_id})
+
+    async def finish_utterance():
+        text = await transcriber.finalize()
+        await websocket.send_json({"type": "final", "text": text})
+        if respond and text:
+            await reply(text)
 
-@app.get("/api/assistant/chat")
-async def assistant_chat(thread_id: str, message: str):
-    """Handles a text-based chat message and streams the response."""
-    thread_id = thread_id
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message.get("bytes"):
+                await decoder.feed(message["bytes"])
+                transcriber.append(decoder.drain())
+                if transcriber.partial_due():
+                    if await asyncio.to_thread(transcriber.utterance_ended):
+                        await finish_utterance()
+                    else:
+                        task = asyncio.create_task(send_partial(transcriber.start_partial()))
+                        background.add(task)
+                        task.add_done_callback(background.discard)
+            elif message.get("text"):
+                try:
+                    control = json.loads(message["text"])
+                except ValueError:
+                    continue
+                if control.get("type") == "end":
+                    # Flush the decoder so the tail of the recording is included
+                    await decoder.close()
+                    transcriber.append(decoder.drain())
+                    await finish_utterance()
+                    # The next recording starts a new container stream
+                    decoder = new_decoder()
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        print(f"Error during voice stream: {e}")
+    finally:
+        for task in background:
+            task.cancel()
+        await decoder.close()
 
-    system_prompt = """You are Ava, the master AI assistant for the CogniSuite platform. Your personality is helpful, knowledgeable, and slightly enthusiastic.
+
+# --- AI Assistant Chat Endpoint ---
+
+AVA_SYSTEM_PROMPT = """You are Ava, the master AI assistant for the CogniSuite platform. Your personality is helpful, knowledgeable, and slightly enthusiastic.
 
 **About the Platform:**
 CogniSuite is a powerful application featuring a suite of specialized AI agents, designed to showcase advanced AI capabilities.
@@ -481,39 +807,62 @@ You must guide users and answer questions about the following tools available in
     - Email: yatharth.mishra2002@gmail.com
 """
 
-    if thread_id != 'new' and thread_id in agent_states and isinstance(agent_states[thread_id], ChatState):
-        current_state = agent_states[thread_id]
-    else:
+# Cached answers are only valid for the prompt (and deployment) that produced them
+ANSWER_CACHE_SCOPE = hashlib.sha256(
+    f"{os.getenv('AZURE_OPENAI_DEPLOYMENT')}\0{AVA_SYSTEM_PROMPT}".encode("utf-8")).hexdigest()[:16]
+
+
+@app.get("/api/assistant/chat")
+async def assistant_chat(thread_id: str, message: str):
+    """Handles a text-based chat message and streams the response."""
+    thread_id = thread_id
+
+    current_state = session_store.get(thread_id, ChatState) if thread_id != 'new' else None
+    if current_state is None:
         thread_id = str(uuid.uuid4())
         current_state = ChatState(
             thread_id=thread_id,
-            chat_history=[{"role": "system", "content": system_prompt}]
+            chat_history=[{"role": "system", "content": AVA_SYSTEM_PROMPT}]
         )
 
-    current_state.chat_history.append({"role": "user", "content": message})
+    # Only first-turn questions are answered from the cache; later turns depend on the conversation
+    cache_scope = ANSWER_CACHE_SCOPE if len(current_state.chat_history) == 1 and answer_cache.cacheable(message) else None
 
-    chat_llm = AzureChatOpenAI(
-        api_version="2024-10-21",
-        azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-        api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-        azure_deployment=os.getenv("AZURE_OPENAI_DEPLOYMENT"),
-        temperature=0.7
-    )
+    chat_llm = clients.chat_llm(temperature=0.7)
+    messages, prompt_metrics = history_manager.build_prompt(current_state, message)
+    messages = messages + [{"role": "user", "content": message}]
+    current_state.chat_history.append({"role": "user", "content": message})
 
     async def event_stream():
         try:
-            stream = chat_llm.stream(current_state.chat_history)
+            cached, question_vector = (None, None)
+            if cache_scope is not None:
+                cached, question_vector = await answer_cache.lookup(cache_scope, message)
+
             ai_response = ""
-            for chunk in stream:
-                ai_response += chunk.content
-                data = json.dumps(
-                    {"thread_id": thread_id, "delta": chunk.content})
-                yield data
+            if cached is not None:
+                for delta in replay_chunks(cached):
+                    ai_response += delta
+                    yield json.dumps({"thread_id": thread_id, "delta": delta})
+            else:
+                async for chunk in chat_llm.astream(messages):
+                    ai_response += chunk.content
+                    data = json.dumps(
+                        {"thread_id": thread_id, "delta": chunk.content})
+                    yield data
+                if cache_scope is not None:
+                    answer_cache.store(cache_scope, message, ai_response, question_vector)
 
             current_state.chat_history.append(
                 {"role": "assistant", "content": ai_response})
-            agent_states[thread_id] = current_state
-
+            session_store.put(thread_id, current_state)
+            history_manager.schedule_compaction(
+                thread_id, current_state, lambda: session_store.put(thread_id, current_state))
+
+            usage = dict(prompt_metrics, cached=cached is not None)
+            if cached is not None:
+                usage["prompt_tokens"] = 0
+            yield json.dumps({"thread_id": thread_id, "usage": usage})
             yield "[DONE]"
         except Exception as e:
             print(f"Error during assistant chat stream: {e}")
@@ -522,6 +871,51 @@ You must guide users and answer questions about the following tools available in
     return EventSourceResponse(event_stream())
 
 
+@app.get("/api/sessions/stats")
+async def session_stats():
+    """Reports session store size, memory estimate and eviction metrics."""
+    return session_store.stats()
+
+
+@app.get("/api/voice-assistant/stt-stats")
+async def stt_stats():
+    """Reports transcription queue depth, batching and latency metrics."""
+    if not agents.is_ready("voice"):
+        return {"status": "not_loaded", "vad": vad.stats()}
+    return {**agents.get("voice").stt_service.stats(), "vad": vad.stats()}
+
+
+@app.get("/api/chat/metrics")
+async def chat_metrics():
+    """Reports prompt-token usage, savings from history compaction and answer cache hit rate."""
+    return {**history_manager.stats(), "answer_cache": answer_cache.stats()}
+
+
+@app.get("/api/clients/stats")
+async def client_stats():
+    """Reports connection pool utilization for the shared provider clients."""
+    return clients.stats()
+
+
+@app.get("/health/ready")
+async def health_ready():
+    """Per-agent readiness. Returns 503 until every agent named in WARMUP_AGENTS has loaded."""
+    readiness = agents.readiness()
+    ready = all(readiness[name]["status"] == "ready" for name in WARMUP_AGENTS if name in readiness)
+    return JSONResponse({"ready": ready, "agents": readiness}, status_code=200 if ready else 503)
+
+
+@app.post("/health/warmup")
+async def health_warmup(names: str = Query(default="all", description="Comma-separated agent names, or 'all'")):
+    """Explicit warm-up hook: loads the requested agents and reports readiness."""
+    requested = agents.names() if names == "all" else [name.strip() for name in names.split(",") if name.strip()]
+    unknown = [name for name in requested if name not in agents.names()]
+    if unknown:
+        return {"error": f"Unknown agents: {', '.join(unknown)}"}
+    await agents.warm_up(requested)
+    return {"agents": agents.readiness()}
+
+
 @app.get("/")
 def read_root():
     return {"message": "Welcome to the CogniSuite API"}
@@ -25,6 +25,10 @@ class DataGenState(BaseModel):
     prompt: str
     count: int
     generated_json: str = ""
+    # Sharded generation (large counts): shared field spec + exemplar records, dedup key fields and run stats
+    record_schema: str = ""
+    key_fields: List[str] = []
+    shard_stats: Dict[str, Any] = {}
 
 
 class DocIntelState(BaseModel):
@@ -40,11 +44,21 @@ class CodeAnalyzerState(BaseModel):
     """State for the code analyzer agent."""
     thread_id: str = ""
     code_content: str = ""
+    # Uploaded file name; picks the chunking strategy for large files
+    filename: str = ""
     analysis: str = ""
+    # Analysis cache hits / tokens saved for the last analysis
+    cache_report: Dict[str, Any] = {}
+    # Archive uploads: compact static index of the repository; code_content holds the hot files
+    repo_index: str = ""
+    repo_stats: Dict[str, Any] = {}
     
 class VoiceAssistantState(BaseModel):
     """State for the voice assistant."""
     chat_history: List[Dict[str, str]] = []
+    # Older turns folded out of chat_history by the history manager
+    history_summary: str = ""
+    folded_tokens: int = 0
     
 class ChatRequest(BaseModel):
     thread_id: str
@@ -54,6 +68,9 @@ class ChatState(BaseModel):
     thread_id: str
     # A list of dictionaries, e.g., [{"role": "user", "content": "Hello"}]
     chat_history: List[Dict[str, str]] = []
+    # Older turns folded out of chat_history by the history manager
+    history_summary: str = ""
+    folded_tokens: int = 0
 
 class AgentState(BaseModel):
     # Input parameters
@@ -66,11 +83,19 @@ class AgentState(BaseModel):
     # Generation tracking
     generation_attempts: int = 0
     max_attempts: int = 3
+    # Candidates generated concurrently per attempt; the first valid one wins (1 = serial)
+    speculative_candidates: int = 1
+    # Total tokens speculative candidates may spend before the rest are cancelled (0 = no cap)
+    max_candidate_tokens: int = 0
     
     # Output results
     svg_code: Optional[str] = None
     vector_code: Optional[str] = None
     format_specific_code: Optional[Dict[str, str]] = {}
+    # Extra formats converted locally from the validated SVG (e.g. ["eps", "pdf"])
+    target_formats: List[str] = []
+    # Rendered PDF document, base64-encoded
+    pdf_base64: Optional[str] = None
     
     # Validation and metadata
     is_valid: bool = False
@@ -0,0 +1,80 @@
+import asyncio
+import importlib
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+
+class _AgentSpec:
+    def __init__(self, name: str, module: str, loader: Optional[Callable[[Any], Any]]):
+        self.name = name
+        self.module = module
+        self.loader = loader
+        self.lock = threading.Lock()
+        self.resource: Any = None
+        self.status = "cold"  # cold -> loading -> ready | failed
+        self.error = ""
+        self.load_seconds = 0.0
+
+
+class AgentRegistry:
+    """Loads agent modules and their heavy resources on first use.
+
+    Each agent is registered with the dotted path of its module and an optional
+    loader that turns the imported module into the resource endpoints use (e.g.
+    a compiled graph). Nothing is imported until `get`/`aget` or `warm_up`.
+    """
+
+    def __init__(self):
+        self._specs: Dict[str, _AgentSpec] = {}
+
+    def register(self, name: str, module: str, loader: Optional[Callable[[Any], Any]] = None) -> None:
+        self._specs[name] = _AgentSpec(name, module, loader)
+
+    def is_ready(self, name: str) -> bool:
+        return self._specs[name].status == "ready"
+
+    def get(self, name: str) -> Any:
+        """Returns the agent's resource, importing and loading it if needed (blocking)."""
+        spec = self._specs[name]
+        if spec.status == "ready":
+            return spec.resource
+        with spec.lock:
+            if spec.status != "ready":
+                print(f"---LOADING AGENT '{name}'---")
+                spec.status = "loading"
+                started = time.perf_counter()
+                try:
+                    module = importlib.import_module(spec.module)
+                    spec.resource = spec.loader(module) if spec.loader else module
+                except Exception as e:
+                    spec.status = "failed"
+                    spec.error = str(e)
+                    raise
+                spec.load_seconds = round(time.perf_counter() - started, 3)
+                spec.error = ""
+                spec.status = "ready"
+        return spec.resource
+
+    async def aget(self, name: str) -> Any:
+        """Like `get`, but loads in a worker thread so the event loop keeps serving."""
+        if self.is_ready(name):
+            return self._specs[name].resource
+        return await asyncio.to_thread(self.get, name)
+
+    async def warm_up(self, names: Iterable[str]) -> None:
+        """Loads the given agents one after another, logging (not raising) failures."""
+        for name in names:
+            try:
+                await self.aget(name)
+            except Exception as e:
+                print(f"Error warming up agent '{name}': {e}")
+
+    def names(self):
+        return list(self._specs)
+
+    def readiness(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            name: {"status": spec.status, "load_seconds": spec.load_seconds, "error": spec.error}
+            for name, spec in self._specs.items()
+        }
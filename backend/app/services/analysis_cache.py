@@ -0,0 +1,94 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+# SQLite table mapping a content hash to the LLM output produced for it.
+CACHE_DIR = os.getenv("CODE_ANALYSIS_CACHE_DIR", os.path.join("data", "code_analysis_cache"))
+INDEX_FILE = "analyses.sqlite"
+MAX_ENTRIES = int(os.getenv("CODE_ANALYSIS_CACHE_MAX_ENTRIES", "50000"))
+
+
+def analysis_key(kind: str, content: str, prompt_version: str, model: str) -> str:
+    """Content address of an analysis: hash of what was analyzed, how, and by which model."""
+    return hashlib.sha256(f"{kind}\0{prompt_version}\0{model}\0{content}".encode("utf-8")).hexdigest()
+
+
+class AnalysisCache:
+    """Persistent store of code analysis results (unit notes, report sections, whole reports).
+
+    Each entry records the tokens the LLM call cost, so a hit can report
+    how many tokens it saved.
+    """
+
+    def __init__(self, directory: str = CACHE_DIR, max_entries: int = MAX_ENTRIES):
+        self.directory = directory
+        self.max_entries = max_entries
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(directory, INDEX_FILE), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS analyses ("
+            "key TEXT PRIMARY KEY, kind TEXT NOT NULL, result TEXT NOT NULL, tokens INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, used_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS analyses_used_at ON analyses (used_at)")
+        self._db.commit()
+        self._hits = 0
+        self._misses = 0
+        self._tokens_saved = 0
+
+    def get(self, key: str) -> Optional[Dict[str, object]]:
+        """Returns {"result", "tokens"} for `key`, or None for a miss."""
+        with self._lock:
+            row = self._db.execute("SELECT result, tokens FROM analyses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._misses += 1
+                return None
+            self._db.execute("UPDATE analyses SET used_at = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+            self._hits += 1
+            self._tokens_saved += row[1]
+            return {"result": row[0], "tokens": row[1]}
+
+    def put(self, key: str, kind: str, result: str, tokens: int) -> None:
+        """Stores a result and evicts the least recently used entries beyond max_entries."""
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO analyses (key, kind, result, tokens, created_at, used_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)", (key, kind, result, tokens, now, now)
+            )
+            self._db.execute(
+                "DELETE FROM analyses WHERE key IN ("
+                "SELECT key FROM analyses ORDER BY used_at DESC LIMIT -1 OFFSET ?)", (self.max_entries,)
+            )
+            self._db.commit()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM analyses").fetchone()[0]
+            lookups = self._hits + self._misses
+            return {
+                "entries": entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "tokens_saved": self._tokens_saved,
+            }
+
+
+_cache: Optional[AnalysisCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_analysis_cache() -> AnalysisCache:
+    """Returns the process-wide code analysis cache, opening it on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = AnalysisCache()
+        return _cache
@@ -0,0 +1,44 @@
+import os
+import tempfile
+
+import ffmpeg
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+
+def decode_audio_bytes(data: bytes, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """Decodes an encoded recording to mono float32 samples in [-1, 1].
+
+    The bytes are piped through ffmpeg's stdin and raw PCM is read back from
+    its stdout, so nothing touches the filesystem.
+    """
+    try:
+        pcm, _ = (
+            ffmpeg
+            .input("pipe:0")
+            .output("pipe:1", format="s16le", acodec="pcm_s16le", ac=1, ar=sample_rate)
+            .run(input=data, capture_stdout=True, capture_stderr=True)
+        )
+    except ffmpeg.Error:
+        # Containers that need seeking (e.g. MP4 with a trailing moov atom) can't be read from a pipe
+        pcm = _decode_via_file(data, sample_rate)
+    return np.frombuffer(pcm, np.int16).astype(np.float32) / 32768.0
+
+
+def _decode_via_file(data: bytes, sample_rate: int) -> bytes:
+    temp_path = ""
+    try:
+        with tempfile.NamedTemporaryFile(delete=False) as temp:
+            temp.write(data)
+            temp_path = temp.name
+        pcm, _ = (
+            ffmpeg
+            .input(temp_path)
+            .output("pipe:1", format="s16le", acodec="pcm_s16le", ac=1, ar=sample_rate)
+            .run(capture_stdout=True, capture_stderr=True)
+        )
+        return pcm
+    finally:
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
@@ -0,0 +1,154 @@
+import asyncio
+import os
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.services.tokens import count_tokens
+
+# --- Configuration ---
+# Tokens allowed for the running summary plus recent turns (the system prompt is extra)
+HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "2000"))
+# Always keep at least this many recent messages verbatim
+MIN_RECENT_MESSAGES = int(os.getenv("CHAT_HISTORY_MIN_RECENT", "4"))
+# Compaction starts once the history outgrows the budget and folds it down to this fraction of it,
+# so the next few turns don't each trigger another summary call
+COMPACTION_TARGET = float(os.getenv("CHAT_HISTORY_COMPACTION_TARGET", "0.5"))
+# Per-message framing overhead in the chat format
+MESSAGE_OVERHEAD_TOKENS = 4
+
+SUMMARY_PROMPT = """You maintain a running summary of a conversation between a user and an AI assistant.
+Update the summary with the new messages below. Keep names, facts, user preferences, decisions and open questions.
+Be concise and write in the third person. Return only the updated summary.
+
+Current summary:
+{summary}
+
+New messages:
+{messages}"""
+
+
+def message_tokens(message: Dict[str, str]) -> int:
+    return count_tokens(message.get("content", "")) + MESSAGE_OVERHEAD_TOKENS
+
+
+class HistoryManager:
+    """Keeps chat prompts within a token budget.
+
+    The prompt is the system message, a running summary of older turns and the
+    newest turns that fit the budget. Once the stored history outgrows the
+    budget, older turns are folded into the summary by a background LLM call
+    and removed from the state.
+    """
+
+    def __init__(self, llm_factory: Callable[[], Any], budget: int = HISTORY_TOKEN_BUDGET,
+                 min_recent: int = MIN_RECENT_MESSAGES, compaction_target: float = COMPACTION_TARGET):
+        self.llm_factory = llm_factory
+        self.budget = budget
+        self.min_recent = min_recent
+        self.compaction_target = compaction_target
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._stats = {"turns": 0, "prompt_tokens": 0, "uncompacted_tokens": 0, "compactions": 0,
+                       "compaction_errors": 0, "folded_messages": 0}
+
+    # --- Prompt building ---
+
+    def _split(self, state) -> Tuple[List[Dict[str, str]], List[Dict[str, str]]]:
+        history = state.chat_history
+        if history and history[0].get("role") == "system":
+            return history[:1], history[1:]
+        return [], history
+
+    def _summary_messages(self, state) -> List[Dict[str, str]]:
+        if not state.history_summary:
+            return []
+        return [{"role": "system", "content": f"Summary of the earlier conversation:\n{state.history_summary}"}]
+
+    def _window(self, turns: List[Dict[str, str]], budget: int) -> int:
+        """Returns how many of the newest turns fit in `budget` (but at least min_recent)."""
+        used = 0
+        count = 0
+        for message in reversed(turns):
+            cost = message_tokens(message)
+            if count >= self.min_recent and used + cost > budget:
+                break
+            used += cost
+            count += 1
+        return count
+
+    def build_prompt(self, state, user_input: str = "") -> Tuple[List[Dict[str, str]], Dict[str, int]]:
+        """Returns the messages to send (excluding `user_input`) and this turn's token metrics."""
+        system, turns = self._split(state)
+        summary_messages = self._summary_messages(state)
+        summary_tokens = sum(message_tokens(m) for m in summary_messages)
+        keep = self._window(turns, max(0, self.budget - summary_tokens))
+        recent = turns[len(turns) - keep:] if keep else []
+        messages = system + summary_messages + recent
+
+        user_tokens = message_tokens({"content": user_input}) if user_input else 0
+        prompt_tokens = sum(message_tokens(m) for m in messages) + user_tokens
+        # What the prompt would cost if every turn had been resent verbatim
+        uncompacted = (sum(message_tokens(m) for m in system + turns) + user_tokens + state.folded_tokens)
+        metrics = {
+            "prompt_tokens": prompt_tokens,
+            "uncompacted_tokens": uncompacted,
+            "saved_tokens": max(0, uncompacted - prompt_tokens),
+            "window_messages": len(recent),
+            "summary_tokens": summary_tokens,
+        }
+        self._stats["turns"] += 1
+        self._stats["prompt_tokens"] += prompt_tokens
+        self._stats["uncompacted_tokens"] += uncompacted
+        return messages, metrics
+
+    # --- Compaction ---
+
+    def schedule_compaction(self, thread_id: str, state, on_done: Optional[Callable[[], None]] = None) -> None:
+        """Folds older turns into the summary in the background once the history outgrows the budget.
+
+        Turns are folded until the rest fits `compaction_target` of the budget,
+        leaving headroom before the next compaction is needed.
+        """
+        if thread_id in self._tasks:
+            return
+        system, turns = self._split(state)
+        summary_tokens = sum(message_tokens(m) for m in self._summary_messages(state))
+        if summary_tokens + sum(message_tokens(m) for m in turns) <= self.budget:
+            return
+        keep = self._window(turns, max(0, int(self.budget * self.compaction_target) - summary_tokens))
+        fold = turns[:len(turns) - keep]
+        if not fold:
+            return
+        task = asyncio.create_task(self._compact(state, fold, on_done))
+        self._tasks[thread_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(thread_id, None))
+
+    async def _compact(self, state, fold: List[Dict[str, str]], on_done: Optional[Callable[[], None]]) -> None:
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in fold)
+        try:
+            response = await self.llm_factory().ainvoke(
+                SUMMARY_PROMPT.format(summary=state.history_summary or "(none)", messages=transcript)
+            )
+        except Exception as e:
+            self._stats["compaction_errors"] += 1
+            print(f"Error compacting chat history: {e}")
+            return
+
+        # Only drop the folded turns if they are still the oldest ones in the history
+        offset = 1 if state.chat_history and state.chat_history[0].get("role") == "system" else 0
+        current = state.chat_history[offset:offset + len(fold)]
+        if len(current) != len(fold) or any(a is not b for a, b in zip(current, fold)):
+            return
+        del state.chat_history[offset:offset + len(fold)]
+        state.history_summary = response.content.strip()
+        state.folded_tokens += sum(message_tokens(m) for m in fold)
+        self._stats["compactions"] += 1
+        self._stats["folded_messages"] += len(fold)
+        if on_done is not None:
+            on_done()
+
+    def stats(self) -> Dict[str, Any]:
+        report = dict(self._stats)
+        report["budget"] = self.budget
+        report["compactions_running"] = len(self._tasks)
+        report["saved_tokens"] = max(0, report["uncompacted_tokens"] - report["prompt_tokens"])
+        report["avg_prompt_tokens"] = report["prompt_tokens"] / report["turns"] if report["turns"] else 0.0
+        return report
@@ -0,0 +1,249 @@
+import os
+import threading
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+
+import httpx
+from dotenv import load_dotenv
+
+# langchain_openai is imported on first use to keep app startup fast
+if TYPE_CHECKING:
+    from langchain_openai import AzureChatOpenAI, AzureOpenAIEmbeddings
+
+load_dotenv()
+
+# --- Configuration ---
+POOL_MAX_CONNECTIONS = int(os.getenv("HTTP_POOL_MAX_CONNECTIONS", "100"))
+POOL_MAX_KEEPALIVE = int(os.getenv("HTTP_POOL_MAX_KEEPALIVE", "20"))
+POOL_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_POOL_KEEPALIVE_EXPIRY", "60"))
+CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
+READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "120"))
+
+AZURE_API_VERSION = "2024-10-21"
+
+# HTTP/2 needs the optional `h2` package
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class _PoolStats:
+    """Request counters for one provider's connection pool."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.requests = 0
+        self.errors = 0
+
+
+class _InstrumentedTransport(httpx.BaseTransport):
+    def __init__(self, transport: httpx.HTTPTransport, stats: _PoolStats):
+        self._transport = transport
+        self._stats = stats
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        _begin(self._stats)
+        try:
+            return self._transport.handle_request(request)
+        except Exception:
+            _error(self._stats)
+            raise
+        finally:
+            _end(self._stats)
+
+    def close(self) -> None:
+        self._transport.close()
+
+
+class _InstrumentedAsyncTransport(httpx.AsyncBaseTransport):
+    def __init__(self, transport: httpx.AsyncHTTPTransport, stats: _PoolStats):
+        self._transport = transport
+        self._stats = stats
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        _begin(self._stats)
+        try:
+            return await self._transport.handle_async_request(request)
+        except Exception:
+            _error(self._stats)
+            raise
+        finally:
+            _end(self._stats)
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+def _begin(stats: _PoolStats) -> None:
+    with stats.lock:
+        stats.requests += 1
+        stats.in_flight += 1
+        stats.peak_in_flight = max(stats.peak_in_flight, stats.in_flight)
+
+
+def _end(stats: _PoolStats) -> None:
+    with stats.lock:
+        stats.in_flight -= 1
+
+
+def _error(stats: _PoolStats) -> None:
+    with stats.lock:
+        stats.errors += 1
+
+
+class ClientRegistry:
+    """Process-wide registry of long-lived provider clients.
+
+    Each provider gets one sync and one async httpx client with a keep-alive
+    pool (HTTP/2 where available). LangChain wrappers and SDK clients are
+    created once per provider/deployment/settings and reuse those pools.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._http: Dict[str, Tuple[httpx.Client, httpx.AsyncClient, httpx.HTTPTransport, httpx.AsyncHTTPTransport]] = {}
+        self._stats: Dict[str, _PoolStats] = {}
+        self._objects: Dict[Tuple, Any] = {}
+
+    # --- HTTP pools ---
+
+    def _pool(self, provider: str):
+        with self._lock:
+            if provider not in self._http:
+                limits = httpx.Limits(
+                    max_connections=POOL_MAX_CONNECTIONS,
+                    max_keepalive_connections=POOL_MAX_KEEPALIVE,
+                    keepalive_expiry=POOL_KEEPALIVE_EXPIRY,
+                )
+                timeout = httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT)
+                stats = self._stats[provider] = _PoolStats()
+                transport = httpx.HTTPTransport(limits=limits, http2=HTTP2_AVAILABLE)
+                async_transport = httpx.AsyncHTTPTransport(limits=limits, http2=HTTP2_AVAILABLE)
+                self._http[provider] = (
+                    httpx.Client(transport=_InstrumentedTransport(transport, stats), timeout=timeout),
+                    httpx.AsyncClient(transport=_InstrumentedAsyncTransport(async_transport, stats), timeout=timeout),
+                    transport,
+                    async_transport,
+                )
+            return self._http[provider]
+
+    def http_client(self, provider: str) -> httpx.Client:
+        return self._pool(provider)[0]
+
+    def async_http_client(self, provider: str) -> httpx.AsyncClient:
+        return self._pool(provider)[1]
+
+    def _get_or_create(self, key: Tuple, factory):
+        with self._lock:
+            obj = self._objects.get(key)
+        if obj is None:
+            obj = factory()
+            with self._lock:
+                obj = self._objects.setdefault(key, obj)
+        return obj
+
+    # --- Providers ---
+
+    def chat_llm(
+        self,
+        temperature: Optional[float] = None,
+        deployment: Optional[str] = None,
+        api_version: str = AZURE_API_VERSION,
+    ) -> "AzureChatOpenAI":
+        """Returns the shared AzureChatOpenAI for a deployment and temperature."""
+        deployment = deployment or os.getenv("AZURE_OPENAI_DEPLOYMENT")
+
+        def factory():
+            from langchain_openai import AzureChatOpenAI
+
+            kwargs = {} if temperature is None else {"temperature": temperature}
+            return AzureChatOpenAI(
+                api_version=api_version,
+                azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+                api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+                azure_deployment=deployment,
+                http_client=self.http_client("azure_openai"),
+                http_async_client=self.async_http_client("azure_openai"),
+                **kwargs,
+            )
+
+        return self._get_or_create(("chat", deployment, api_version, temperature), factory)
+
+    def embeddings(self, deployment: str, api_version: str = AZURE_API_VERSION) -> "AzureOpenAIEmbeddings":
+        """Returns the shared AzureOpenAIEmbeddings for a deployment."""
+
+        def factory():
+            from langchain_openai import AzureOpenAIEmbeddings
+
+            return AzureOpenAIEmbeddings(
+                api_version=api_version,
+                azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+                api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+                azure_deployment=deployment,
+                http_client=self.http_client("azure_openai"),
+                http_async_client=self.async_http_client("azure_openai"),
+            )
+
+        return self._get_or_create(("embeddings", deployment, api_version), factory)
+
+    def elevenlabs(self):
+        """Returns the shared sync ElevenLabs client."""
+        from elevenlabs.client import ElevenLabs
+
+        return self._get_or_create(("elevenlabs",), lambda: ElevenLabs(
+            api_key=os.getenv("ELEVENLABS_API_KEY"),
+            httpx_client=self.http_client("elevenlabs"),
+        ))
+
+    def async_elevenlabs(self):
+        """Returns the shared async ElevenLabs client."""
+        from elevenlabs.client import AsyncElevenLabs
+
+        return self._get_or_create(("elevenlabs_async",), lambda: AsyncElevenLabs(
+            api_key=os.getenv("ELEVENLABS_API_KEY"),
+            httpx_client=self.async_http_client("elevenlabs"),
+        ))
+
+    # --- Lifecycle and metrics ---
+
+    def stats(self) -> Dict[str, Any]:
+        """Reports request counters and pooled connection counts per provider."""
+        with self._lock:
+            report = {"http2": HTTP2_AVAILABLE, "max_connections": POOL_MAX_CONNECTIONS,
+                      "max_keepalive": POOL_MAX_KEEPALIVE, "providers": {}}
+            for provider, (_, _, transport, async_transport) in self._http.items():
+                stats = self._stats[provider]
+                with stats.lock:
+                    report["providers"][provider] = {
+                        "in_flight": stats.in_flight,
+                        "peak_in_flight": stats.peak_in_flight,
+                        "requests": stats.requests,
+                        "errors": stats.errors,
+                        "sync_connections": _connection_counts(transport),
+                        "async_connections": _connection_counts(async_transport),
+                    }
+            report["clients"] = [":".join(str(part) for part in key) for key in self._objects]
+            return report
+
+    async def aclose(self) -> None:
+        with self._lock:
+            pools = list(self._http.values())
+            self._http.clear()
+            self._objects.clear()
+        for client, async_client, _, _ in pools:
+            client.close()
+            await async_client.aclose()
+
+
+def _connection_counts(transport) -> Dict[str, int]:
+    pool = getattr(transport, "_pool", None)
+    connections = list(getattr(pool, "connections", []))
+    idle = sum(1 for conn in connections if conn.is_idle())
+    return {"open": len(connections), "idle": idle, "active": len(connections) - idle}
+
+
+# Shared registry used by every agent
+clients = ClientRegistry()
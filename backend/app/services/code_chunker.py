@@ -0,0 +1,179 @@
+import ast
+import os
+import re
+from typing import List, Optional, Tuple
+
+from app.services.tokens import count_tokens
+
+# --- Configuration ---
+# Units above this size are split further (class -> methods, otherwise by lines)
+MAX_UNIT_TOKENS = int(os.getenv("CODE_ANALYZER_UNIT_TOKENS", "3000"))
+
+# Unindented lines that usually start a definition in C-like, Go, Rust, JS/TS, Java, Ruby, PHP...
+_TOP_LEVEL_DEF_RE = re.compile(
+    r"^(?:export\s+|public\s+|private\s+|protected\s+|static\s+|async\s+|pub\s+|default\s+|abstract\s+|final\s+)*"
+    r"(?:(?:def|class|function|func|fn|interface|struct|enum|impl|module|type|trait|object)\b|const\s+\w+\s*=)"
+)
+
+
+class CodeUnit:
+    """A contiguous slice of a source file analyzed on its own."""
+
+    def __init__(self, name: str, kind: str, start_line: int, end_line: int, source: str):
+        self.name = name
+        self.kind = kind  # function | class | method | module | block
+        self.start_line = start_line
+        self.end_line = end_line
+        self.source = source
+
+    @property
+    def tokens(self) -> int:
+        return count_tokens(self.source)
+
+    def label(self) -> str:
+        return f"{self.kind} `{self.name}` (lines {self.start_line}-{self.end_line})"
+
+
+def _slice(lines: List[str], start: int, end: int) -> str:
+    return "".join(lines[start - 1:end])
+
+
+def _node_start(node: ast.AST) -> int:
+    decorators = getattr(node, "decorator_list", [])
+    return min([node.lineno] + [d.lineno for d in decorators])
+
+
+def _split_long_line(line: str, tokens: int, max_tokens: int) -> List[str]:
+    """Cuts one line that exceeds max_tokens (minified code, embedded data) into character slices."""
+    size = max(1, len(line) * max_tokens // tokens)
+    parts: List[str] = []
+    position = 0
+    while position < len(line):
+        end = position + size
+        # Token density varies along the line, so shrink a slice that still comes out too large
+        while end - position > 1 and count_tokens(line[position:end]) > max_tokens:
+            end = position + (end - position) * 3 // 4
+        parts.append(line[position:end])
+        position = end
+    return parts
+
+
+def _split_lines(name: str, kind: str, lines: List[str], numbers: List[int],
+                 max_tokens: int = MAX_UNIT_TOKENS) -> List[CodeUnit]:
+    """Splits the given (1-based, ascending) line numbers into pieces under max_tokens,
+    preferring blank-line boundaries. Single lines over the limit are split by characters."""
+    pieces: List[Tuple[int, int, str]] = []  # (first line, last line, source)
+    current: List[int] = []
+    used = 0
+    last_blank: Optional[int] = None  # index into `current`
+
+    def flush(piece: List[int]) -> None:
+        pieces.append((piece[0], piece[-1], "".join(lines[n - 1] for n in piece)))
+
+    for number in numbers:
+        line = lines[number - 1]
+        tokens = count_tokens(line)
+        if tokens > max_tokens:
+            if current:
+                flush(current)
+                current, used, last_blank = [], 0, None
+            pieces.extend((number, number, part) for part in _split_long_line(line, tokens, max_tokens))
+            continue
+        current.append(number)
+        used += tokens
+        if not line.strip():
+            last_blank = len(current) - 1
+        if used > max_tokens and len(current) > 1:
+            cut = last_blank + 1 if last_blank is not None else len(current) - 1
+            flush(current[:cut])
+            current = current[cut:]
+            used = sum(count_tokens(lines[n - 1]) for n in current)
+            blanks = [i for i, n in enumerate(current) if not lines[n - 1].strip()]
+            last_blank = blanks[-1] if blanks else None
+    if current:
+        flush(current)
+
+    units = [CodeUnit(name, kind, first, last, source) for first, last, source in pieces if source.strip()]
+    if len(units) > 1:
+        for index, unit in enumerate(units, 1):
+            unit.name = f"{name} [{index}]"
+    return units
+
+
+def _python_units(code: str, lines: List[str]) -> List[CodeUnit]:
+    tree = ast.parse(code)
+    units: List[CodeUnit] = []
+    module_lines: List[int] = []
+
+    for node in tree.body:
+        start, end = _node_start(node), node.end_lineno
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            unit = CodeUnit(node.name, "function", start, end, _slice(lines, start, end))
+            units.extend([unit] if unit.tokens <= MAX_UNIT_TOKENS else _split_lines(node.name, "function", lines, list(range(start, end + 1))))
+        elif isinstance(node, ast.ClassDef):
+            unit = CodeUnit(node.name, "class", start, end, _slice(lines, start, end))
+            if unit.tokens <= MAX_UNIT_TOKENS:
+                units.append(unit)
+                continue
+            # Large class: the class body outside methods, then each method
+            methods = [n for n in node.body if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef))]
+            method_lines = {line for m in methods for line in range(_node_start(m), m.end_lineno + 1)}
+            header = "".join(lines[i - 1] for i in range(start, end + 1) if i not in method_lines)
+            units.append(CodeUnit(node.name, "class", start, end, header))
+            for method in methods:
+                m_start = _node_start(method)
+                name = f"{node.name}.{method.name}"
+                piece = CodeUnit(name, "method", m_start, method.end_lineno, _slice(lines, m_start, method.end_lineno))
+                units.extend([piece] if piece.tokens <= MAX_UNIT_TOKENS
+                             else _split_lines(name, "method", lines, list(range(m_start, method.end_lineno + 1))))
+        else:
+            module_lines.extend(range(start, end + 1))
+
+    if module_lines:
+        # Imports, constants and script code, kept together as module-level context
+        numbers = sorted(set(module_lines))
+        source = "".join(lines[i - 1] for i in numbers)
+        module = CodeUnit("module level", "module", numbers[0], numbers[-1], source)
+        units[:0] = [module] if module.tokens <= MAX_UNIT_TOKENS else _split_lines("module level", "module", lines, numbers)
+    return sorted(units, key=lambda unit: unit.start_line)
+
+
+def _generic_units(lines: List[str]) -> List[CodeUnit]:
+    """Line-based fallback: cut at unindented definition lines, then by size."""
+    starts = [i + 1 for i, line in enumerate(lines) if _TOP_LEVEL_DEF_RE.match(line)]
+    if not starts or starts[0] != 1:
+        starts.insert(0, 1)
+    units: List[CodeUnit] = []
+    for index, start in enumerate(starts):
+        end = starts[index + 1] - 1 if index + 1 < len(starts) else len(lines)
+        first = lines[start - 1].strip()
+        name = first[:60] if start > 1 or _TOP_LEVEL_DEF_RE.match(lines[0]) else "file header"
+        units.extend(_split_lines(name, "block", lines, list(range(start, end + 1))))
+    return _merge_small(units)
+
+
+def _merge_small(units: List[CodeUnit], target: int = MAX_UNIT_TOKENS // 3) -> List[CodeUnit]:
+    """Merges neighbouring small blocks so tiny definitions don't each cost an LLM call."""
+    merged: List[CodeUnit] = []
+    for unit in units:
+        previous = merged[-1] if merged else None
+        if previous is not None and previous.tokens + unit.tokens <= target:
+            merged[-1] = CodeUnit(f"{previous.name}; {unit.name}", "block", previous.start_line, unit.end_line,
+                                  previous.source + unit.source)
+        else:
+            merged.append(unit)
+    return merged
+
+
+def chunk_code(code: str, filename: str = "") -> List[CodeUnit]:
+    """Splits source into analyzable units: top-level Python definitions via `ast`, otherwise line blocks."""
+    lines = code.splitlines(keepends=True)
+    if not lines:
+        return []
+    if not filename or filename.endswith((".py", ".pyw")):
+        try:
+            return _python_units(code, lines)
+        except (SyntaxError, ValueError, RecursionError, MemoryError):
+            # Invalid or pathologically nested code: fall back to line blocks
+            pass
+    return _generic_units(lines)
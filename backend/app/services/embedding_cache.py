@@ -0,0 +1,135 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from array import array
+from typing import Dict, List, Optional, Sequence
+
+from langchain_core.embeddings import Embeddings
+
+# SQLite maps a content hash to an (offset, dim) slot in a packed float32 blob file.
+CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", os.path.join("data", "embedding_cache"))
+INDEX_FILE = "index.sqlite"
+BLOB_FILE = "vectors.f32"
+_LOOKUP_BATCH = 500
+
+
+def embedding_key(text: str, model: str) -> str:
+    """Content address of a chunk: hash of the embedding deployment and the chunk text."""
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Persistent, content-addressed store of embedding vectors."""
+
+    def __init__(self, directory: str = CACHE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._blob_path = os.path.join(directory, BLOB_FILE)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(directory, INDEX_FILE), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, model TEXT NOT NULL, offset INTEGER NOT NULL, dim INTEGER NOT NULL)"
+        )
+        self._db.commit()
+        self._hits = 0
+        self._misses = 0
+
+    def get_many(self, texts: Sequence[str], model: str) -> List[Optional[List[float]]]:
+        """Returns the cached vector for each text, or None for a miss."""
+        keys = [embedding_key(text, model) for text in texts]
+        slots: Dict[str, tuple] = {}
+        with self._lock:
+            unique = list(dict.fromkeys(keys))
+            for start in range(0, len(unique), _LOOKUP_BATCH):
+                batch = unique[start:start + _LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._db.execute(
+                    f"SELECT key, offset, dim FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                slots.update({key: (offset, dim) for key, offset, dim in rows})
+
+            vectors: Dict[str, List[float]] = {}
+            if slots:
+                with open(self._blob_path, "rb") as blob:
+                    for key, (offset, dim) in slots.items():
+                        blob.seek(offset)
+                        values = array("f")
+                        values.frombytes(blob.read(dim * 4))
+                        vectors[key] = values.tolist()
+
+            results = [vectors.get(key) for key in keys]
+            hits = sum(1 for vector in results if vector is not None)
+            self._hits += hits
+            self._misses += len(results) - hits
+        return results
+
+    def put_many(self, texts: Sequence[str], vectors: Sequence[Sequence[float]], model: str) -> None:
+        """Appends vectors to the blob file and records their slots."""
+        with self._lock:
+            rows = []
+            with open(self._blob_path, "ab") as blob:
+                offset = blob.seek(0, os.SEEK_END)
+                for text, vector in zip(texts, vectors):
+                    packed = array("f", vector).tobytes()
+                    blob.write(packed)
+                    rows.append((embedding_key(text, model), model, offset, len(vector)))
+                    offset += len(packed)
+                blob.flush()
+                os.fsync(blob.fileno())
+            # Rows are written after the bytes they point at; a crash only leaves unused bytes behind.
+            self._db.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, model, offset, dim) VALUES (?, ?, ?, ?)", rows
+            )
+            self._db.commit()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            lookups = self._hits + self._misses
+            return {
+                "entries": entries,
+                "blob_bytes": os.path.getsize(self._blob_path) if os.path.exists(self._blob_path) else 0,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+            }
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that only sends cache misses to the underlying model."""
+
+    def __init__(self, embeddings: Embeddings, model: str, cache: EmbeddingCache):
+        self.embeddings = embeddings
+        self.model = model
+        self.cache = cache
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        results = self.cache.get_many(texts, self.model)
+        # Embed each distinct missing text once, even if it repeats in the batch
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, results) if vector is None))
+        if missing:
+            fresh = self.embeddings.embed_documents(missing)
+            self.cache.put_many(missing, fresh, self.model)
+            by_text = dict(zip(missing, fresh))
+            results = [vector if vector is not None else by_text[text] for text, vector in zip(texts, results)]
+        return results
+
+    def embed_query(self, text: str) -> List[float]:
+        # Questions are rarely repeated verbatim; don't grow the cache with them.
+        return self.embeddings.embed_query(text)
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Returns the process-wide embedding cache, opening it on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = EmbeddingCache()
+        return _cache
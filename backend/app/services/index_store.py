@@ -0,0 +1,137 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from typing import Any, Callable, Optional
+
+import faiss
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+# Each session gets <INDEX_DIR>/<thread_id>/{index.faiss, chunks.json}
+INDEX_DIR = os.getenv("DOC_INDEX_DIR", os.path.join("data", "doc_indexes"))
+INDEX_FILE = "index.faiss"
+CHUNKS_FILE = "chunks.json"
+
+
+def _session_dir(thread_id: str) -> str:
+    # Thread ids are UUIDs; reject anything else so they can't escape INDEX_DIR.
+    return os.path.join(INDEX_DIR, str(uuid.UUID(thread_id)))
+
+
+def has_index(thread_id: str) -> bool:
+    """Returns True if a persisted index exists for the session."""
+    try:
+        return os.path.exists(os.path.join(_session_dir(thread_id), INDEX_FILE))
+    except ValueError:
+        return False
+
+
+def save_index(thread_id: str, vectorstore: FAISS) -> str:
+    """Writes the FAISS index and its chunk store to disk, replacing any previous copy."""
+    target = _session_dir(thread_id)
+    os.makedirs(INDEX_DIR, exist_ok=True)
+
+    # Write into a temporary directory and swap it in, so readers never see a partial index.
+    staging = tempfile.mkdtemp(prefix=".staging-", dir=INDEX_DIR)
+    try:
+        faiss.write_index(vectorstore.index, os.path.join(staging, INDEX_FILE))
+        docstore = vectorstore.docstore._dict
+        chunks = {
+            "ids": [vectorstore.index_to_docstore_id[i] for i in range(len(vectorstore.index_to_docstore_id))],
+            "docs": {
+                doc_id: {"page_content": doc.page_content, "metadata": doc.metadata}
+                for doc_id, doc in docstore.items()
+            },
+        }
+        with open(os.path.join(staging, CHUNKS_FILE), "w", encoding="utf-8") as f:
+            json.dump(chunks, f)
+
+        if os.path.exists(target):
+            shutil.rmtree(target)
+        os.replace(staging, target)
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return target
+
+
+def load_index(thread_id: str, embeddings: Any) -> Optional[FAISS]:
+    """Loads a persisted index, memory-mapping the vectors where FAISS supports it."""
+    if not has_index(thread_id):
+        return None
+    session_dir = _session_dir(thread_id)
+    index_path = os.path.join(session_dir, INDEX_FILE)
+    touch_index(thread_id)
+
+    try:
+        index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+    except RuntimeError:
+        # Not every index type can be mapped; fall back to a regular read.
+        index = faiss.read_index(index_path)
+
+    with open(os.path.join(session_dir, CHUNKS_FILE), encoding="utf-8") as f:
+        chunks = json.load(f)
+
+    docstore = InMemoryDocstore({
+        doc_id: Document(page_content=doc["page_content"], metadata=doc["metadata"])
+        for doc_id, doc in chunks["docs"].items()
+    })
+    index_to_docstore_id = dict(enumerate(chunks["ids"]))
+
+    return FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=index_to_docstore_id,
+    )
+
+
+def touch_index(thread_id: str) -> None:
+    """Marks a persisted index as used now; prune_indexes goes by this time."""
+    try:
+        os.utime(_session_dir(thread_id))
+    except (ValueError, OSError):
+        pass
+
+
+def delete_index(thread_id: str) -> None:
+    """Removes a session's persisted index."""
+    try:
+        target = _session_dir(thread_id)
+    except ValueError:
+        return
+    # Move it aside first so a concurrent load sees the whole index or none of it
+    trash = os.path.join(INDEX_DIR, f".deleted-{uuid.uuid4()}")
+    try:
+        os.replace(target, trash)
+    except FileNotFoundError:
+        return
+    shutil.rmtree(trash, ignore_errors=True)
+
+
+def prune_indexes(max_idle: float, is_active: Callable[[str], bool]) -> int:
+    """Deletes indexes unused for `max_idle` seconds whose session is not active. Returns the count."""
+    try:
+        names = os.listdir(INDEX_DIR)
+    except FileNotFoundError:
+        return 0
+    cutoff = time.time() - max_idle
+    pruned = 0
+    for name in names:
+        path = os.path.join(INDEX_DIR, name)
+        try:
+            if os.path.getmtime(path) > cutoff:
+                continue
+        except OSError:
+            continue
+        if name.startswith("."):
+            # Leftovers of interrupted saves or deletes
+            shutil.rmtree(path, ignore_errors=True)
+        elif not is_active(name):
+            delete_index(name)
+            pruned += 1
+    return pruned
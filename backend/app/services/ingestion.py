@@ -0,0 +1,219 @@
+import asyncio
+import os
+import random
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from app.services.embedding_cache import EmbeddingCache
+from app.services.tokens import count_tokens
+
+if TYPE_CHECKING:
+    from langchain_community.vectorstores import FAISS
+
+# --- Configuration ---
+BATCH_MAX_TOKENS = int(os.getenv("EMBED_BATCH_MAX_TOKENS", "8000"))
+BATCH_MAX_ITEMS = int(os.getenv("EMBED_BATCH_MAX_ITEMS", "256"))
+MAX_CONCURRENCY = int(os.getenv("EMBED_MAX_CONCURRENCY", "4"))
+MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "5"))
+BACKOFF_BASE = float(os.getenv("EMBED_BACKOFF_BASE", "0.5"))
+BACKOFF_MAX = float(os.getenv("EMBED_BACKOFF_MAX", "20"))
+# How long finished progress records stay available to late SSE subscribers
+PROGRESS_RETENTION = float(os.getenv("INGEST_PROGRESS_RETENTION", "300"))
+
+
+class IngestionProgress:
+    """Progress of one document ingestion, observable from SSE handlers on the same loop."""
+
+    TERMINAL = ("done", "failed")
+
+    def __init__(self, thread_id: str):
+        self.thread_id = thread_id
+        self.status = "queued"
+        self.total_pages = 0
+        self.extracted_pages = 0
+        self.truncated = False
+        self.total_chunks = 0
+        self.cached_chunks = 0
+        self.embedded_chunks = 0
+        self.total_batches = 0
+        self.completed_batches = 0
+        self.retries = 0
+        self.error = ""
+        self.started_at = time.monotonic()
+        self.elapsed = 0.0
+        self._changed = asyncio.Event()
+
+    def update(self, **fields: Any) -> None:
+        for name, value in fields.items():
+            setattr(self, name, value)
+        self.elapsed = round(time.monotonic() - self.started_at, 3)
+        # Wake everyone waiting on the current event, then arm a fresh one
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in self.TERMINAL
+
+    def snapshot(self) -> Dict[str, Any]:
+        indexed = self.cached_chunks + self.embedded_chunks
+        return {
+            "thread_id": self.thread_id,
+            "status": self.status,
+            "total_pages": self.total_pages,
+            "extracted_pages": self.extracted_pages,
+            "truncated": self.truncated,
+            "total_chunks": self.total_chunks,
+            "cached_chunks": self.cached_chunks,
+            "embedded_chunks": self.embedded_chunks,
+            "total_batches": self.total_batches,
+            "completed_batches": self.completed_batches,
+            "retries": self.retries,
+            "percent": round(100 * indexed / self.total_chunks, 1) if self.total_chunks else 0.0,
+            "elapsed": self.elapsed,
+            "error": self.error,
+        }
+
+    async def wait_for_change(self, timeout: float = 15.0) -> None:
+        event = self._changed
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+_progress: Dict[str, IngestionProgress] = {}
+
+
+def start_progress(thread_id: str) -> IngestionProgress:
+    progress = IngestionProgress(thread_id)
+    _progress[thread_id] = progress
+    return progress
+
+
+def get_progress(thread_id: str) -> Optional[IngestionProgress]:
+    return _progress.get(thread_id)
+
+
+def finish_progress(progress: IngestionProgress, error: str = "") -> None:
+    """Marks an ingestion as finished and schedules its record for removal."""
+    progress.update(status="failed" if error else "done", error=error)
+    asyncio.get_running_loop().call_later(PROGRESS_RETENTION, _progress.pop, progress.thread_id, None)
+
+
+def batch_by_tokens(texts: List[str], max_tokens: int = BATCH_MAX_TOKENS, max_items: int = BATCH_MAX_ITEMS) -> List[List[int]]:
+    """Groups text indices into batches that stay under a token and item budget."""
+    batches: List[List[int]] = []
+    current: List[int] = []
+    current_tokens = 0
+    for i, text in enumerate(texts):
+        tokens = count_tokens(text)
+        if current and (current_tokens + tokens > max_tokens or len(current) >= max_items):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(i)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+async def _embed_with_retry(embeddings: Embeddings, texts: List[str], progress: IngestionProgress) -> List[List[float]]:
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            return await embeddings.aembed_documents(texts)
+        except Exception as e:
+            if attempt == MAX_RETRIES:
+                raise
+            # Exponential backoff with full jitter so parallel batches don't retry in lockstep
+            delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+            print(f"Embedding batch failed ({e}); retrying in {delay:.2f}s")
+            progress.update(retries=progress.retries + 1)
+            await asyncio.sleep(delay)
+
+
+async def embed_and_index(
+    splits: List[Document],
+    embeddings: Embeddings,
+    model: str,
+    cache: EmbeddingCache,
+    progress: IngestionProgress,
+    query_embeddings: Optional[Embeddings] = None,
+) -> "FAISS":
+    """Embeds chunks in concurrent token-bounded batches and builds a FAISS index as batches finish.
+
+    Cached vectors are indexed immediately; only misses are sent to the
+    embedding deployment, with at most MAX_CONCURRENCY requests in flight.
+    """
+    from langchain_community.vectorstores import FAISS
+
+    texts = [doc.page_content for doc in splits]
+    metadatas = [doc.metadata for doc in splits]
+    progress.update(status="embedding", total_chunks=len(texts))
+
+    vectorstore: Optional[FAISS] = None
+    index_lock = asyncio.Lock()
+
+    async def add_to_index(indices: List[int], vectors: List[List[float]]) -> None:
+        nonlocal vectorstore
+        pairs = [(texts[i], vector) for i, vector in zip(indices, vectors)]
+        metas = [metadatas[i] for i in indices]
+        async with index_lock:
+            if vectorstore is None:
+                vectorstore = FAISS.from_embeddings(pairs, embedding=query_embeddings or embeddings, metadatas=metas)
+            else:
+                vectorstore.add_embeddings(pairs, metadatas=metas)
+
+    cached = await asyncio.to_thread(cache.get_many, texts, model)
+    hit_indices = [i for i, vector in enumerate(cached) if vector is not None]
+    if hit_indices:
+        await add_to_index(hit_indices, [cached[i] for i in hit_indices])
+        progress.update(cached_chunks=len(hit_indices))
+
+    # Embed each distinct missing text once
+    first_index: Dict[str, int] = {}
+    for i, vector in enumerate(cached):
+        if vector is None:
+            first_index.setdefault(texts[i], i)
+    missing = list(first_index.values())
+    duplicates: Dict[int, List[int]] = {}
+    for i, vector in enumerate(cached):
+        if vector is None and first_index[texts[i]] != i:
+            duplicates.setdefault(first_index[texts[i]], []).append(i)
+
+    # Tokenizing every missing chunk is CPU-bound, so batching runs off the event loop
+    token_batches = await asyncio.to_thread(batch_by_tokens, [texts[i] for i in missing])
+    batches = [[missing[j] for j in batch] for batch in token_batches]
+    progress.update(total_batches=len(batches))
+    semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+
+    async def run_batch(indices: List[int]) -> None:
+        batch_texts = [texts[i] for i in indices]
+        async with semaphore:
+            vectors = await _embed_with_retry(embeddings, batch_texts, progress)
+        await asyncio.to_thread(cache.put_many, batch_texts, vectors, model)
+        all_indices, all_vectors = list(indices), list(vectors)
+        for i, vector in zip(indices, vectors):
+            for dup in duplicates.get(i, []):
+                all_indices.append(dup)
+                all_vectors.append(vector)
+        await add_to_index(all_indices, all_vectors)
+        progress.update(
+            completed_batches=progress.completed_batches + 1,
+            embedded_chunks=progress.embedded_chunks + len(all_indices),
+        )
+
+    tasks = [asyncio.create_task(run_batch(batch)) for batch in batches]
+    try:
+        await asyncio.gather(*tasks)
+    except Exception:
+        for task in tasks:
+            task.cancel()
+        raise
+
+    if vectorstore is None:
+        raise ValueError("Document contains no text to index.")
+    return vectorstore
@@ -0,0 +1,125 @@
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+# --- Configuration ---
+MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "1000"))
+MAX_BYTES = int(os.getenv("PDF_MAX_BYTES", str(50 * 1024 * 1024)))
+WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(os.cpu_count() or 2)))
+PAGES_PER_SHARD = int(os.getenv("PDF_PAGES_PER_SHARD", "8"))
+_READ_CHUNK = 1024 * 1024
+
+
+class PdfTooLargeError(ValueError):
+    """Raised when an upload exceeds PDF_MAX_BYTES."""
+
+
+# --- Worker functions (run in the process pool) ---
+
+def _count_pages(path: str) -> int:
+    import pypdf
+    return len(pypdf.PdfReader(path).pages)
+
+
+def _extract_pages(path: str, start: int, end: int) -> List[Tuple[int, str]]:
+    """Extracts text from pages [start, end) of the PDF at `path`."""
+    import pypdf
+    reader = pypdf.PdfReader(path)
+    pages = []
+    for number in range(start, end):
+        try:
+            text = reader.pages[number].extract_text() or ""
+        except Exception as e:
+            print(f"Error extracting page {number + 1}: {e}")
+            text = ""
+        pages.append((number, text))
+    return pages
+
+
+# --- Pool management ---
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """Returns the shared extraction pool, starting it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn avoids forking a parent that already runs threads and an event loop
+            _pool = ProcessPoolExecutor(max_workers=WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+# --- Public API ---
+
+async def read_upload(file, max_bytes: int = MAX_BYTES) -> bytes:
+    """Reads an UploadFile in chunks, refusing anything over `max_bytes`."""
+    chunks = []
+    size = 0
+    while True:
+        chunk = await file.read(_READ_CHUNK)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > max_bytes:
+            raise PdfTooLargeError(f"PDF exceeds the {max_bytes} byte limit.")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def _write_temp(data: bytes) -> str:
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
+        tmp.write(data)
+        return tmp.name
+
+
+async def extract_pages(data: bytes, progress=None, max_pages: int = MAX_PAGES) -> AsyncIterator[Document]:
+    """Extracts PDF text in page shards across the process pool.
+
+    Yields one Document per page (with its 1-based page number in metadata)
+    as soon as the shard containing it finishes, so pages may arrive out of order.
+    """
+    loop = asyncio.get_running_loop()
+    pool = get_pool()
+
+    # Workers read the PDF from a shared temp file instead of each receiving a pickled copy
+    path = await asyncio.to_thread(_write_temp, data)
+    try:
+        page_count = await loop.run_in_executor(pool, _count_pages, path)
+        pages_to_read = min(page_count, max_pages)
+        if progress is not None:
+            progress.update(status="extracting", total_pages=pages_to_read, truncated=page_count > max_pages)
+
+        shards = [
+            loop.run_in_executor(pool, _extract_pages, path, start, min(start + PAGES_PER_SHARD, pages_to_read))
+            for start in range(0, pages_to_read, PAGES_PER_SHARD)
+        ]
+        try:
+            for shard in asyncio.as_completed(shards):
+                pages = await shard
+                for number, text in pages:
+                    if text.strip():
+                        yield Document(page_content=text, metadata={"page": number + 1})
+                if progress is not None:
+                    progress.update(extracted_pages=progress.extracted_pages + len(pages))
+        finally:
+            for shard in shards:
+                shard.cancel()
+    finally:
+        await asyncio.to_thread(os.remove, path)
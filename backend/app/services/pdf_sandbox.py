@@ -0,0 +1,245 @@
+import base64
+import hashlib
+import importlib.util
+import json
+import os
+import queue
+import select
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+# --- Configuration ---
+WORKERS = int(os.getenv("PDF_SANDBOX_WORKERS", "2"))
+TIMEOUT_SECONDS = float(os.getenv("PDF_SANDBOX_TIMEOUT", "10"))
+MEMORY_MB = int(os.getenv("PDF_SANDBOX_MEMORY_MB", "512"))
+MAX_PDF_BYTES = int(os.getenv("PDF_SANDBOX_MAX_PDF_BYTES", str(20 * 1024 * 1024)))
+# Workers are replaced after this many jobs so generated code can't leave state behind
+JOBS_PER_WORKER = int(os.getenv("PDF_SANDBOX_JOBS_PER_WORKER", "1"))
+CACHE_ENTRIES = int(os.getenv("PDF_SANDBOX_CACHE_ENTRIES", "128"))
+# How long a job waits for a warm worker before it fails
+CHECKOUT_TIMEOUT = float(os.getenv("PDF_SANDBOX_CHECKOUT_TIMEOUT", "30"))
+_STARTUP_TIMEOUT = 30.0
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pdf_sandbox_worker.py")
+
+
+class RenderResult:
+    def __init__(self, ok: bool, pdf: Optional[bytes] = None, error: str = "", seconds: float = 0.0,
+                 cached: bool = False):
+        self.ok = ok
+        self.pdf = pdf
+        self.error = error
+        self.seconds = seconds
+        self.cached = cached
+
+
+class _Worker:
+    def __init__(self):
+        self.workdir = tempfile.mkdtemp(prefix="pdf-sandbox-")
+        # -I: isolated mode (no user site-packages, no PYTHON* env vars, script dir not on sys.path)
+        self.process = subprocess.Popen(
+            [sys.executable, "-I", WORKER_SCRIPT, str(MEMORY_MB), str(int(TIMEOUT_SECONDS) + 1),
+             str(MAX_PDF_BYTES), self.workdir],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            cwd=self.workdir, env={"PATH": os.defpath, "HOME": self.workdir}, text=True,
+            # Own process group, so close() also kills the per-job child the worker forks
+            start_new_session=True,
+        )
+        self.jobs = 0
+
+    def read_line(self, timeout: float) -> Optional[str]:
+        ready, _, _ = select.select([self.process.stdout], [], [], timeout)
+        if not ready:
+            return None
+        return self.process.stdout.readline()
+
+    def close(self) -> None:
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except OSError:
+            pass
+        self.process.wait()
+        for stream in (self.process.stdin, self.process.stdout):
+            try:
+                stream.close()
+            except OSError:
+                pass
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+class PdfSandbox:
+    """Pool of pre-warmed, resource-limited subprocesses that execute generated reportlab code.
+
+    Each worker has reportlab imported and runs every job in a forked child
+    under memory/CPU/file-size rlimits with networking and subprocesses
+    blocked; the child may only write inside its temp directory and only read
+    there, in the standard library and in reportlab's package/font
+    directories. The worker's process group is killed if a job exceeds the
+    wall-clock timeout. See pdf_sandbox_worker for the limits of this sandbox.
+    Workers are replaced in the background after JOBS_PER_WORKER jobs.
+    Successful renders are cached by a hash of the code.
+    """
+
+    def __init__(self, workers: int = WORKERS, timeout: float = TIMEOUT_SECONDS):
+        self.workers = workers
+        self.timeout = timeout
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._started = False
+        self._closed = False
+        self._cache: "OrderedDict[str, bytes]" = OrderedDict()
+        self._stats = {"jobs": 0, "ok": 0, "failed": 0, "timeouts": 0, "crashes": 0, "cache_hits": 0,
+                       "workers_started": 0, "worker_start_errors": 0, "total_seconds": 0.0}
+
+    @staticmethod
+    def available() -> bool:
+        return importlib.util.find_spec("reportlab") is not None
+
+    # --- Worker lifecycle ---
+
+    def start(self) -> None:
+        """Starts warming the pool in the background (idempotent)."""
+        with self._lock:
+            if self._started or self._closed:
+                return
+            self._started = True
+        for _ in range(self.workers):
+            self._replace()
+
+    def _replace(self) -> None:
+        threading.Thread(target=self._spawn, daemon=True).start()
+
+    def _spawn(self) -> None:
+        if self._closed:
+            return
+        worker = _Worker()
+        try:
+            line = worker.read_line(_STARTUP_TIMEOUT)
+            if not line or not json.loads(line).get("ready"):
+                raise RuntimeError("worker did not report ready")
+        except Exception as e:
+            worker.close()
+            with self._lock:
+                self._stats["worker_start_errors"] += 1
+            print(f"Error starting PDF sandbox worker: {e}")
+            return
+        with self._lock:
+            self._stats["workers_started"] += 1
+            closed = self._closed
+        if closed:
+            worker.close()
+        else:
+            self._idle.put(worker)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+    # --- Rendering ---
+
+    def render(self, code: str) -> RenderResult:
+        """Runs `code` in a sandbox worker and returns the PDF it saved (blocking)."""
+        key = hashlib.sha256(code.encode("utf-8")).hexdigest()
+        with self._lock:
+            self._stats["jobs"] += 1
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self._stats["cache_hits"] += 1
+                return RenderResult(True, cached, cached=True)
+
+        self.start()
+        started = time.perf_counter()
+        try:
+            worker = self._idle.get(timeout=CHECKOUT_TIMEOUT)
+        except queue.Empty:
+            return self._finish(RenderResult(False, error="No PDF sandbox worker became available"), started)
+
+        retire = True
+        try:
+            worker.process.stdin.write(json.dumps({"code": code}) + "\n")
+            worker.process.stdin.flush()
+            line = worker.read_line(self.timeout)
+            if line is None:
+                with self._lock:
+                    self._stats["timeouts"] += 1
+                result = RenderResult(False, error=f"The code did not finish within {self.timeout:g}s")
+            elif not line:
+                with self._lock:
+                    self._stats["crashes"] += 1
+                worker.process.wait()
+                result = RenderResult(False, error=f"The code crashed the renderer (exit code {worker.process.returncode}); "
+                                                   f"it may have exceeded the {MEMORY_MB} MB memory limit")
+            else:
+                response = json.loads(line)
+                if response["ok"]:
+                    result = RenderResult(True, base64.b64decode(response["pdf"]))
+                else:
+                    result = RenderResult(False, error=response["error"])
+                worker.jobs += 1
+                retire = worker.jobs >= JOBS_PER_WORKER
+        except (OSError, ValueError) as e:
+            result = RenderResult(False, error=f"PDF sandbox error: {e}")
+        finally:
+            if retire:
+                worker.close()
+                self._replace()
+            else:
+                self._idle.put(worker)
+
+        if result.ok:
+            with self._lock:
+                self._cache[key] = result.pdf
+                while len(self._cache) > CACHE_ENTRIES:
+                    self._cache.popitem(last=False)
+        return self._finish(result, started)
+
+    def _finish(self, result: RenderResult, started: float) -> RenderResult:
+        result.seconds = round(time.perf_counter() - started, 3)
+        with self._lock:
+            self._stats["ok" if result.ok else "failed"] += 1
+            self._stats["total_seconds"] += result.seconds
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            report = dict(self._stats)
+            report["cached_pdfs"] = len(self._cache)
+        report["idle_workers"] = self._idle.qsize()
+        report["available"] = self.available()
+        executed = report["ok"] + report["failed"]
+        report["avg_seconds"] = report["total_seconds"] / executed if executed else 0.0
+        return report
+
+
+_sandbox: Optional[PdfSandbox] = None
+_sandbox_lock = threading.Lock()
+
+
+def get_sandbox() -> PdfSandbox:
+    """Returns the shared sandbox pool, creating it on first use."""
+    global _sandbox
+    with _sandbox_lock:
+        if _sandbox is None:
+            _sandbox = PdfSandbox()
+        return _sandbox
+
+
+def shutdown_pool() -> None:
+    global _sandbox
+    with _sandbox_lock:
+        if _sandbox is not None:
+            _sandbox.shutdown()
+            _sandbox = None
@@ -0,0 +1,250 @@
+"""Sandbox worker: runs generated reportlab code and returns the PDF it writes.
+
+Started by app.services.pdf_sandbox as `python -I pdf_sandbox_worker.py MEMORY_MB CPU_SECONDS MAX_PDF_BYTES WORKDIR`.
+Protocol: after startup the worker writes {"ready": true} on stdout, then reads
+one JSON request ({"code": ...}) per stdin line and answers with one JSON line
+({"ok": true, "pdf": base64} or {"ok": false, "error": ...}).
+
+Each job runs in a forked child that closes stdin and the protocol pipe
+before executing the code, then applies the rlimits, network block and
+audit hook. The worker itself never runs generated code: it waits for the
+child (killing it after CPU_SECONDS of wall time) and reads and checks the
+PDF from WORKDIR, so the code cannot answer for itself or for later jobs.
+
+Limitation: audit hooks are not a security boundary (PEP 578). They stop
+ordinary file, process and network calls, but code that evades them, for
+example through interpreter internals or syscalls that raise no audit
+event, runs with the worker's full user privileges. Run the backend under a
+dedicated unprivileged uid, or in a container or seccomp profile, when the
+model's output cannot be trusted.
+
+Only the standard library and reportlab are imported here; this file must not
+import the app package.
+"""
+import base64
+import json
+import os
+import resource
+import select
+import signal
+import socket
+import sys
+import sysconfig
+import time
+import traceback
+
+# Operations the generated code may never perform
+_BLOCKED_EVENTS = {
+    "socket.__new__", "socket.connect", "socket.bind", "socket.getaddrinfo", "socket.sendto",
+    "urllib.Request", "subprocess.Popen", "os.system", "os.exec", "os.posix_spawn", "os.spawn",
+    "os.fork", "os.forkpty", "pty.spawn", "os.kill", "ctypes.dlopen", "ctypes.dlsym", "webbrowser.open",
+    "sqlite3.connect", "dbm.open",
+}
+# Filesystem mutations allowed only inside the working directory
+_PATH_EVENTS = {"os.remove", "os.rename", "os.rmdir", "os.mkdir", "shutil.rmtree", "os.chmod", "os.chown",
+                "os.symlink", "os.link", "os.truncate", "os.utime"}
+_WRITE_FLAGS = os.O_WRONLY | os.O_RDWR | os.O_CREAT | os.O_APPEND | os.O_TRUNC
+_MAX_ERROR_BYTES = 4096
+
+
+def _inside(path, *roots: str) -> bool:
+    if isinstance(path, int):
+        return True
+    if isinstance(path, bytes):
+        path = os.fsdecode(path)
+    # Relative paths resolve against the current directory, which os.chdir keeps inside workdir
+    resolved = os.path.realpath(os.fspath(path))
+    if resolved == os.devnull:
+        return True
+    return any(resolved == root or resolved.startswith(root + os.sep) for root in roots)
+
+
+def _read_roots(workdir: str) -> list:
+    """Directories generated code may read: its workdir, the standard library, reportlab and its fonts.
+
+    Everything else (the app's .env, /proc/*/environ, home directories) is off limits.
+    """
+    paths = sysconfig.get_paths()
+    roots = [workdir, paths["stdlib"], paths["platstdlib"]]
+    try:
+        import reportlab
+        from reportlab import rl_config
+        roots.append(os.path.dirname(reportlab.__file__))
+        for attr in ("TTFSearchPath", "T1SearchPath", "CMapSearchPath"):
+            roots.extend(p for p in getattr(rl_config, attr, ()) if isinstance(p, str) and os.path.isabs(p))
+    except ImportError:
+        pass
+    return [os.path.realpath(root) for root in roots if os.path.isdir(root)]
+
+
+def _audit_hook(workdir: str, read_roots: list):
+    def hook(event, args):
+        if event in _BLOCKED_EVENTS:
+            raise PermissionError(f"'{event}' is not allowed in the PDF sandbox")
+        if event == "open":
+            path, mode, flags = args
+            if path is None:
+                return
+            writing = (isinstance(mode, str) and any(ch in mode for ch in "wax+")) or (flags or 0) & _WRITE_FLAGS
+            if writing and not _inside(path, workdir):
+                raise PermissionError(f"Writing outside the working directory is not allowed: {path}")
+            if not _inside(path, *read_roots):
+                raise PermissionError(f"Reading outside the working directory is not allowed: {path}")
+        elif event in ("os.listdir", "os.scandir"):
+            if args and args[0] is not None and not _inside(args[0], *read_roots):
+                raise PermissionError(f"Listing outside the working directory is not allowed: {args[0]}")
+        elif event == "os.chdir" and args and not _inside(args[0], workdir):
+            raise PermissionError("Changing to a directory outside the working directory is not allowed")
+        elif event in _PATH_EVENTS and args and not _inside(args[0], workdir):
+            raise PermissionError(f"'{event}' outside the working directory is not allowed")
+    return hook
+
+
+def _deny_network() -> None:
+    def refuse(*args, **kwargs):
+        raise PermissionError("Network access is not allowed in the PDF sandbox")
+
+    socket.socket = refuse
+    socket.create_connection = refuse
+    socket.getaddrinfo = refuse
+
+
+def _limit_resources(memory_mb: int, cpu_seconds: int, max_pdf_bytes: int) -> None:
+    limits = [
+        (resource.RLIMIT_AS, memory_mb * 1024 * 1024),
+        (resource.RLIMIT_CPU, cpu_seconds),
+        (resource.RLIMIT_FSIZE, max_pdf_bytes),
+        (resource.RLIMIT_NOFILE, 64),
+        (resource.RLIMIT_CORE, 0),
+    ]
+    for limit, value in limits:
+        try:
+            resource.setrlimit(limit, (value, value))
+        except (ValueError, OSError):
+            pass
+
+
+def _error_summary(e: BaseException) -> str:
+    """Last exception line plus the generated-code line it came from."""
+    message = "".join(traceback.format_exception_only(type(e), e)).strip()
+    lines = [frame.lineno for frame in traceback.extract_tb(e.__traceback__) if frame.filename == "<generated>"]
+    return f"{message} (line {lines[-1]})" if lines else message
+
+
+def _execute(code: str, workdir: str, limits: tuple, report_fd: int) -> None:
+    """Child side of a job: locks the process down, runs `code` and reports an error summary, if any."""
+    status = 0
+    try:
+        _limit_resources(*limits)
+        _deny_network()
+        sys.addaudithook(_audit_hook(workdir, _read_roots(workdir)))
+        try:
+            exec(compile(code, "<generated>", "exec"), {"__name__": "__main__", "__builtins__": __builtins__})
+        except SystemExit:
+            pass
+        except BaseException as e:
+            os.write(report_fd, _error_summary(e).encode("utf-8", "replace")[:_MAX_ERROR_BYTES])
+    except BaseException:
+        status = 1
+    finally:
+        # Skip interpreter cleanup: the buffers and handlers inherited from the worker are not ours
+        os._exit(status)
+
+
+def _wait(pid: int, report_fd: int, timeout: float) -> tuple:
+    """Collects the child's error report and exit status, killing it after `timeout` seconds."""
+    deadline = time.monotonic() + timeout
+    report = b""
+    reading = True
+    while True:
+        if not reading:
+            done, status = os.waitpid(pid, os.WNOHANG)
+            if done:
+                return report.decode("utf-8", "replace"), status, False
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+            return report.decode("utf-8", "replace"), 0, True
+        if reading:
+            ready, _, _ = select.select([report_fd], [], [], remaining)
+            if ready:
+                chunk = os.read(report_fd, 4096)
+                reading = bool(chunk)
+                report = (report + chunk)[:_MAX_ERROR_BYTES]
+        else:
+            time.sleep(min(0.01, remaining))
+
+
+def _run(code: str, workdir: str, limits: tuple, protocol_fd: int) -> dict:
+    memory_mb, cpu_seconds, max_pdf_bytes = limits
+    for name in os.listdir(workdir):
+        os.remove(os.path.join(workdir, name))
+
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        # The child never holds the protocol pipe or the request stream
+        os.close(read_fd)
+        os.close(protocol_fd)
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)
+        os.close(devnull)
+        _execute(code, workdir, limits, write_fd)
+    os.close(write_fd)
+    try:
+        error, status, timed_out = _wait(pid, read_fd, cpu_seconds)
+    finally:
+        os.close(read_fd)
+
+    if timed_out or (os.WIFSIGNALED(status) and os.WTERMSIG(status) == signal.SIGXCPU):
+        return {"ok": False, "error": f"The code did not finish within {cpu_seconds}s"}
+    if error:
+        return {"ok": False, "error": error}
+    if status != 0:
+        return {"ok": False, "error": f"The code crashed the renderer (status {status}); "
+                                      f"it may have exceeded the {memory_mb} MB memory limit"}
+
+    # Symlinks are skipped: the worker reads the file without the child's audit hook
+    pdfs = [os.path.join(workdir, name) for name in os.listdir(workdir)
+            if name.lower().endswith(".pdf") and not os.path.islink(os.path.join(workdir, name))]
+    if not pdfs:
+        return {"ok": False, "error": "The code ran but did not save a PDF file (call canvas.save())"}
+    path = max(pdfs, key=os.path.getmtime)
+    if os.path.getsize(path) > max_pdf_bytes:
+        return {"ok": False, "error": f"The PDF is larger than {max_pdf_bytes} bytes"}
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(b"%PDF"):
+        return {"ok": False, "error": "The saved file is not a PDF"}
+    return {"ok": True, "pdf": base64.b64encode(data).decode("ascii")}
+
+
+def main() -> None:
+    limits = tuple(int(arg) for arg in sys.argv[1:4])
+    workdir = os.path.realpath(sys.argv[4])
+
+    # Keep the real stdout for the protocol; anything the generated code prints goes to stderr
+    protocol = os.fdopen(os.dup(1), "w")
+    os.dup2(2, 1)
+    sys.stdout = sys.stderr
+
+    # Pre-import what generated code typically uses, so jobs don't pay for it
+    import reportlab.graphics.shapes  # noqa: F401
+    import reportlab.lib.colors  # noqa: F401
+    import reportlab.lib.pagesizes  # noqa: F401
+    import reportlab.lib.units  # noqa: F401
+    import reportlab.pdfgen.canvas  # noqa: F401
+
+    os.chdir(workdir)
+
+    protocol.write(json.dumps({"ready": True}) + "\n")
+    protocol.flush()
+    for line in sys.stdin:
+        request = json.loads(line)
+        protocol.write(json.dumps(_run(request["code"], workdir, limits, protocol.fileno())) + "\n")
+        protocol.flush()
+
+
+if __name__ == "__main__":
+    main()
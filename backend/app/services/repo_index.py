@@ -0,0 +1,582 @@
+import ast
+import math
+import multiprocessing
+import os
+import posixpath
+import re
+import tarfile
+import threading
+import time
+import zipfile
+import zlib
+from collections import Counter, defaultdict
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Set, Tuple
+
+from app.services.tokens import count_tokens
+
+# --- Configuration ---
+WORKERS = int(os.getenv("REPO_INDEX_WORKERS", str(os.cpu_count() or 2)))
+FILES_PER_TASK = int(os.getenv("REPO_INDEX_FILES_PER_TASK", "32"))
+MAX_FILES = int(os.getenv("REPO_MAX_FILES", "20000"))
+MAX_FILE_BYTES = int(os.getenv("REPO_MAX_FILE_BYTES", str(1024 * 1024)))
+# Zip-bomb guard: stop reading once this much has been decompressed
+MAX_TOTAL_BYTES = int(os.getenv("REPO_MAX_TOTAL_BYTES", str(512 * 1024 * 1024)))
+# What the LLM gets: an index of at most INDEX_TOKENS plus the source of the HOT_FILES top-ranked files
+INDEX_TOKENS = int(os.getenv("REPO_INDEX_TOKENS", "3000"))
+HOT_FILES = int(os.getenv("REPO_HOT_FILES", "5"))
+HOT_FILE_TOKENS = int(os.getenv("REPO_HOT_FILE_TOKENS", "1500"))
+
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+
+LANGUAGES = {
+    ".py": "python", ".pyw": "python", ".js": "javascript", ".jsx": "javascript", ".mjs": "javascript",
+    ".cjs": "javascript", ".ts": "typescript", ".tsx": "typescript", ".go": "go", ".rs": "rust",
+    ".java": "java", ".kt": "kotlin", ".scala": "scala", ".rb": "ruby", ".php": "php", ".cs": "csharp",
+    ".c": "c", ".h": "c", ".cc": "cpp", ".cpp": "cpp", ".cxx": "cpp", ".hpp": "cpp", ".swift": "swift",
+    ".m": "objc", ".sh": "shell", ".lua": "lua", ".dart": "dart", ".vue": "vue", ".svelte": "svelte",
+}
+# Directories holding third-party, generated or tooling files
+VENDORED_DIRS = {
+    "node_modules", "vendor", "vendors", "third_party", "third-party", "external", "bower_components",
+    "site-packages", "dist-packages", "venv", ".venv", "env", ".tox", ".nox", "__pycache__", ".git", ".hg",
+    ".svn", ".idea", ".vscode", "dist", "build", "out", "target", ".next", ".nuxt", "coverage", "Pods",
+    ".gradle", ".mypy_cache", ".pytest_cache", "migrations",
+}
+_GENERATED_RE = re.compile(r"(\.min\.(js|css)$|\.bundle\.js$|_pb2(_grpc)?\.py$|\.pb\.go$|\.generated\.)")
+
+_TEST_RE = re.compile(r"(^|/)(tests?|__tests__|spec)/|(^|/)test_[^/]*$|_test\.\w+$|\.(test|spec)\.\w+$")
+
+# Generic (non-Python) extraction
+_IMPORT_RES = [
+    re.compile(r"""^\s*import\s+(?:[\w*{}\s,]+\s+from\s+)?["']([^"']+)["']""", re.M),
+    re.compile(r"""\brequire\(\s*["']([^"']+)["']\s*\)"""),
+    re.compile(r"""^\s*export\s+[\w*{}\s,]+\s+from\s+["']([^"']+)["']""", re.M),
+    re.compile(r"""^\s*#\s*include\s+["<]([^">]+)[">]""", re.M),
+    re.compile(r"""^\s*(?:import|using)\s+(?:static\s+)?([\w.]+)\s*;""", re.M),
+    re.compile(r"""^\s*use\s+([\w:]+)""", re.M),
+    re.compile(r"""^\s*(?:import\s+)?(?:\w+\s+)?"([\w./-]+)"\s*$""", re.M),  # Go import blocks
+]
+_DEF_RE = re.compile(
+    r"^\s*(?:export\s+|public\s+|private\s+|protected\s+|static\s+|async\s+|pub\s+|default\s+|abstract\s+)*"
+    r"(?:function\*?\s+(\w+)|def\s+(\w+)|func\s+(?:\([^)]*\)\s*)?(\w+)|fn\s+(\w+)|"
+    r"class\s+(\w+)|interface\s+(\w+)|struct\s+(\w+)|(?:const|let|var)\s+(\w+)\s*=\s*(?:async\s*)?\([^)]*\)\s*=>)",
+    re.M,
+)
+_BRANCH_RE = re.compile(r"\b(?:if|for|while|case|catch|elif|elsif|except|guard)\b|&&|\|\||\?\?")
+_CALL_RE = re.compile(r"\b([A-Za-z_]\w*)\s*\(")
+_KEYWORDS = {
+    "if", "for", "while", "switch", "catch", "return", "function", "def", "class", "new", "typeof", "sizeof",
+    "super", "print", "elif", "not", "and", "or", "in", "with", "assert", "await", "yield", "lambda", "func", "fn",
+}
+# Names too common to link calls across files
+_COMMON_NAMES = {"main", "run", "get", "set", "init", "__init__", "start", "stop", "close", "update", "create",
+                 "delete", "read", "write", "load", "save", "process", "handle", "render", "setup", "test", "call"}
+
+
+class ArchiveError(ValueError):
+    """Raised for unreadable or oversized archives."""
+
+
+def is_archive(filename: str, head: bytes = b"") -> bool:
+    """True for zip/tar uploads, by name or by magic bytes."""
+    if (filename or "").lower().endswith(ARCHIVE_SUFFIXES):
+        return True
+    return head.startswith(b"PK\x03\x04") or head.startswith(b"\x1f\x8b") or head[257:262] == b"ustar"
+
+
+def skip_reason(path: str) -> Optional[str]:
+    """Why a file is left out of the index, or None if it should be analyzed."""
+    parts = path.split("/")
+    if any(part in VENDORED_DIRS or (part.startswith(".") and part not in (".", "..")) for part in parts[:-1]):
+        return "vendored"
+    if _GENERATED_RE.search(path):
+        return "generated"
+    if posixpath.splitext(path)[1].lower() not in LANGUAGES:
+        return "unsupported"
+    return None
+
+
+# --- Archive reading (streams members one at a time) ---
+
+def _iter_zip(fileobj: BinaryIO) -> Iterator[Tuple[str, int, Any]]:
+    try:
+        archive = zipfile.ZipFile(fileobj)
+    except zipfile.BadZipFile as e:
+        raise ArchiveError(f"Not a valid zip archive: {e}")
+    with archive:
+        for info in archive.infolist():
+            if not info.is_dir():
+                yield info.filename, info.file_size, lambda info=info: archive.open(info)
+
+
+def _iter_tar(fileobj: BinaryIO) -> Iterator[Tuple[str, int, Any]]:
+    try:
+        # "r|*" reads the (possibly compressed) tar strictly sequentially, without seeking
+        archive = tarfile.open(fileobj=fileobj, mode="r|*")
+    except tarfile.TarError as e:
+        raise ArchiveError(f"Not a valid tar archive: {e}")
+    with archive:
+        for member in archive:
+            if member.isfile():
+                yield member.name, member.size, lambda member=member: archive.extractfile(member)
+
+
+def iter_source_files(fileobj: BinaryIO, filename: str, skipped: Counter) -> Iterator[Tuple[str, str]]:
+    """Yields (path, text) for each analyzable file, counting the others in `skipped` by reason."""
+    head = fileobj.read(512)
+    fileobj.seek(0)
+    members = _iter_zip(fileobj) if head.startswith(b"PK") else _iter_tar(fileobj)
+    total = 0
+    files = 0
+    for name, size, open_member in members:
+        path = posixpath.normpath(name.replace("\\", "/")).lstrip("/")
+        if path.startswith("..") or path == ".":
+            skipped["unsafe_path"] += 1
+            continue
+        reason = skip_reason(path)
+        if reason is None and size > MAX_FILE_BYTES:
+            reason = "too_large"
+        if reason is not None:
+            skipped[reason] += 1
+            continue
+        files += 1
+        if files > MAX_FILES:
+            raise ArchiveError(f"The archive has more than {MAX_FILES} source files.")
+        try:
+            with open_member() as member:
+                data = member.read(MAX_FILE_BYTES + 1)
+        except (RuntimeError, NotImplementedError, zipfile.BadZipFile) as e:
+            # Encrypted members or unsupported compression methods
+            print(f"Skipping unreadable archive member {path}: {e}")
+            skipped["unreadable"] += 1
+            continue
+        total += len(data)
+        if total > MAX_TOTAL_BYTES:
+            raise ArchiveError(f"The archive expands to more than {MAX_TOTAL_BYTES} bytes of source.")
+        if len(data) > MAX_FILE_BYTES:
+            skipped["too_large"] += 1
+            continue
+        if b"\0" in data[:8192]:
+            skipped["binary"] += 1
+            continue
+        try:
+            text = data.decode("utf-8")
+        except UnicodeDecodeError:
+            skipped["binary"] += 1
+            continue
+        yield path, text
+
+
+# --- Worker functions (run in the process pool) ---
+
+def _loc(lines: List[str], comment_prefixes: Tuple[str, ...]) -> int:
+    return sum(1 for line in lines if line.strip() and not line.strip().startswith(comment_prefixes))
+
+
+_FUNCTION_NODES = {ast.FunctionDef, ast.AsyncFunctionDef}
+_BRANCH_NODES = {ast.If, ast.For, ast.AsyncFor, ast.While, ast.IfExp, ast.ExceptHandler, ast.Assert,
+                 ast.comprehension, ast.match_case}
+# Leaves that can't contain anything of interest
+_LEAF_NODES = (ast.Constant, ast.Name, ast.expr_context, ast.operator, ast.unaryop, ast.cmpop, ast.boolop, ast.alias)
+
+
+def _walk_python(tree: ast.Module, module: str, is_package: bool) -> Dict[str, Any]:
+    """Collects imports, definitions, calls and McCabe complexity in one iterative pass.
+
+    An explicit stack instead of ast.NodeVisitor: the per-node method
+    dispatch dominated indexing time on large repositories.
+    """
+    imports: List[str] = []
+    functions: List[Dict[str, Any]] = []
+    classes: List[str] = []
+    calls: Counter = Counter()
+    module_record = {"complexity": 1}
+    stack: List[Tuple[ast.AST, Dict[str, Any], str]] = [(tree, module_record, "")]
+    while stack:
+        node, owner, scope = stack.pop()
+        kind = type(node)
+        if kind in _FUNCTION_NODES:
+            owner = {"name": scope + node.name, "line": node.lineno, "complexity": 1}
+            functions.append(owner)
+            scope = f"{scope}{node.name}."
+        elif kind is ast.ClassDef:
+            classes.append(scope + node.name)
+            scope = f"{scope}{node.name}."
+        elif kind in _BRANCH_NODES:
+            owner["complexity"] += 1
+        elif kind is ast.BoolOp:
+            owner["complexity"] += len(node.values) - 1
+        elif kind is ast.Call:
+            func = node.func
+            if type(func) is ast.Name:
+                calls[func.id] += 1
+            elif type(func) is ast.Attribute:
+                calls[func.attr] += 1
+        elif kind is ast.Import:
+            imports.extend(alias.name for alias in node.names)
+            continue
+        elif kind is ast.ImportFrom:
+            base = node.module or ""
+            if node.level:
+                # Relative to the containing package (a package's __init__ is its own container)
+                parts = module.split(".")
+                package = parts[:len(parts) - node.level + (1 if is_package else 0)]
+                base = ".".join(package + ([base] if base else []))
+            imports.append(base)
+            # `from pkg import module` imports submodules too
+            imports.extend(f"{base}.{alias.name}" for alias in node.names if base)
+            continue
+
+        for field in node._fields:
+            value = getattr(node, field, None)
+            if isinstance(value, list):
+                stack.extend((item, owner, scope) for item in value
+                             if isinstance(item, ast.AST) and not isinstance(item, _LEAF_NODES))
+            elif isinstance(value, ast.AST) and not isinstance(value, _LEAF_NODES):
+                stack.append((value, owner, scope))
+
+    functions.sort(key=lambda f: f["line"])
+    return {
+        "imports": imports,
+        "functions": functions,
+        "classes": classes,
+        "calls": dict(calls),
+        "complexity": module_record["complexity"] + sum(f["complexity"] - 1 for f in functions),
+    }
+
+
+def python_module_name(path: str) -> str:
+    module = posixpath.splitext(path)[0].replace("/", ".")
+    return module[:-len(".__init__")] if module.endswith(".__init__") else module
+
+
+def _analyze_python(path: str, text: str, lines: List[str]) -> Optional[Dict[str, Any]]:
+    try:
+        tree = ast.parse(text)
+        facts = _walk_python(tree, python_module_name(path), posixpath.basename(path).startswith("__init__."))
+    except (SyntaxError, ValueError, RecursionError, MemoryError):
+        # Invalid code, or nesting deep enough to exhaust the parser; use the regex analysis instead
+        return None
+    facts["loc"] = _loc(lines, ("#",))
+    return facts
+
+
+def _analyze_generic(text: str, lines: List[str]) -> Dict[str, Any]:
+    imports = [match for pattern in _IMPORT_RES for match in pattern.findall(text)]
+    functions, classes = [], []
+    for match in _DEF_RE.finditer(text):
+        name = next(group for group in match.groups() if group)
+        line = text.count("\n", 0, match.start()) + 1
+        if match.group(5) or match.group(6) or match.group(7):
+            classes.append(name)
+        else:
+            functions.append({"name": name, "line": line, "complexity": 0})
+    calls = Counter(name for name in _CALL_RE.findall(text) if name not in _KEYWORDS)
+    return {
+        "loc": _loc(lines, ("//", "#", "/*", "*", "--")),
+        "imports": imports,
+        "functions": functions,
+        "classes": classes,
+        "calls": dict(calls),
+        "complexity": 1 + len(_BRANCH_RE.findall(text)),
+    }
+
+
+def analyze_file(path: str, text: str) -> Dict[str, Any]:
+    """Static facts about one source file: LOC, complexity, imports, definitions and calls."""
+    language = LANGUAGES.get(posixpath.splitext(path)[1].lower(), "other")
+    lines = text.splitlines()
+    facts = _analyze_python(path, text, lines) if language == "python" else None
+    if facts is None:
+        facts = _analyze_generic(text, lines)
+    facts.update(path=path, language=language, lines=len(lines), test=bool(_TEST_RE.search(path)))
+    return facts
+
+
+def _analyze_batch(files: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+    return [analyze_file(path, text) for path, text in files]
+
+
+# --- Pool management ---
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """Returns the shared indexing pool, starting it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn avoids forking a parent that already runs threads and an event loop
+            _pool = ProcessPoolExecutor(max_workers=WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+# --- Graph building and ranking ---
+
+class RepoIndex:
+    """Per-file facts plus the import and call graphs between files."""
+
+    def __init__(self, name: str, files: List[Dict[str, Any]], skipped: Counter, seconds: float):
+        self.name = name
+        self.files = {facts["path"]: facts for facts in files}
+        self.skipped = skipped
+        self.seconds = seconds
+        self.imports: Dict[str, Set[str]] = defaultdict(set)
+        self.importers: Counter = Counter()
+        self.calls: Dict[str, Counter] = defaultdict(Counter)
+        self.symbol_callers: Dict[Tuple[str, str], Set[str]] = defaultdict(set)
+        self._link()
+        self.rank = self._rank()
+
+    def _resolve_import(self, source: str, target: str, modules: Dict[str, str],
+                        stems: Dict[str, List[str]]) -> Optional[str]:
+        if self.files[source]["language"] == "python":
+            return modules.get(target)
+        if target.startswith("."):
+            base = posixpath.normpath(posixpath.join(posixpath.dirname(source), target))
+            for candidate in (base, *(base + ext for ext in LANGUAGES), *(f"{base}/index{ext}" for ext in LANGUAGES)):
+                if candidate in self.files:
+                    return candidate
+            return None
+        # Non-relative imports: match on the file name ("dir/foo.h"), then on the last
+        # path component without extension ("com.x.Foo", "crate::foo", "@/components/Button")
+        candidates = stems.get(posixpath.basename(target), [])
+        if len(candidates) == 1:
+            return candidates[0]
+        target = re.sub(r"\.\w+$", "", target) if posixpath.splitext(target)[1].lower() in LANGUAGES else target
+        stem = re.split(r"[./:\\]", target.rstrip("/"))[-1]
+        candidates = stems.get(stem, [])
+        return candidates[0] if len(candidates) == 1 else None
+
+    def _link(self) -> None:
+        # Every dotted suffix of a Python file's module name, so "app.x" matches "backend/app/x.py"
+        modules: Dict[str, str] = {}
+        stems: Dict[str, List[str]] = defaultdict(list)
+        definers: Dict[str, Set[str]] = defaultdict(set)
+        for path, facts in self.files.items():
+            stems[posixpath.basename(path)].append(path)
+            stems[posixpath.splitext(posixpath.basename(path))[0]].append(path)
+            if facts["language"] == "python":
+                parts = python_module_name(path).split(".")
+                for i in range(len(parts)):
+                    modules.setdefault(".".join(parts[i:]), path)
+            for function in facts["functions"]:
+                definers[function["name"].split(".")[-1]].add(path)
+            for name in facts["classes"]:
+                definers[name.split(".")[-1]].add(path)
+
+        for path, facts in self.files.items():
+            for target in facts["imports"]:
+                resolved = self._resolve_import(path, target, modules, stems)
+                if resolved and resolved != path and resolved not in self.imports[path]:
+                    self.imports[path].add(resolved)
+                    self.importers[resolved] += 1
+            for name, count in facts["calls"].items():
+                owners = definers.get(name)
+                if not owners or path in owners or name in _COMMON_NAMES or len(name) < 3:
+                    continue
+                # Link a call when one file defines the name, or when exactly one of the definers is imported
+                imported = owners & self.imports[path]
+                owner = next(iter(owners)) if len(owners) == 1 else (next(iter(imported)) if len(imported) == 1 else None)
+                if owner:
+                    self.calls[path][owner] += count
+                    self.symbol_callers[(owner, name)].add(path)
+
+    def _rank(self) -> Dict[str, float]:
+        """PageRank over import and call edges plus a hub term, boosted by complexity, so central,
+        complex files rank first."""
+        paths = list(self.files)
+        if not paths:
+            return {}
+        out_edges = {path: set(self.imports[path]) | set(self.calls[path]) for path in paths}
+        score = {path: 1.0 / len(paths) for path in paths}
+        damping = 0.85
+        for _ in range(30):
+            dangling = sum(score[path] for path in paths if not out_edges[path])
+            fresh = {path: (1 - damping) / len(paths) + damping * dangling / len(paths) for path in paths}
+            for path in paths:
+                if out_edges[path]:
+                    share = damping * score[path] / len(out_edges[path])
+                    for target in out_edges[path]:
+                        fresh[target] += share
+            score = fresh
+        # PageRank favours depended-upon leaves; the hub term brings back entry points that wire everything up
+        top_score = max(score.values())
+        top_out = max(len(edges) for edges in out_edges.values()) or 1
+        return {
+            path: (score[path] / top_score + 0.5 * len(out_edges[path]) / top_out)
+            * (1 + math.log1p(self.files[path]["complexity"])) * (0.3 if self.files[path]["test"] else 1)
+            for path in paths
+        }
+
+    def ranked(self) -> List[str]:
+        return sorted(self.files, key=lambda path: -self.rank[path])
+
+    def stats(self) -> Dict[str, Any]:
+        languages = Counter(facts["language"] for facts in self.files.values())
+        return {
+            "files_analyzed": len(self.files),
+            "files_skipped": dict(self.skipped),
+            "loc": sum(facts["loc"] for facts in self.files.values()),
+            "complexity": sum(facts["complexity"] for facts in self.files.values()),
+            "languages": dict(languages.most_common()),
+            "import_edges": sum(len(targets) for targets in self.imports.values()),
+            "call_edges": sum(len(targets) for targets in self.calls.values()),
+            "hot_files": self.ranked()[:HOT_FILES],
+            "seconds": round(self.seconds, 3),
+        }
+
+    def _file_line(self, path: str) -> str:
+        facts = self.files[path]
+        functions = sorted(facts["functions"], key=lambda f: -f["complexity"])
+        complex_ = ", ".join(f"{f['name']} ({f['complexity']})" for f in functions[:3] if f["complexity"] > 1)
+        defines = ", ".join((facts["classes"] + [f["name"] for f in facts["functions"] if "." not in f["name"]])[:6])
+        deps = ", ".join(sorted(self.imports[path])[:4])
+        line = (f"- {path} [{facts['language']}] LOC {facts['loc']}, CC {facts['complexity']}, "
+                f"imported by {self.importers[path]}")
+        if defines:
+            line += f"; defines: {defines}"
+        if complex_:
+            line += f"; most complex: {complex_}"
+        if deps:
+            line += f"; uses: {deps}"
+        return line
+
+    def compact_index(self, budget: int = INDEX_TOKENS) -> str:
+        """A token-bounded text index: totals, directories, ranked files and the most-called symbols."""
+        stats = self.stats()
+        skipped = ", ".join(f"{reason} {count}" for reason, count in self.skipped.most_common()) or "none"
+        header = [
+            f"Repository: {self.name}",
+            f"{stats['files_analyzed']} source files, {stats['loc']} LOC, total cyclomatic complexity "
+            f"{stats['complexity']}; languages: {', '.join(f'{k} {v}' for k, v in stats['languages'].items())}; "
+            f"skipped: {skipped}",
+            "",
+            "Directories (files, LOC, complexity):",
+        ]
+        directories: Dict[str, List[int]] = defaultdict(lambda: [0, 0, 0])
+        for path, facts in self.files.items():
+            totals = directories[posixpath.dirname(path) or "."]
+            totals[0] += 1
+            totals[1] += facts["loc"]
+            totals[2] += facts["complexity"]
+        for directory, (count, loc, complexity) in sorted(directories.items(), key=lambda item: -item[1][1])[:25]:
+            header.append(f"- {directory}/: {count} files, {loc} LOC, CC {complexity}")
+        if len(directories) > 25:
+            header.append(f"- ... {len(directories) - 25} more directories")
+
+        symbols = sorted(self.symbol_callers.items(), key=lambda item: -len(item[1]))[:15]
+        footer = ["", "Most-called symbols (defined in <- called from N files):"]
+        footer += [f"- {name} ({owner}) <- {len(callers)}" for (owner, name), callers in symbols]
+
+        lines = header + ["", "Files by importance (import/call centrality x complexity):"]
+        used = count_tokens("\n".join(lines + footer))
+        ranked = self.ranked()
+        for index, path in enumerate(ranked):
+            line = self._file_line(path)
+            cost = count_tokens(line) + 1
+            if used + cost > budget:
+                lines.append(f"- ... {len(ranked) - index} more files")
+                break
+            lines.append(line)
+            used += cost
+        return "\n".join(lines + footer)
+
+
+def hot_file_sources(index: RepoIndex, sources: Dict[str, str], count: int = HOT_FILES,
+                     max_tokens: int = HOT_FILE_TOKENS) -> str:
+    """Source of the top-ranked files, each cut to `max_tokens`, as Markdown code blocks."""
+    blocks = []
+    for path in index.ranked()[:count]:
+        kept, used = [], 0
+        lines = sources[path].splitlines(keepends=True)
+        for line in lines:
+            used += count_tokens(line)
+            if used > max_tokens:
+                break
+            kept.append(line)
+        note = "" if len(kept) == len(lines) else f"\n... ({len(lines) - len(kept)} more lines)"
+        blocks.append(f"### {path}\n```\n{''.join(kept).rstrip()}{note}\n```")
+    return "\n\n".join(blocks)
+
+
+# --- Public API ---
+
+def build_index(fileobj: BinaryIO, filename: str) -> Tuple[RepoIndex, Dict[str, str]]:
+    """Reads an archive and indexes its source files (blocking).
+
+    Files are handed to the process pool in batches while the archive is
+    still being decompressed. Returns the index and the text of the files
+    that rank highest, for use as hot-file context.
+    """
+    started = time.perf_counter()
+    skipped: Counter = Counter()
+    facts: List[Dict[str, Any]] = []
+    sources: Dict[str, str] = {}
+    pending: Set[Future] = set()
+    pool: Optional[ProcessPoolExecutor] = None
+    batch: List[Tuple[str, str]] = []
+
+    def collect(done: Set[Future]) -> None:
+        for future in done:
+            facts.extend(future.result())
+
+    def flush() -> None:
+        nonlocal pool, pending
+        if pool is None:
+            pool = get_pool()
+        pending.add(pool.submit(_analyze_batch, list(batch)))
+        batch.clear()
+        # Bound the work in flight so a huge archive doesn't pile up in memory
+        if len(pending) >= WORKERS * 4:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            collect(done)
+
+    try:
+        for path, text in iter_source_files(fileobj, filename, skipped):
+            sources[path] = text
+            batch.append((path, text))
+            if len(batch) >= FILES_PER_TASK:
+                flush()
+        if pool is None:
+            # Small archive: not worth a round trip through the pool
+            facts.extend(_analyze_batch(batch))
+        elif batch:
+            flush()
+        collect(wait(pending).done)
+    except (zipfile.BadZipFile, tarfile.TarError, zlib.error, EOFError, OSError) as e:
+        raise ArchiveError(f"Could not read the archive: {e}")
+    finally:
+        for future in pending:
+            future.cancel()
+
+    name = re.sub(r"(\.tar)?\.\w+$", "", os.path.basename(filename or "")) or "repository"
+    index = RepoIndex(name, facts, skipped, time.perf_counter() - started)
+    hot = set(index.ranked()[:HOT_FILES])
+    return index, {path: text for path, text in sources.items() if path in hot}
+
+
+def summarize_archive(fileobj: BinaryIO, filename: str) -> Dict[str, Any]:
+    """Indexes an archive and returns what the analyzer sends the LLM (blocking).
+
+    {"index": compact index text, "hot_files": hot-file sources, "stats": totals}
+    """
+    index, sources = build_index(fileobj, filename)
+    text = index.compact_index()
+    hot_files = hot_file_sources(index, sources)
+    stats = index.stats()
+    stats.update(index_tokens=count_tokens(text), hot_file_tokens=count_tokens(hot_files))
+    print(f"Indexed {stats['files_analyzed']} files in {stats['seconds']}s "
+          f"({stats['index_tokens'] + stats['hot_file_tokens']} prompt tokens)")
+    return {"index": text, "hot_files": hot_files, "stats": stats}
@@ -0,0 +1,144 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# --- Configuration ---
+SIMILARITY_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+CACHE_TTL_SECONDS = int(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", "86400"))
+MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "1000"))
+# Long messages are rarely repeated and usually carry their own context
+MAX_QUESTION_CHARS = int(os.getenv("SEMANTIC_CACHE_MAX_QUESTION_CHARS", "300"))
+# Replayed answers are split into chunks of roughly this many characters
+REPLAY_CHUNK_CHARS = 24
+
+
+def normalize_question(text: str) -> str:
+    return re.sub(r"\s+", " ", text.strip().lower()).rstrip("?!. ")
+
+
+class _Entry:
+    def __init__(self, question: str, answer: str, vector: np.ndarray):
+        self.question = question
+        self.answer = answer
+        self.vector = vector
+        self.created_at = time.time()
+        self.hits = 0
+
+
+class SemanticCache:
+    """Caches answers to context-free questions, matched by embedding similarity.
+
+    Entries are keyed by the normalized question and hold a unit-length
+    embedding; a lookup first tries the exact key, then the nearest stored
+    embedding by cosine similarity, accepting it above `threshold`. Entries
+    expire after `ttl` seconds and the least recently used ones are dropped
+    beyond `max_entries`. `scope` (e.g. the system prompt) is part of the key,
+    so answers written under a different prompt are never replayed.
+    """
+
+    def __init__(self, embeddings_factory: Callable[[], Any], threshold: float = SIMILARITY_THRESHOLD,
+                 ttl: int = CACHE_TTL_SECONDS, max_entries: int = MAX_ENTRIES):
+        self.embeddings_factory = embeddings_factory
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        self._stats = {"lookups": 0, "hits": 0, "exact_hits": 0, "misses": 0, "stores": 0,
+                       "evictions": 0, "expirations": 0, "errors": 0}
+
+    def cacheable(self, message: str) -> bool:
+        return 0 < len(message.strip()) <= MAX_QUESTION_CHARS
+
+    async def _embed(self, question: str) -> np.ndarray:
+        vector = np.asarray(await self.embeddings_factory().aembed_query(question), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _expire(self, now: float) -> None:
+        expired = [key for key, entry in self._entries.items() if now - entry.created_at > self.ttl]
+        for key in expired:
+            del self._entries[key]
+        self._stats["expirations"] += len(expired)
+
+    def _nearest(self, scope: str, vector: np.ndarray) -> Tuple[Optional[Tuple[str, str]], float]:
+        keys = [key for key in self._entries if key[0] == scope]
+        if not keys:
+            return None, 0.0
+        matrix = np.stack([self._entries[key].vector for key in keys])
+        scores = matrix @ vector
+        best = int(np.argmax(scores))
+        return keys[best], float(scores[best])
+
+    async def lookup(self, scope: str, message: str) -> Tuple[Optional[str], Optional[np.ndarray]]:
+        """Returns (cached answer or None, question embedding for a later `store`)."""
+        key = (scope, normalize_question(message))
+        with self._lock:
+            self._stats["lookups"] += 1
+            self._expire(time.time())
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                entry.hits += 1
+                self._stats["hits"] += 1
+                self._stats["exact_hits"] += 1
+                return entry.answer, None
+
+        try:
+            vector = await self._embed(key[1])
+        except Exception as e:
+            self._stats["errors"] += 1
+            print(f"Error embedding question for semantic cache: {e}")
+            return None, None
+
+        with self._lock:
+            best, score = self._nearest(scope, vector)
+            if best is not None and score >= self.threshold:
+                entry = self._entries[best]
+                self._entries.move_to_end(best)
+                entry.hits += 1
+                self._stats["hits"] += 1
+                return entry.answer, vector
+            self._stats["misses"] += 1
+        return None, vector
+
+    def store(self, scope: str, message: str, answer: str, vector: Optional[np.ndarray]) -> None:
+        if vector is None or not answer.strip():
+            return
+        key = (scope, normalize_question(message))
+        with self._lock:
+            self._entries[key] = _Entry(key[1], answer, vector)
+            self._entries.move_to_end(key)
+            self._stats["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            report = dict(self._stats)
+            report["entries"] = len(self._entries)
+        report["hit_rate"] = report["hits"] / report["lookups"] if report["lookups"] else 0.0
+        report["threshold"] = self.threshold
+        report["ttl_seconds"] = self.ttl
+        report["max_entries"] = self.max_entries
+        return report
+
+
+def replay_chunks(answer: str) -> List[str]:
+    """Splits a cached answer into stream-sized deltas on word boundaries."""
+    chunks: List[str] = []
+    current = ""
+    for word in re.findall(r"\S+\s*|\s+", answer):
+        current += word
+        if len(current) >= REPLAY_CHUNK_CHARS:
+            chunks.append(current)
+            current = ""
+    if current:
+        chunks.append(current)
+    return chunks
@@ -0,0 +1,297 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from pydantic import BaseModel
+
+# --- Configuration ---
+# TTLs are idle times in seconds, keyed by the state class name.
+DEFAULT_TTLS = {
+    "DocIntelState": float(os.getenv("SESSION_TTL_DOC_INTEL", "1800")),
+    "CodeAnalyzerState": float(os.getenv("SESSION_TTL_CODE_ANALYZER", "1800")),
+    "ChatState": float(os.getenv("SESSION_TTL_CHAT", "3600")),
+    "VoiceAssistantState": float(os.getenv("SESSION_TTL_VOICE", "1800")),
+}
+DEFAULT_TTL = float(os.getenv("SESSION_TTL_DEFAULT", "1800"))
+MAX_SESSIONS = int(os.getenv("SESSION_MAX_COUNT", "1000"))
+MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", str(512 * 1024 * 1024)))
+SWEEP_INTERVAL = float(os.getenv("SESSION_SWEEP_INTERVAL", "60"))
+
+
+def _estimate_faiss_bytes(vectorstore: Any) -> int:
+    """Estimates the memory held by a FAISS vector store (vectors + chunk texts)."""
+    size = 0
+    index = getattr(vectorstore, "index", None)
+    if index is not None:
+        # Flat float32 vectors dominate; ntotal * d * 4 bytes.
+        size += int(getattr(index, "ntotal", 0)) * int(getattr(index, "d", 0)) * 4
+    docstore = getattr(vectorstore, "docstore", None)
+    for doc in getattr(docstore, "_dict", {}).values():
+        size += _estimate_bytes(doc)
+    return size
+
+
+def _estimate_bytes(value: Any, _depth: int = 0) -> int:
+    """Recursively estimates the size of a value in bytes."""
+    if _depth > 8 or value is None:
+        return 0
+    if isinstance(value, (str, bytes)):
+        return sys.getsizeof(value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            _estimate_bytes(k, _depth + 1) + _estimate_bytes(v, _depth + 1) for k, v in value.items()
+        )
+    if isinstance(value, (list, tuple, set)):
+        return sys.getsizeof(value) + sum(_estimate_bytes(v, _depth + 1) for v in value)
+    if isinstance(value, BaseModel):
+        return sum(_estimate_bytes(getattr(value, name), _depth + 1) for name in type(value).model_fields)
+    # Retrievers wrap a vector store; count the vectors they keep alive.
+    vectorstore = getattr(value, "vectorstore", None)
+    if vectorstore is not None:
+        return _estimate_faiss_bytes(vectorstore)
+    if hasattr(value, "index") and hasattr(value, "docstore"):
+        return _estimate_faiss_bytes(value)
+    if hasattr(value, "page_content"):
+        return sys.getsizeof(value.page_content) + _estimate_bytes(getattr(value, "metadata", None), _depth + 1)
+    return sys.getsizeof(value)
+
+
+def estimate_state_bytes(state: Any) -> int:
+    """Estimates the number of bytes a session state keeps in memory."""
+    return _estimate_bytes(state)
+
+
+class _Entry:
+    __slots__ = ("state", "size", "last_access", "ttl")
+
+    def __init__(self, state: Any, size: int, ttl: float):
+        self.state = state
+        self.size = size
+        self.ttl = ttl
+        self.last_access = time.monotonic()
+
+
+class SessionStore:
+    """Bounded, thread-safe store for per-session agent state.
+
+    Sessions are kept in LRU order and evicted when they have been idle longer
+    than the TTL for their type, when the session count exceeds `max_sessions`,
+    or when the estimated memory of all sessions exceeds `max_bytes`.
+    """
+
+    def __init__(
+        self,
+        ttls: Optional[Dict[str, float]] = None,
+        default_ttl: float = DEFAULT_TTL,
+        max_sessions: int = MAX_SESSIONS,
+        max_bytes: int = MAX_BYTES,
+        sweep_interval: float = SWEEP_INTERVAL,
+    ):
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.default_ttl = default_ttl
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._total_bytes = 0
+        self._evict_hooks: Dict[str, List[Tuple[Callable[[str, Any], None], Optional[Sequence[str]]]]] = {}
+        self._sweep_hooks: List[Callable[[], None]] = []
+        self._sweeper: Optional[asyncio.Task] = None
+        self._metrics = {
+            "hits": 0,
+            "misses": 0,
+            "puts": 0,
+            "evictions": {"ttl": 0, "lru": 0, "memory": 0},
+            "evicted_bytes": 0,
+            "evictions_by_type": {},
+            "sweeps": 0,
+        }
+
+    # --- Public API ---
+
+    def get(self, thread_id: str, expected_type: Optional[type] = None) -> Optional[Any]:
+        """Returns the state for `thread_id` and marks it as recently used."""
+        with self._lock:
+            entry = self._entries.get(thread_id)
+            if entry is None or (expected_type is not None and not isinstance(entry.state, expected_type)):
+                self._metrics["misses"] += 1
+                return None
+            if self._is_expired(entry, time.monotonic()):
+                self._evict(thread_id, "ttl")
+                self._metrics["misses"] += 1
+                return None
+            entry.last_access = time.monotonic()
+            self._entries.move_to_end(thread_id)
+            self._metrics["hits"] += 1
+            return entry.state
+
+    def put(self, thread_id: str, state: Any) -> None:
+        """Stores (or refreshes) a session and re-estimates its memory footprint."""
+        size = estimate_state_bytes(state)
+        ttl = self.ttl_for(type(state))
+        with self._lock:
+            previous = self._entries.pop(thread_id, None)
+            if previous is not None:
+                self._total_bytes -= previous.size
+            self._entries[thread_id] = _Entry(state, size, ttl)
+            self._total_bytes += size
+            self._metrics["puts"] += 1
+            self._enforce_limits(protect=thread_id)
+
+    def pop(self, thread_id: str) -> Optional[Any]:
+        """Removes a session without counting it as an eviction."""
+        with self._lock:
+            entry = self._entries.pop(thread_id, None)
+            if entry is None:
+                return None
+            self._total_bytes -= entry.size
+            return entry.state
+
+    def __contains__(self, thread_id: str) -> bool:
+        with self._lock:
+            return thread_id in self._entries
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def on_evict(self, state_type: type, callback: Callable[[str, Any], None],
+                 reasons: Optional[Sequence[str]] = None) -> None:
+        """Registers a callback run with (thread_id, state) when a session of `state_type` is evicted.
+
+        `reasons` limits the callback to some eviction reasons ("ttl", "lru", "memory").
+        Callbacks run in a worker thread when the eviction happens on the event loop.
+        """
+        self._evict_hooks.setdefault(state_type.__name__, []).append((callback, reasons))
+
+    def on_sweep(self, callback: Callable[[], None]) -> None:
+        """Registers a callback run (in the sweeper's worker thread) after every sweep."""
+        self._sweep_hooks.append(callback)
+
+    def ttl_for(self, state_type: type) -> float:
+        return self.ttls.get(state_type.__name__, self.default_ttl)
+
+    def sweep(self) -> int:
+        """Evicts expired sessions and enforces limits. Returns the number of evictions."""
+        now = time.monotonic()
+        with self._lock:
+            expired = [tid for tid, entry in self._entries.items() if self._is_expired(entry, now)]
+            for thread_id in expired:
+                self._evict(thread_id, "ttl")
+            before = len(self._entries)
+            self._enforce_limits()
+            self._metrics["sweeps"] += 1
+            evicted = len(expired) + before - len(self._entries)
+        for callback in self._sweep_hooks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Error in sweep hook: {e}")
+        return evicted
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns a snapshot of the store's size and eviction metrics."""
+        with self._lock:
+            by_type: Dict[str, Dict[str, int]] = {}
+            for entry in self._entries.values():
+                bucket = by_type.setdefault(type(entry.state).__name__, {"sessions": 0, "bytes": 0})
+                bucket["sessions"] += 1
+                bucket["bytes"] += entry.size
+            lookups = self._metrics["hits"] + self._metrics["misses"]
+            return {
+                "sessions": len(self._entries),
+                "estimated_bytes": self._total_bytes,
+                "max_sessions": self.max_sessions,
+                "max_bytes": self.max_bytes,
+                "by_type": by_type,
+                "hit_rate": self._metrics["hits"] / lookups if lookups else 0.0,
+                **{k: (dict(v) if isinstance(v, dict) else v) for k, v in self._metrics.items()},
+            }
+
+    # --- Background sweeper ---
+
+    def start_sweeper(self) -> None:
+        """Starts the periodic sweeper on the running event loop."""
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.create_task(self._sweep_loop())
+
+    async def stop_sweeper(self) -> None:
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
+
+    async def _sweep_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                # Eviction hooks may touch the disk, so keep the sweep off the event loop.
+                evicted = await asyncio.to_thread(self.sweep)
+                if evicted:
+                    print(f"---SESSION SWEEP: evicted {evicted} session(s)---")
+            except Exception as e:
+                print(f"Error during session sweep: {e}")
+
+    # --- Internals ---
+
+    def _is_expired(self, entry: _Entry, now: float) -> bool:
+        return entry.ttl > 0 and now - entry.last_access > entry.ttl
+
+    def _enforce_limits(self, protect: Optional[str] = None) -> None:
+        """Evicts least recently used sessions until the count and memory limits hold."""
+        while len(self._entries) > self.max_sessions:
+            if not self._evict_oldest("lru", protect):
+                break
+        while self._total_bytes > self.max_bytes:
+            if not self._evict_oldest("memory", protect):
+                break
+
+    def _evict_oldest(self, reason: str, protect: Optional[str]) -> bool:
+        for thread_id in self._entries:
+            if thread_id != protect:
+                self._evict(thread_id, reason)
+                return True
+        return False
+
+    def _evict(self, thread_id: str, reason: str) -> None:
+        entry = self._entries.pop(thread_id)
+        self._total_bytes -= entry.size
+        type_name = type(entry.state).__name__
+        self._metrics["evictions"][reason] += 1
+        self._metrics["evicted_bytes"] += entry.size
+        by_type = self._metrics["evictions_by_type"]
+        by_type[type_name] = by_type.get(type_name, 0) + 1
+        callbacks = [callback for callback, reasons in self._evict_hooks.get(type_name, [])
+                     if reasons is None or reason in reasons]
+        if not callbacks:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is None:
+            self._run_evict_hooks(callbacks, thread_id, entry.state)
+        else:
+            # Evictions triggered by a request handler; hooks may touch the disk
+            loop.run_in_executor(None, self._run_evict_hooks, callbacks, thread_id, entry.state)
+
+    @staticmethod
+    def _run_evict_hooks(callbacks: List[Callable[[str, Any], None]], thread_id: str, state: Any) -> None:
+        for callback in callbacks:
+            try:
+                callback(thread_id, state)
+            except Exception as e:
+                print(f"Error in eviction hook for {thread_id}: {e}")
+
+
+# Process-wide store shared by all endpoints
+session_store = SessionStore()
@@ -0,0 +1,157 @@
+import asyncio
+import os
+from typing import Awaitable, Callable, List, Optional
+
+import numpy as np
+
+from app.services.audio import SAMPLE_RATE
+from app.services.vad import split_for_inference, speech_segments
+
+# --- Configuration ---
+PARTIAL_INTERVAL = float(os.getenv("STREAM_STT_PARTIAL_INTERVAL", "1.0"))  # seconds of new audio per partial
+WINDOW_SECONDS = float(os.getenv("STREAM_STT_WINDOW_SECONDS", "10"))
+END_SILENCE_MS = int(os.getenv("STREAM_STT_END_SILENCE_MS", "900"))
+MAX_UTTERANCE_SECONDS = float(os.getenv("STREAM_STT_MAX_UTTERANCE_SECONDS", "60"))
+_READ_SIZE = 4096
+
+Transcribe = Callable[[np.ndarray], Awaitable[str]]
+
+
+class PcmDecoder:
+    """Decoder for raw 16 kHz mono little-endian int16 frames."""
+
+    def __init__(self):
+        self._leftover = b""
+        self._samples: List[np.ndarray] = []
+
+    async def feed(self, data: bytes) -> None:
+        data = self._leftover + data
+        usable = len(data) - len(data) % 2
+        self._leftover = data[usable:]
+        if usable:
+            self._samples.append(np.frombuffer(data[:usable], np.int16).astype(np.float32) / 32768.0)
+
+    def drain(self) -> np.ndarray:
+        samples, self._samples = self._samples, []
+        return np.concatenate(samples) if samples else np.empty(0, np.float32)
+
+    async def close(self) -> None:
+        pass
+
+
+class FfmpegStreamDecoder:
+    """Incremental decoder for container formats (e.g. MediaRecorder WebM/Opus).
+
+    Frames are written to a long-lived ffmpeg process as they arrive and PCM is
+    read back continuously, so decoding keeps pace with recording.
+    """
+
+    def __init__(self):
+        self._process: Optional[asyncio.subprocess.Process] = None
+        self._reader: Optional[asyncio.Task] = None
+        self._pcm = bytearray()
+
+    async def _start(self) -> None:
+        self._process = await asyncio.create_subprocess_exec(
+            # Small probe so ffmpeg starts emitting PCM after the first few frames
+            "ffmpeg", "-loglevel", "error", "-probesize", "8192", "-analyzeduration", "0", "-i", "pipe:0",
+            "-f", "s16le", "-acodec", "pcm_s16le", "-ac", "1", "-ar", str(SAMPLE_RATE), "pipe:1",
+            stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL,
+        )
+        self._reader = asyncio.create_task(self._read())
+
+    async def _read(self) -> None:
+        while True:
+            chunk = await self._process.stdout.read(_READ_SIZE)
+            if not chunk:
+                break
+            self._pcm.extend(chunk)
+
+    async def feed(self, data: bytes) -> None:
+        if self._process is None:
+            await self._start()
+        self._process.stdin.write(data)
+        await self._process.stdin.drain()
+
+    def drain(self) -> np.ndarray:
+        usable = len(self._pcm) - len(self._pcm) % 2
+        pcm = bytes(self._pcm[:usable])
+        del self._pcm[:usable]
+        return np.frombuffer(pcm, np.int16).astype(np.float32) / 32768.0
+
+    async def close(self) -> None:
+        """Flushes ffmpeg so the tail of the stream is decoded, then stops it."""
+        if self._process is None:
+            return
+        if not self._process.stdin.is_closing():
+            self._process.stdin.close()
+        try:
+            await asyncio.wait_for(self._reader, timeout=5)
+        except asyncio.TimeoutError:
+            self._process.kill()
+        await self._process.wait()
+
+
+class StreamingTranscriber:
+    """Buffers decoded audio and produces partial and final transcripts.
+
+    Partials transcribe the last WINDOW_SECONDS of the current utterance every
+    PARTIAL_INTERVAL seconds of new audio; a partial is skipped rather than
+    queued if the previous one is still running. The utterance ends when the
+    client says so, or when VAD sees END_SILENCE_MS of silence after speech.
+    """
+
+    def __init__(self, transcribe: Transcribe):
+        self.transcribe = transcribe
+        self._audio = np.empty(0, np.float32)
+        self._since_partial = 0
+        self._partial_task: Optional[asyncio.Task] = None
+
+    @property
+    def seconds(self) -> float:
+        return len(self._audio) / SAMPLE_RATE
+
+    def append(self, samples: np.ndarray) -> None:
+        if samples.size:
+            self._audio = np.concatenate((self._audio, samples))
+            self._since_partial += samples.size
+
+    def partial_due(self) -> bool:
+        busy = self._partial_task is not None and not self._partial_task.done()
+        return not busy and self._since_partial >= PARTIAL_INTERVAL * SAMPLE_RATE
+
+    def start_partial(self) -> asyncio.Task:
+        """Schedules a partial transcription of the sliding window."""
+        self._since_partial = 0
+        window = self._audio[-int(WINDOW_SECONDS * SAMPLE_RATE):]
+        self._partial_task = asyncio.create_task(self._transcribe_window(window))
+        return self._partial_task
+
+    async def _transcribe_window(self, window: np.ndarray) -> str:
+        segments = await asyncio.to_thread(split_for_inference, window)
+        if not segments:
+            return ""
+        # The window already fits Whisper's 30s input; join any pieces VAD split it into
+        return " ".join(await asyncio.gather(*(self.transcribe(segment) for segment in segments)))
+
+    def utterance_ended(self) -> bool:
+        """True once speech has been followed by enough trailing silence (or the utterance is too long)."""
+        if self.seconds >= MAX_UTTERANCE_SECONDS:
+            return True
+        segments = speech_segments(self._audio)
+        if not segments:
+            return False
+        trailing_silence = (len(self._audio) - segments[-1][1]) / SAMPLE_RATE
+        return trailing_silence * 1000 >= END_SILENCE_MS
+
+    async def finalize(self) -> str:
+        """Transcribes the whole utterance and resets for the next one."""
+        if self._partial_task is not None and not self._partial_task.done():
+            self._partial_task.cancel()
+        audio, self._audio = self._audio, np.empty(0, np.float32)
+        self._since_partial = 0
+        segments = await asyncio.to_thread(split_for_inference, audio)
+        if not segments:
+            return ""
+        texts = await asyncio.gather(*(self.transcribe(segment) for segment in segments))
+        return " ".join(text for text in texts if text)
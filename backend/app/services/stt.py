@@ -0,0 +1,261 @@
+import asyncio
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Set
+
+import numpy as np
+
+# --- Configuration ---
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "base")
+STT_WORKERS = int(os.getenv("STT_WORKERS", "2"))
+STT_THREADS = int(os.getenv("STT_THREADS", "0"))  # torch intra-op threads; 0 keeps torch's default
+STT_MAX_BATCH = int(os.getenv("STT_MAX_BATCH", "8"))
+STT_BATCH_WINDOW_MS = float(os.getenv("STT_BATCH_WINDOW_MS", "25"))
+STT_QUEUE_SIZE = int(os.getenv("STT_QUEUE_SIZE", "64"))
+
+SAMPLE_RATE = 16000
+# Clips up to Whisper's 30s window can be decoded together in one batch
+BATCHABLE_SAMPLES = 30 * SAMPLE_RATE
+# Batched decode has no temperature fallback; redo poor results with transcribe()
+FALLBACK_LOGPROB = -1.0
+FALLBACK_COMPRESSION = 2.4
+
+
+class STTQueueFullError(RuntimeError):
+    """Raised when the transcription queue is at capacity."""
+
+
+class _Job:
+    __slots__ = ("audio", "future", "enqueued_at")
+
+    def __init__(self, audio: np.ndarray, future: asyncio.Future):
+        self.audio = audio
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+
+
+class STTService:
+    """Whisper transcription off the event loop, with a bounded queue and micro-batching.
+
+    Utterances that arrive within STT_BATCH_WINDOW_MS of each other are decoded
+    as one batch. Batches run on a pool of STT_WORKERS threads, each with its own
+    model instance, since Whisper's decoder installs per-call hooks on the model.
+    """
+
+    def __init__(
+        self,
+        model_factory: Callable[[], Any],
+        workers: int = STT_WORKERS,
+        max_batch: int = STT_MAX_BATCH,
+        batch_window_ms: float = STT_BATCH_WINDOW_MS,
+        queue_size: int = STT_QUEUE_SIZE,
+        torch_threads: int = STT_THREADS,
+    ):
+        self.model_factory = model_factory
+        self.workers = max(1, workers)
+        self.max_batch = max(1, max_batch)
+        self.batch_window = batch_window_ms / 1000
+        self.queue_size = queue_size
+        self.torch_threads = torch_threads
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._batch_tasks: Set[asyncio.Task] = set()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._models: "queue.Queue[Any]" = queue.Queue()
+        self._models_created = 0
+        self._models_lock = threading.Lock()
+
+        self._in_flight = 0
+        self._completed = 0
+        self._failed = 0
+        self._batches = 0
+        self._batched_items = 0
+        self._fallbacks = 0
+        self._queue_waits: deque = deque(maxlen=500)
+        self._latencies: deque = deque(maxlen=500)
+
+    def seed_model(self, model: Any) -> None:
+        """Hands an already loaded model to the pool so the first worker doesn't load another."""
+        with self._models_lock:
+            self._models_created += 1
+        self._models.put(model)
+
+    # --- Lifecycle ---
+
+    def _ensure_started(self) -> None:
+        if self._dispatcher is not None and not self._dispatcher.done():
+            return
+        if self.torch_threads > 0:
+            import torch
+            torch.set_num_threads(self.torch_threads)
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._slots = asyncio.Semaphore(self.workers)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="stt")
+        self._dispatcher = asyncio.create_task(self._dispatch_loop())
+
+    async def stop(self) -> None:
+        """Stops dispatching and fails every queued or running transcription."""
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            try:
+                await self._dispatcher
+            except asyncio.CancelledError:
+                pass
+            self._dispatcher = None
+        running = list(self._batch_tasks)
+        for task in running:
+            task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+        while self._queue is not None and not self._queue.empty():
+            _fail([self._queue.get_nowait()], RuntimeError("Transcription service stopped."))
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    # --- Public API ---
+
+    async def transcribe(self, audio: np.ndarray) -> str:
+        """Queues 16 kHz mono float32 audio and returns its transcript."""
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait(_Job(audio, future))
+        except asyncio.QueueFull:
+            raise STTQueueFullError("Transcription queue is full, try again shortly.")
+        return await future
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "model": WHISPER_MODEL,
+            "workers": self.workers,
+            "models_loaded": self._models_created,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "queue_capacity": self.queue_size,
+            "in_flight": self._in_flight,
+            "completed": self._completed,
+            "failed": self._failed,
+            "batches": self._batches,
+            "avg_batch_size": self._batched_items / self._batches if self._batches else 0.0,
+            "fallbacks": self._fallbacks,
+            "queue_wait_ms": _percentiles(self._queue_waits),
+            "latency_ms": _percentiles(self._latencies),
+        }
+
+    # --- Dispatch ---
+
+    async def _dispatch_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            try:
+                deadline = loop.time() + self.batch_window
+                while len(batch) < self.max_batch:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+                # Wait for a free worker before collecting the next batch, so the queue keeps filling
+                await self._slots.acquire()
+            except asyncio.CancelledError:
+                _fail(batch, RuntimeError("Transcription service stopped."))
+                raise
+            task = asyncio.create_task(self._run(batch))
+            # The loop only keeps weak references to tasks; hold them until they finish
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+
+    async def _run(self, batch: List[_Job]) -> None:
+        started = time.perf_counter()
+        for job in batch:
+            self._queue_waits.append((started - job.enqueued_at) * 1000)
+        self._in_flight += len(batch)
+        try:
+            texts = await asyncio.get_running_loop().run_in_executor(
+                self._executor, self._transcribe_batch, [job.audio for job in batch]
+            )
+            self._batches += 1
+            self._batched_items += len(batch)
+            for job, text in zip(batch, texts):
+                self._completed += 1
+                self._latencies.append((time.perf_counter() - job.enqueued_at) * 1000)
+                if not job.future.done():
+                    job.future.set_result(text)
+        except asyncio.CancelledError:
+            _fail(batch, RuntimeError("Transcription service stopped."))
+            raise
+        except Exception as e:
+            self._failed += len(batch)
+            _fail(batch, e)
+        finally:
+            self._in_flight -= len(batch)
+            self._slots.release()
+
+    # --- Worker side ---
+
+    def _checkout_model(self) -> Any:
+        try:
+            return self._models.get_nowait()
+        except queue.Empty:
+            pass
+        with self._models_lock:
+            create = self._models_created < self.workers
+            if create:
+                self._models_created += 1
+        if create:
+            print(f"---LOADING WHISPER MODEL '{WHISPER_MODEL}' FOR STT WORKER---")
+            return self.model_factory()
+        return self._models.get()
+
+    def _transcribe_batch(self, audios: List[np.ndarray]) -> List[str]:
+        import whisper
+
+        model = self._checkout_model()
+        try:
+            texts: List[Optional[str]] = [None] * len(audios)
+            short = [i for i, audio in enumerate(audios) if len(audio) <= BATCHABLE_SAMPLES]
+            if short:
+                mels = [
+                    whisper.log_mel_spectrogram(whisper.pad_or_trim(audios[i]), model.dims.n_mels)
+                    for i in short
+                ]
+                import torch
+                options = whisper.DecodingOptions(fp16=model.device.type == "cuda", without_timestamps=True)
+                results = whisper.decode(model, torch.stack(mels).to(model.device), options)
+                for i, result in zip(short, results):
+                    if result.avg_logprob >= FALLBACK_LOGPROB and result.compression_ratio <= FALLBACK_COMPRESSION:
+                        texts[i] = result.text
+                    else:
+                        self._fallbacks += 1
+            # Long clips and low-confidence batch results go through the full transcribe loop
+            for i, text in enumerate(texts):
+                if text is None:
+                    texts[i] = model.transcribe(audios[i], fp16=model.device.type == "cuda")["text"]
+            return [text.strip() for text in texts]
+        finally:
+            self._models.put(model)
+
+
+def _fail(jobs: List[_Job], error: BaseException) -> None:
+    for job in jobs:
+        if not job.future.done():
+            job.future.set_exception(error)
+
+
+def _percentiles(samples: deque) -> Dict[str, float]:
+    if not samples:
+        return {"avg": 0.0, "p50": 0.0, "p95": 0.0}
+    ordered = sorted(samples)
+    return {
+        "avg": round(sum(ordered) / len(ordered), 1),
+        "p50": round(ordered[len(ordered) // 2], 1),
+        "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 1),
+    }
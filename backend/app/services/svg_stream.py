@@ -0,0 +1,120 @@
+import re
+import xml.etree.ElementTree as ET
+from typing import Any, Dict, List, Tuple
+
+SVG_NAMESPACE = "http://www.w3.org/2000/svg"
+XLINK_NAMESPACE = "http://www.w3.org/1999/xlink"
+
+# Serialize streamed elements as <rect xmlns="..."> rather than <ns0:rect xmlns:ns0="...">
+ET.register_namespace("", SVG_NAMESPACE)
+ET.register_namespace("xlink", XLINK_NAMESPACE)
+
+BARE_AMPERSAND_RE = re.compile(r'&(?!(?:[A-Za-z][A-Za-z0-9]*|#[0-9]+|#x[0-9A-Fa-f]+);)')
+# Longest entity we wait for before deciding an '&' is bare
+_MAX_ENTITY_CHARS = 10
+_ROOT_OPEN = "<svg"
+_ROOT_CLOSE = "</svg>"
+
+Event = Tuple[str, Any]
+
+
+class MalformedSvgError(ValueError):
+    """The streamed document can no longer become well-formed XML."""
+
+
+def _local_name(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+class ProgressiveSvgParser:
+    """Incrementally parses an SVG document as LLM tokens arrive.
+
+    `feed` returns ("root", attributes) once the <svg> start tag is complete
+    and ("element", xml) for every top-level child as soon as its end tag
+    arrives. Text before <svg> (chatter, markdown fences) and after </svg> is
+    ignored; bare '&' is escaped on the way in. Any other well-formedness
+    error raises MalformedSvgError, so the caller can abort the generation.
+    """
+
+    def __init__(self):
+        self._parser = ET.XMLPullParser(events=("start", "end"))
+        self._pending = ""
+        self._parts: List[str] = []
+        self._depth = 0
+        self.started = False
+        self.finished = False
+        self.elements = 0
+
+    @property
+    def code(self) -> str:
+        """The document text fed to the parser so far."""
+        return "".join(self._parts)
+
+    def _take(self, chunk: str) -> str:
+        """Returns the part of the buffered text that is safe to feed now."""
+        self._pending += chunk
+        if not self.started:
+            start = self._pending.lower().find(_ROOT_OPEN)
+            if start < 0:
+                # Keep a tail in case "<svg" is split across chunks
+                self._pending = self._pending[-(len(_ROOT_OPEN) - 1):]
+                return ""
+            self._pending = self._pending[start:]
+            self.started = True
+
+        text = self._pending
+        end = text.lower().find(_ROOT_CLOSE)
+        if end >= 0:
+            text = text[:end + len(_ROOT_CLOSE)]
+            self._pending = ""
+        else:
+            # Hold back a possibly incomplete entity or closing root tag
+            hold = len(text)
+            amp = text.rfind("&")
+            if amp >= 0 and ";" not in text[amp:] and len(text) - amp < _MAX_ENTITY_CHARS:
+                hold = amp
+            lt = text.rfind("<")
+            if lt >= 0 and _ROOT_CLOSE.startswith(text[lt:].lower()):
+                hold = min(hold, lt)
+            text, self._pending = text[:hold], text[hold:]
+        return BARE_AMPERSAND_RE.sub("&amp;", text)
+
+    def feed(self, chunk: str) -> List[Event]:
+        if self.finished or not chunk:
+            return []
+        text = self._take(chunk)
+        if not text:
+            return []
+        self._parts.append(text)
+        try:
+            self._parser.feed(text)
+            parsed = list(self._parser.read_events())
+        except ET.ParseError as e:
+            raise MalformedSvgError(str(e)) from e
+
+        events: List[Event] = []
+        for kind, element in parsed:
+            if kind == "start":
+                self._depth += 1
+                if self._depth == 1:
+                    if _local_name(element.tag) != "svg":
+                        raise MalformedSvgError(f"Root element is <{_local_name(element.tag)}>, not <svg>")
+                    events.append(("root", dict(element.attrib)))
+            else:
+                self._depth -= 1
+                if self._depth == 1:
+                    self.elements += 1
+                    events.append(("element", ET.tostring(element, encoding="unicode")))
+                elif self._depth == 0:
+                    self.finished = True
+        return events
+
+    def close(self) -> None:
+        """Raises MalformedSvgError if the stream ended before </svg>."""
+        if not self.started:
+            raise MalformedSvgError("No <svg> element in the response")
+        if not self.finished:
+            raise MalformedSvgError("Response ended before </svg>")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"elements": self.elements, "finished": self.finished, "chars": sum(len(p) for p in self._parts)}
@@ -0,0 +1,24 @@
+from functools import lru_cache
+
+# tiktoken ships with langchain-openai; fall back to a chars/4 estimate without it.
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+DEFAULT_ENCODING = "cl100k_base"
+
+
+@lru_cache(maxsize=4)
+def _encoding(name: str):
+    return tiktoken.get_encoding(name) if tiktoken is not None else None
+
+
+def count_tokens(text: str, encoding: str = DEFAULT_ENCODING) -> int:
+    """Counts the tokens in `text` for OpenAI models."""
+    if not text:
+        return 0
+    enc = _encoding(encoding)
+    if enc is None:
+        return max(1, len(text) // 4)
+    return len(enc.encode(text, disallowed_special=()))
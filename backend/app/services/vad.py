@@ -0,0 +1,137 @@
+import os
+import threading
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from app.services.audio import SAMPLE_RATE
+
+# --- Configuration ---
+VAD_ENABLED = os.getenv("VAD_ENABLED", "true").lower() == "true"
+FRAME_MS = int(os.getenv("VAD_FRAME_MS", "30"))
+ABS_FLOOR_DB = float(os.getenv("VAD_ABS_FLOOR_DB", "-50"))  # never treat quieter frames as speech
+MARGIN_DB = float(os.getenv("VAD_MARGIN_DB", "12"))  # speech must sit this far above the noise floor
+DYNAMIC_RANGE_DB = float(os.getenv("VAD_DYNAMIC_RANGE_DB", "30"))  # ...but within this of the peak
+MIN_SPEECH_MS = int(os.getenv("VAD_MIN_SPEECH_MS", "120"))
+PAD_MS = int(os.getenv("VAD_PAD_MS", "200"))
+MAX_GAP_MS = int(os.getenv("VAD_MAX_GAP_MS", "700"))
+MAX_SEGMENT_SECONDS = float(os.getenv("VAD_MAX_SEGMENT_SECONDS", "30"))
+
+_stats_lock = threading.Lock()
+_stats = {"clips": 0, "silent_clips": 0, "input_seconds": 0.0, "speech_seconds": 0.0, "split_clips": 0}
+
+
+def frame_energy_db(audio: np.ndarray, frame: int) -> np.ndarray:
+    """RMS energy of each non-overlapping frame, in dBFS."""
+    count = len(audio) // frame
+    if count == 0:
+        return np.empty(0, dtype=np.float32)
+    frames = audio[:count * frame].reshape(count, frame)
+    rms = np.sqrt(np.mean(np.square(frames, dtype=np.float32), axis=1))
+    return 20 * np.log10(rms + 1e-10)
+
+
+def _runs(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Start (inclusive) and end (exclusive) indices of each run of True values."""
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def speech_segments(audio: np.ndarray, sample_rate: int = SAMPLE_RATE) -> List[Tuple[int, int]]:
+    """Finds speech regions as (start, end) sample offsets.
+
+    A frame is speech when its energy clears an adaptive threshold: at least
+    the noise floor (10th percentile frame energy) plus a margin, within the
+    dynamic range below the loudest frame, and never below an absolute floor.
+    A clip whose loudest frame doesn't clear the noise floor by the margin
+    (steady noise, hum) is silent. Blips shorter than MIN_SPEECH_MS are dropped,
+    regions are padded by PAD_MS, and gaps shorter than MAX_GAP_MS are bridged.
+    """
+    frame = max(1, sample_rate * FRAME_MS // 1000)
+    energy = frame_energy_db(audio, frame)
+    if energy.size == 0:
+        return []
+
+    noise_floor = np.percentile(energy, 10)
+    peak = energy.max()
+    if peak - noise_floor < MARGIN_DB:
+        return []
+    threshold = max(ABS_FLOOR_DB, noise_floor + MARGIN_DB, peak - DYNAMIC_RANGE_DB)
+    mask = energy > threshold
+
+    # Drop runs too short to be speech (clicks, pops)
+    starts, ends = _runs(mask)
+    min_frames = max(1, MIN_SPEECH_MS // FRAME_MS)
+    for start, end in zip(starts, ends):
+        if end - start < min_frames:
+            mask[start:end] = False
+    if not mask.any():
+        return []
+
+    # Pad each region and bridge short pauses with one dilation
+    reach = PAD_MS // FRAME_MS + (MAX_GAP_MS // FRAME_MS) // 2
+    if reach:
+        mask = np.convolve(mask, np.ones(2 * reach + 1), mode="same") > 0
+    starts, ends = _runs(mask)
+    # The dilation also padded by the gap half-width; trim back so padding stays at PAD_MS
+    trim = (MAX_GAP_MS // FRAME_MS) // 2
+    segments = []
+    for start, end in zip(starts, ends):
+        # Regions touching the clip edges were clipped by the convolution, so only trim inner edges
+        start = start + trim if start > 0 else 0
+        end = end - trim if end < len(mask) else len(audio) // frame + 1
+        segments.append((int(start * frame), int(min(len(audio), end * frame))))
+    return segments
+
+
+def split_for_inference(audio: np.ndarray, sample_rate: int = SAMPLE_RATE,
+                        max_seconds: float = MAX_SEGMENT_SECONDS) -> List[np.ndarray]:
+    """Returns the speech in `audio` as chunks of at most `max_seconds`, or [] for a silent clip.
+
+    Short recordings come back as a single trimmed clip. Longer ones are cut
+    at pauses, merging neighbouring segments while they fit the limit.
+    """
+    if not VAD_ENABLED:
+        return [audio] if len(audio) else []
+
+    segments = speech_segments(audio, sample_rate)
+    max_samples = int(max_seconds * sample_rate)
+    chunks: List[np.ndarray] = []
+    if segments and segments[-1][1] - segments[0][0] <= max_samples:
+        # Everything fits in one window: just trim leading and trailing silence
+        chunks = [audio[segments[0][0]:segments[-1][1]]]
+    else:
+        current_start = current_end = None
+        for start, end in segments:
+            if current_start is not None and end - current_start <= max_samples:
+                current_end = end
+                continue
+            if current_start is not None:
+                chunks.append(audio[current_start:current_end])
+            # A single segment longer than the window is cut into window-sized pieces
+            while end - start > max_samples:
+                chunks.append(audio[start:start + max_samples])
+                start += max_samples
+            current_start, current_end = start, end
+        if current_start is not None:
+            chunks.append(audio[current_start:current_end])
+
+    with _stats_lock:
+        _stats["clips"] += 1
+        _stats["input_seconds"] += len(audio) / sample_rate
+        _stats["speech_seconds"] += sum(len(chunk) for chunk in chunks) / sample_rate
+        if not chunks:
+            _stats["silent_clips"] += 1
+        elif len(chunks) > 1:
+            _stats["split_clips"] += 1
+    return chunks
+
+
+def stats() -> Dict[str, float]:
+    with _stats_lock:
+        report = dict(_stats)
+    report["enabled"] = VAD_ENABLED
+    report["trimmed_ratio"] = (
+        1 - report["speech_seconds"] / report["input_seconds"] if report["input_seconds"] else 0.0
+    )
+    return report
@@ -0,0 +1,220 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+# Each cached result is <CACHE_DIR>/<key[:2]>/<key>.json holding the recorded graph steps
+CACHE_DIR = os.getenv("VECTOR_CACHE_DIR", os.path.join("data", "vector_cache"))
+MEMORY_ENTRIES = int(os.getenv("VECTOR_CACHE_MEMORY_ENTRIES", "256"))
+CACHE_TTL_SECONDS = int(os.getenv("VECTOR_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+# Entries kept on disk; beyond this the least recently used files are deleted
+DISK_ENTRIES = int(os.getenv("VECTOR_CACHE_DISK_ENTRIES", "5000"))
+# Minimum time between scans of the cache directory for expired and surplus files
+PRUNE_INTERVAL_SECONDS = int(os.getenv("VECTOR_CACHE_PRUNE_INTERVAL_SECONDS", "600"))
+# Bump when generator prompts change so older results stop being served
+CACHE_VERSION = "3"
+
+# The AgentState fields that determine a generation
+KEY_FIELDS = ("prompt", "vector_format", "style", "complexity", "color_scheme", "target_formats")
+
+Steps = List[Tuple[str, Any]]
+
+
+def _normalize(value: Any) -> str:
+    # Case is kept: prompts often carry literal text to draw ("ACME" vs "Acme")
+    return re.sub(r"\s+", " ", str(value or "").strip())
+
+
+def cache_key(inputs: Dict[str, Any], model: str = "") -> str:
+    """Content address of a generation: hash of the normalized inputs, model and cache version."""
+    parts = [CACHE_VERSION, model] + [f"{field}={_normalize(inputs.get(field))}" for field in KEY_FIELDS]
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+
+def final_output(steps: Steps) -> Optional[Dict[str, Any]]:
+    """Returns the last recorded agent state (the graph's result)."""
+    for _, output in reversed(steps):
+        if isinstance(output, dict) and "is_valid" in output:
+            return output
+    return None
+
+
+class VectorResultCache:
+    """Two-level cache of validated vector graphics results.
+
+    A result is the sequence of (step, output) pairs the generation graph
+    emitted, so a hit can be replayed as the same SSE events. Lookups go to an
+    in-memory LRU first and then to JSON files on disk; only results whose
+    final state passed validation are stored. A file's mtime is its last use:
+    stores periodically delete files unused for longer than the TTL and the
+    least recently used ones beyond disk_entries.
+    """
+
+    def __init__(self, directory: str = CACHE_DIR, memory_entries: int = MEMORY_ENTRIES,
+                 ttl: int = CACHE_TTL_SECONDS, disk_entries: int = DISK_ENTRIES,
+                 prune_interval: int = PRUNE_INTERVAL_SECONDS):
+        self.directory = directory
+        self.memory_entries = memory_entries
+        self.ttl = ttl
+        self.disk_entries = disk_entries
+        self.prune_interval = prune_interval
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, Tuple[float, Steps]]" = OrderedDict()
+        self._next_prune = 0.0
+        self._pruning = False
+        self._stats = {"lookups": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0,
+                       "rejected_invalid": 0, "errors": 0, "pruned": 0}
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _remember(self, key: str, created_at: float, steps: Steps) -> None:
+        with self._lock:
+            self._memory[key] = (created_at, steps)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Steps]:
+        """Returns the recorded steps for `key`, or None (blocking on disk reads)."""
+        now = time.time()
+        with self._lock:
+            self._stats["lookups"] += 1
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[0] <= self.ttl:
+                self._memory.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return entry[1]
+
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                record = json.load(f)
+        except FileNotFoundError:
+            record = None
+        except (OSError, ValueError) as e:
+            print(f"Error reading vector cache entry {key}: {e}")
+            with self._lock:
+                self._stats["errors"] += 1
+            record = None
+
+        if record is None or now - record["created_at"] > self.ttl:
+            if record is not None:
+                self._remove(path)
+            with self._lock:
+                self._memory.pop(key, None)
+                self._stats["misses"] += 1
+            return None
+
+        try:
+            os.utime(path)  # mark as recently used for pruning
+        except OSError:
+            pass
+        steps = [(step, output) for step, output in record["steps"]]
+        self._remember(key, record["created_at"], steps)
+        with self._lock:
+            self._stats["disk_hits"] += 1
+        return steps
+
+    def put(self, key: str, steps: Steps) -> bool:
+        """Stores `steps` if the final state is valid; returns whether it was stored."""
+        final = final_output(steps)
+        if not final or not final.get("is_valid"):
+            with self._lock:
+                self._stats["rejected_invalid"] += 1
+            return False
+
+        created_at = time.time()
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temp file and rename so concurrent readers never see a partial entry
+            fd, staging = tempfile.mkstemp(prefix=".staging-", dir=os.path.dirname(path))
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"created_at": created_at, "steps": steps}, f)
+            os.replace(staging, path)
+        except (OSError, TypeError, ValueError) as e:
+            print(f"Error writing vector cache entry {key}: {e}")
+            with self._lock:
+                self._stats["errors"] += 1
+            return False
+
+        self._remember(key, created_at, steps)
+        with self._lock:
+            self._stats["stores"] += 1
+            due = not self._pruning and created_at >= self._next_prune
+            if due:
+                self._pruning = True
+        if due:
+            try:
+                self.prune()
+            finally:
+                with self._lock:
+                    self._pruning = False
+                    self._next_prune = time.time() + self.prune_interval
+        return True
+
+    def _remove(self, path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            print(f"Error deleting vector cache file {path}: {e}")
+            return False
+
+    def prune(self) -> int:
+        """Deletes files unused for longer than the TTL, then the least recently used
+        beyond disk_entries (blocking). Returns the number of files deleted."""
+        now = time.time()
+        entries: List[Tuple[float, str]] = []
+        try:
+            shards = os.listdir(self.directory)
+        except FileNotFoundError:
+            return 0
+        for shard in shards:
+            shard_dir = os.path.join(self.directory, shard)
+            if not os.path.isdir(shard_dir):
+                continue
+            for name in os.listdir(shard_dir):
+                path = os.path.join(shard_dir, name)
+                try:
+                    used_at = os.stat(path).st_mtime
+                except OSError:
+                    continue
+                if name.startswith(".staging-"):
+                    # Left behind by a write that died; live writes finish within seconds
+                    if now - used_at > 3600:
+                        self._remove(path)
+                elif name.endswith(".json"):
+                    entries.append((used_at, path))
+
+        entries.sort(reverse=True)
+        removed = 0
+        for rank, (used_at, path) in enumerate(entries):
+            if (now - used_at > self.ttl or rank >= self.disk_entries) and self._remove(path):
+                removed += 1
+        if removed:
+            print(f"Pruned {removed} vector cache files")
+            with self._lock:
+                self._stats["pruned"] += removed
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            report = dict(self._stats)
+            report["memory_entries"] = len(self._memory)
+        hits = report["memory_hits"] + report["disk_hits"]
+        report["hit_rate"] = hits / report["lookups"] if report["lookups"] else 0.0
+        report["ttl_seconds"] = self.ttl
+        return report
+
+
+# Shared cache used by the vector graphics endpoints
+vector_cache = VectorResultCache()
@@ -0,0 +1,728 @@
+import math
+import re
+import xml.etree.ElementTree as ET
+import zlib
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# A deterministic SVG -> EPS/PDF converter for the subset of SVG the generator
+# produces: basic shapes, paths (all commands, including arcs), groups, <use>,
+# transforms, solid fills/strokes (gradients become the average of their stops) and
+# simple text. Anything else (filters, masks, clip paths, CSS classes) is skipped.
+
+Matrix = Tuple[float, float, float, float, float, float]
+Color = Tuple[float, float, float]
+# ("M", x, y) | ("L", x, y) | ("C", x1, y1, x2, y2, x, y) | ("Z",)
+Segment = Tuple
+
+IDENTITY: Matrix = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+PX_TO_PT = 0.75  # SVG user units are CSS px (96 dpi); PDF/PS points are 72 dpi
+DEFAULT_SIZE = (300.0, 150.0)
+KAPPA = 0.5522847498  # control point distance for quarter-circle Beziers
+MAX_ELEMENTS = 20000  # elements visited after <use> expansion; bounds nested-reference fan-out
+MAX_COORDINATE = 1e9
+
+_NAMED_COLORS: Dict[str, Color] = {
+    "black": (0, 0, 0), "white": (1, 1, 1), "red": (1, 0, 0), "green": (0, 0.502, 0), "blue": (0, 0, 1),
+    "yellow": (1, 1, 0), "orange": (1, 0.647, 0), "purple": (0.502, 0, 0.502), "gray": (0.502, 0.502, 0.502),
+    "grey": (0.502, 0.502, 0.502), "silver": (0.753, 0.753, 0.753), "maroon": (0.502, 0, 0),
+    "olive": (0.502, 0.502, 0), "lime": (0, 1, 0), "aqua": (0, 1, 1), "cyan": (0, 1, 1), "teal": (0, 0.502, 0.502),
+    "navy": (0, 0, 0.502), "fuchsia": (1, 0, 1), "magenta": (1, 0, 1), "pink": (1, 0.753, 0.796),
+    "brown": (0.647, 0.165, 0.165), "gold": (1, 0.843, 0), "skyblue": (0.529, 0.808, 0.922),
+    "lightblue": (0.678, 0.847, 0.902), "darkblue": (0, 0, 0.545), "lightgray": (0.827, 0.827, 0.827),
+    "lightgrey": (0.827, 0.827, 0.827), "darkgray": (0.663, 0.663, 0.663), "darkgrey": (0.663, 0.663, 0.663),
+    "darkgreen": (0, 0.392, 0), "coral": (1, 0.498, 0.314), "tomato": (1, 0.388, 0.278),
+    "salmon": (0.980, 0.502, 0.447), "violet": (0.933, 0.510, 0.933), "indigo": (0.294, 0, 0.510),
+    "crimson": (0.863, 0.078, 0.235), "beige": (0.961, 0.961, 0.863), "tan": (0.824, 0.706, 0.549),
+    "khaki": (0.941, 0.902, 0.549), "turquoise": (0.251, 0.878, 0.816),
+}
+
+_SKIPPED = {"defs", "title", "desc", "metadata", "style", "script", "clipPath", "mask", "pattern", "marker",
+            "symbol", "linearGradient", "radialGradient", "filter"}
+_INHERITED = ("fill", "stroke", "stroke-width", "fill-rule", "stroke-linecap", "stroke-linejoin",
+              "font-size", "text-anchor", "color", "visibility")
+_NUMBER_RE = re.compile(r"[-+]?(?:\d*\.\d+|\d+\.?)(?:[eE][-+]?\d+)?")
+_LINECAPS = {"butt": 0, "round": 1, "square": 2}
+_LINEJOINS = {"miter": 0, "round": 1, "bevel": 2}
+
+
+class ConversionError(ValueError):
+    """The SVG could not be converted."""
+
+
+class Shape:
+    def __init__(self, segments: List[Segment], fill: Optional[Color], stroke: Optional[Color],
+                 stroke_width: float, even_odd: bool, linecap: int, linejoin: int):
+        self.segments = segments
+        self.fill = fill
+        self.stroke = stroke
+        self.stroke_width = stroke_width
+        self.even_odd = even_odd
+        self.linecap = linecap
+        self.linejoin = linejoin
+
+
+class Text:
+    def __init__(self, text: str, matrix: Matrix, size: float, fill: Color):
+        self.text = text
+        self.matrix = matrix
+        self.size = size
+        self.fill = fill
+
+
+class Drawing:
+    """Page size in points plus shapes and text already mapped to page coordinates (y up)."""
+
+    def __init__(self, width: float, height: float):
+        self.width = width
+        self.height = height
+        self.items: List[object] = []
+
+
+# --- Geometry ---
+
+def multiply(m: Matrix, n: Matrix) -> Matrix:
+    """Returns m * n (n is applied first)."""
+    a, b, c, d, e, f = m
+    a2, b2, c2, d2, e2, f2 = n
+    return (a * a2 + c * b2, b * a2 + d * b2, a * c2 + c * d2, b * c2 + d * d2,
+            a * e2 + c * f2 + e, b * e2 + d * f2 + f)
+
+
+def apply(m: Matrix, x: float, y: float) -> Tuple[float, float]:
+    return m[0] * x + m[2] * y + m[4], m[1] * x + m[3] * y + m[5]
+
+
+def _check_finite(values: Sequence[float], what: str) -> None:
+    # float() accepts "1e400" and products can overflow; inf/nan would be written into the output verbatim
+    if not all(math.isfinite(v) for v in values):
+        raise ConversionError(f"{what} is not finite")
+
+
+def parse_transform(value: str) -> Matrix:
+    matrix = IDENTITY
+    for name, args in re.findall(r"(matrix|translate|scale|rotate|skewX|skewY)\s*\(([^)]*)\)", value or ""):
+        nums = [float(n) for n in _NUMBER_RE.findall(args)]
+        _check_finite(nums, f"{name}() argument")
+        if name == "matrix" and len(nums) == 6:
+            step = tuple(nums)
+        elif name == "translate" and nums:
+            step = (1, 0, 0, 1, nums[0], nums[1] if len(nums) > 1 else 0)
+        elif name == "scale" and nums:
+            step = (nums[0], 0, 0, nums[1] if len(nums) > 1 else nums[0], 0, 0)
+        elif name == "rotate" and nums:
+            angle = math.radians(nums[0])
+            cos, sin = math.cos(angle), math.sin(angle)
+            step = (cos, sin, -sin, cos, 0, 0)
+            if len(nums) == 3:
+                cx, cy = nums[1], nums[2]
+                step = multiply(multiply((1, 0, 0, 1, cx, cy), step), (1, 0, 0, 1, -cx, -cy))
+        elif name == "skewX" and nums:
+            step = (1, 0, math.tan(math.radians(nums[0])), 1, 0, 0)
+        elif name == "skewY" and nums:
+            step = (1, math.tan(math.radians(nums[0])), 0, 1, 0, 0)
+        else:
+            continue
+        matrix = multiply(matrix, step)
+    _check_finite(matrix, "Transform")
+    return matrix
+
+
+def _arc_to_curves(x1: float, y1: float, rx: float, ry: float, rotation: float, large: bool, sweep: bool,
+                   x2: float, y2: float) -> List[Segment]:
+    """Converts an SVG endpoint-parameterized arc to cubic Beziers (SVG 1.1 appendix F.6)."""
+    if (x1, y1) == (x2, y2):
+        return []
+    rx, ry = abs(rx), abs(ry)
+    if not all(math.isfinite(v) and abs(v) <= MAX_COORDINATE for v in (x1, y1, rx, ry, rotation, x2, y2)):
+        raise ConversionError("Arc radius or coordinate out of range")
+    if rx == 0 or ry == 0:
+        return [("L", x2, y2)]
+    phi = math.radians(rotation)
+    cos_phi, sin_phi = math.cos(phi), math.sin(phi)
+    dx, dy = (x1 - x2) / 2, (y1 - y2) / 2
+    x1p = cos_phi * dx + sin_phi * dy
+    y1p = -sin_phi * dx + cos_phi * dy
+    scale = (x1p ** 2) / (rx ** 2) + (y1p ** 2) / (ry ** 2)
+    if scale > 1:
+        rx, ry = rx * math.sqrt(scale), ry * math.sqrt(scale)
+    numerator = rx ** 2 * ry ** 2 - rx ** 2 * y1p ** 2 - ry ** 2 * x1p ** 2
+    denominator = rx ** 2 * y1p ** 2 + ry ** 2 * x1p ** 2
+    factor = math.sqrt(max(0.0, numerator / denominator)) if denominator else 0.0
+    if large == sweep:
+        factor = -factor
+    cxp, cyp = factor * rx * y1p / ry, -factor * ry * x1p / rx
+    cx = cos_phi * cxp - sin_phi * cyp + (x1 + x2) / 2
+    cy = sin_phi * cxp + cos_phi * cyp + (y1 + y2) / 2
+
+    def angle(ux, uy, vx, vy):
+        return math.atan2(ux * vy - uy * vx, ux * vx + uy * vy)
+
+    theta = angle(1, 0, (x1p - cxp) / rx, (y1p - cyp) / ry)
+    delta = angle((x1p - cxp) / rx, (y1p - cyp) / ry, (-x1p - cxp) / rx, (-y1p - cyp) / ry)
+    if not sweep and delta > 0:
+        delta -= 2 * math.pi
+    elif sweep and delta < 0:
+        delta += 2 * math.pi
+
+    pieces = max(1, math.ceil(abs(delta) / (math.pi / 2)))
+    step = delta / pieces
+    t = 4 / 3 * math.tan(step / 4)
+    curves: List[Segment] = []
+    for i in range(pieces):
+        a1, a2 = theta + i * step, theta + (i + 1) * step
+        cos1, sin1, cos2, sin2 = math.cos(a1), math.sin(a1), math.cos(a2), math.sin(a2)
+        points = [
+            (cos1 - t * sin1, sin1 + t * cos1),
+            (cos2 + t * sin2, sin2 - t * cos2),
+            (cos2, sin2),
+        ]
+        mapped = []
+        for px, py in points:
+            px, py = px * rx, py * ry
+            mapped += [cos_phi * px - sin_phi * py + cx, sin_phi * px + cos_phi * py + cy]
+        curves.append(("C", *mapped))
+    # Land exactly on the endpoint
+    last = curves[-1]
+    curves[-1] = last[:5] + (x2, y2)
+    return curves
+
+
+class _PathScanner:
+    def __init__(self, data: str):
+        self.data = data
+        self.pos = 0
+
+    def _skip(self) -> None:
+        while self.pos < len(self.data) and self.data[self.pos] in " \t\r\n,":
+            self.pos += 1
+
+    def command(self) -> Optional[str]:
+        self._skip()
+        if self.pos < len(self.data) and self.data[self.pos].isalpha():
+            self.pos += 1
+            return self.data[self.pos - 1]
+        return None
+
+    def has_number(self) -> bool:
+        self._skip()
+        return self.pos < len(self.data) and (self.data[self.pos] in "+-." or self.data[self.pos].isdigit())
+
+    def number(self) -> float:
+        self._skip()
+        match = _NUMBER_RE.match(self.data, self.pos)
+        if not match:
+            raise ConversionError(f"Expected a number in path data at {self.pos}")
+        value = float(match.group(0))
+        _check_finite((value,), f"Path number at {self.pos}")
+        self.pos = match.end()
+        return value
+
+    def flag(self) -> bool:
+        self._skip()
+        if self.pos < len(self.data) and self.data[self.pos] in "01":
+            self.pos += 1
+            return self.data[self.pos - 1] == "1"
+        raise ConversionError(f"Expected an arc flag in path data at {self.pos}")
+
+
+def parse_path(data: str) -> List[Segment]:
+    """Parses SVG path data into absolute M/L/C/Z segments."""
+    scanner = _PathScanner(data or "")
+    segments: List[Segment] = []
+    x = y = start_x = start_y = 0.0
+    last_control: Optional[Tuple[float, float]] = None
+    last_quad: Optional[Tuple[float, float]] = None
+    command = None
+    while True:
+        next_command = scanner.command()
+        if next_command is None:
+            if command is None or not scanner.has_number():
+                break
+            # Implicit repetition; a repeated moveto means lineto
+            next_command = {"M": "L", "m": "l"}.get(command, command)
+        command = next_command
+        relative = command.islower()
+        op = command.upper()
+        ox, oy = (x, y) if relative else (0.0, 0.0)
+        control = quad = None
+
+        if op == "Z":
+            segments.append(("Z",))
+            x, y = start_x, start_y
+        elif op == "M":
+            x, y = scanner.number() + ox, scanner.number() + oy
+            start_x, start_y = x, y
+            segments.append(("M", x, y))
+        elif op == "L":
+            x, y = scanner.number() + ox, scanner.number() + oy
+            segments.append(("L", x, y))
+        elif op == "H":
+            x = scanner.number() + ox
+            segments.append(("L", x, y))
+        elif op == "V":
+            y = scanner.number() + oy
+            segments.append(("L", x, y))
+        elif op in ("C", "S"):
+            if op == "C":
+                x1, y1 = scanner.number() + ox, scanner.number() + oy
+            else:
+                x1, y1 = (2 * x - last_control[0], 2 * y - last_control[1]) if last_control else (x, y)
+            x2, y2 = scanner.number() + ox, scanner.number() + oy
+            x, y = scanner.number() + ox, scanner.number() + oy
+            segments.append(("C", x1, y1, x2, y2, x, y))
+            control = (x2, y2)
+        elif op in ("Q", "T"):
+            if op == "Q":
+                qx, qy = scanner.number() + ox, scanner.number() + oy
+            else:
+                qx, qy = (2 * x - last_quad[0], 2 * y - last_quad[1]) if last_quad else (x, y)
+            end_x, end_y = scanner.number() + ox, scanner.number() + oy
+            segments.append(("C", x + 2 / 3 * (qx - x), y + 2 / 3 * (qy - y),
+                             end_x + 2 / 3 * (qx - end_x), end_y + 2 / 3 * (qy - end_y), end_x, end_y))
+            x, y = end_x, end_y
+            quad = (qx, qy)
+        elif op == "A":
+            rx, ry, rotation = scanner.number(), scanner.number(), scanner.number()
+            large, sweep = scanner.flag(), scanner.flag()
+            end_x, end_y = scanner.number() + ox, scanner.number() + oy
+            segments.extend(_arc_to_curves(x, y, rx, ry, rotation, large, sweep, end_x, end_y))
+            x, y = end_x, end_y
+        else:
+            raise ConversionError(f"Unsupported path command '{command}'")
+        last_control, last_quad = control, quad
+    return segments
+
+
+def _ellipse(cx: float, cy: float, rx: float, ry: float) -> List[Segment]:
+    kx, ky = rx * KAPPA, ry * KAPPA
+    return [
+        ("M", cx + rx, cy),
+        ("C", cx + rx, cy + ky, cx + kx, cy + ry, cx, cy + ry),
+        ("C", cx - kx, cy + ry, cx - rx, cy + ky, cx - rx, cy),
+        ("C", cx - rx, cy - ky, cx - kx, cy - ry, cx, cy - ry),
+        ("C", cx + kx, cy - ry, cx + rx, cy - ky, cx + rx, cy),
+        ("Z",),
+    ]
+
+
+def _rect(x: float, y: float, w: float, h: float, rx: float, ry: float) -> List[Segment]:
+    if rx <= 0 and ry <= 0:
+        return [("M", x, y), ("L", x + w, y), ("L", x + w, y + h), ("L", x, y + h), ("Z",)]
+    rx, ry = min(rx or ry, w / 2), min(ry or rx, h / 2)
+    kx, ky = rx * KAPPA, ry * KAPPA
+    return [
+        ("M", x + rx, y), ("L", x + w - rx, y),
+        ("C", x + w - rx + kx, y, x + w, y + ry - ky, x + w, y + ry), ("L", x + w, y + h - ry),
+        ("C", x + w, y + h - ry + ky, x + w - rx + kx, y + h, x + w - rx, y + h), ("L", x + rx, y + h),
+        ("C", x + rx - kx, y + h, x, y + h - ry + ky, x, y + h - ry), ("L", x, y + ry),
+        ("C", x, y + ry - ky, x + rx - kx, y, x + rx, y), ("Z",),
+    ]
+
+
+def _points(value: str) -> List[Tuple[float, float]]:
+    nums = [float(n) for n in _NUMBER_RE.findall(value or "")]
+    _check_finite(nums, "Point list")
+    return list(zip(nums[0::2], nums[1::2]))
+
+
+def shape_segments(tag: str, attrs: Dict[str, str]) -> List[Segment]:
+    def num(name: str, default: float = 0.0) -> float:
+        return _length(attrs.get(name), default)
+
+    if tag == "path":
+        return parse_path(attrs.get("d", ""))
+    if tag == "rect":
+        w, h = num("width"), num("height")
+        if w <= 0 or h <= 0:
+            return []
+        return _rect(num("x"), num("y"), w, h, num("rx"), num("ry"))
+    if tag == "circle":
+        r = num("r")
+        return _ellipse(num("cx"), num("cy"), r, r) if r > 0 else []
+    if tag == "ellipse":
+        rx, ry = num("rx"), num("ry")
+        return _ellipse(num("cx"), num("cy"), rx, ry) if rx > 0 and ry > 0 else []
+    if tag == "line":
+        return [("M", num("x1"), num("y1")), ("L", num("x2"), num("y2"))]
+    if tag in ("polyline", "polygon"):
+        points = _points(attrs.get("points", ""))
+        if not points:
+            return []
+        segments: List[Segment] = [("M", *points[0])] + [("L", *p) for p in points[1:]]
+        return segments + [("Z",)] if tag == "polygon" else segments
+    return []
+
+
+# --- Styles ---
+
+def _length(value: Optional[str], default: float = 0.0) -> float:
+    if value is None:
+        return default
+    match = _NUMBER_RE.match(value.strip())
+    if not match:
+        return default
+    number = float(match.group(0))
+    unit = value.strip()[match.end():].strip()
+    number *= {"pt": 4 / 3, "pc": 16, "mm": 96 / 25.4, "cm": 96 / 2.54, "in": 96}.get(unit, 1.0)
+    _check_finite((number,), f"Length '{value}'")
+    return number
+
+
+def parse_color(value: Optional[str], gradients: Dict[str, Color], current: Optional[Color] = None) -> Optional[Color]:
+    """Returns an RGB triple in 0..1, or None for 'none'/unknown paint."""
+    if value is None:
+        return None
+    value = value.strip().lower()
+    if value in ("none", "transparent", ""):
+        return None
+    if value == "currentcolor":
+        return current or (0.0, 0.0, 0.0)
+    url = re.match(r"url\(\s*['\"]?#([^)'\"]+)['\"]?\s*\)", value)
+    if url:
+        return gradients.get(url.group(1))
+    if value.startswith("#"):
+        digits = value[1:]
+        if len(digits) in (3, 4):
+            digits = "".join(ch * 2 for ch in digits[:3])
+        if len(digits) >= 6:
+            try:
+                return tuple(int(digits[i:i + 2], 16) / 255 for i in (0, 2, 4))
+            except ValueError:
+                return None
+        return None
+    rgb = re.match(r"rgba?\(([^)]*)\)", value)
+    if rgb:
+        parts = [p.strip() for p in rgb.group(1).replace("/", ",").split(",")][:3]
+        if len(parts) < 3:
+            return None
+        channels = []
+        for part in parts:
+            number = _NUMBER_RE.match(part)
+            if not number:
+                return None
+            channels.append(float(number.group(0)) / (100 if part.endswith("%") else 255))
+        return tuple(max(0.0, min(1.0, c)) for c in channels)
+    return _NAMED_COLORS.get(value)
+
+
+def _style(element: ET.Element) -> Dict[str, str]:
+    style = {key: value for key, value in element.attrib.items() if not key.startswith("{")}
+    for declaration in element.attrib.get("style", "").split(";"):
+        if ":" in declaration:
+            key, value = declaration.split(":", 1)
+            style[key.strip()] = value.strip()
+    return style
+
+
+def _local(tag) -> str:
+    return tag.rsplit("}", 1)[-1] if isinstance(tag, str) else ""
+
+
+def _collect(root: ET.Element) -> Tuple[Dict[str, ET.Element], Dict[str, Color]]:
+    """Indexes elements by id and resolves each gradient to a representative solid colour."""
+    by_id = {el.attrib["id"]: el for el in root.iter() if "id" in el.attrib}
+    gradients: Dict[str, Color] = {}
+    for element in root.iter():
+        if _local(element.tag) not in ("linearGradient", "radialGradient"):
+            continue
+        stops = [el for el in element if _local(el.tag) == "stop"]
+        source = element
+        # Gradients may inherit their stops through href
+        while not stops:
+            href = source.attrib.get("href") or source.attrib.get("{http://www.w3.org/1999/xlink}href", "")
+            source = by_id.get(href.lstrip("#"))
+            if source is None:
+                break
+            stops = [el for el in source if _local(el.tag) == "stop"]
+        colors = [parse_color(_style(stop).get("stop-color", "black"), {}) for stop in stops]
+        colors = [c for c in colors if c is not None]
+        if colors and "id" in element.attrib:
+            # Average the stops so the flat fill keeps the gradient's overall tone
+            gradients[element.attrib["id"]] = tuple(sum(c[i] for c in colors) / len(colors) for i in range(3))
+    return by_id, gradients
+
+
+# --- SVG -> Drawing ---
+
+def _page_matrix(root: ET.Element) -> Tuple[float, float, Matrix]:
+    viewbox = [float(n) for n in _NUMBER_RE.findall(root.attrib.get("viewBox", ""))]
+    width_attr, height_attr = root.attrib.get("width"), root.attrib.get("height")
+    relative = lambda v: v is None or v.strip().endswith("%")
+    if len(viewbox) == 4:
+        vx, vy, vw, vh = viewbox
+        width = vw if relative(width_attr) else _length(width_attr, vw)
+        height = vh if relative(height_attr) else _length(height_attr, vh)
+    else:
+        width = DEFAULT_SIZE[0] if relative(width_attr) else _length(width_attr, DEFAULT_SIZE[0])
+        height = DEFAULT_SIZE[1] if relative(height_attr) else _length(height_attr, DEFAULT_SIZE[1])
+        vx, vy, vw, vh = 0.0, 0.0, width, height
+
+    if not all(math.isfinite(v) and 0 < v <= MAX_COORDINATE for v in (width, height, vw, vh)):
+        raise ConversionError("SVG viewport and viewBox sizes must be positive and finite")
+    if not all(math.isfinite(v) for v in (vx, vy)):
+        raise ConversionError("SVG viewBox origin must be finite")
+
+    # preserveAspectRatio="xMidYMid meet" (the default), or "none" to stretch
+    sx, sy = width / vw, height / vh
+    tx = ty = 0.0
+    if root.attrib.get("preserveAspectRatio", "").strip() != "none":
+        sx = sy = min(sx, sy)
+        tx, ty = (width - vw * sx) / 2, (height - vh * sy) / 2
+    page_w, page_h = width * PX_TO_PT, height * PX_TO_PT
+    # viewBox -> viewport (px) -> points, flipping y so the origin is bottom-left
+    view = (sx, 0.0, 0.0, sy, tx - vx * sx, ty - vy * sy)
+    flip = (PX_TO_PT, 0.0, 0.0, -PX_TO_PT, 0.0, page_h)
+    return page_w, page_h, multiply(flip, view)
+
+
+def svg_to_drawing(svg_code: str) -> Drawing:
+    try:
+        root = ET.fromstring(svg_code)
+    except ET.ParseError as e:
+        raise ConversionError(f"Invalid SVG: {e}") from e
+    if _local(root.tag) != "svg":
+        raise ConversionError("Root element is not <svg>")
+
+    width, height, base = _page_matrix(root)
+    drawing = Drawing(width, height)
+    by_id, gradients = _collect(root)
+    defaults = {"fill": "black", "stroke": "none", "stroke-width": "1", "fill-rule": "nonzero",
+                "stroke-linecap": "butt", "stroke-linejoin": "miter", "font-size": "16",
+                "text-anchor": "start", "visibility": "visible"}
+
+    expanding = set()  # ids of the groups and <use> targets currently being walked
+    visited = [0]
+
+    def walk(element: ET.Element, matrix: Matrix, inherited: Dict[str, str], depth: int) -> None:
+        tag = _local(element.tag)
+        if depth > 32 or tag in _SKIPPED:
+            return
+        visited[0] += 1
+        if visited[0] > MAX_ELEMENTS:
+            raise ConversionError(f"SVG expands to more than {MAX_ELEMENTS} elements")
+        style = _style(element)
+        if style.get("display") == "none":
+            return
+        state = dict(inherited)
+        state.update({key: style[key] for key in _INHERITED if key in style})
+        if "transform" in style:
+            matrix = multiply(matrix, parse_transform(style["transform"]))
+
+        if tag in ("svg", "g", "a", "switch") and element is not root:
+            if tag == "svg":
+                matrix = multiply(matrix, (1, 0, 0, 1, _length(style.get("x")), _length(style.get("y"))))
+            group_id = element.attrib.get("id")
+            entered = group_id is not None and group_id not in expanding
+            if entered:
+                expanding.add(group_id)
+            try:
+                for child in element:
+                    walk(child, matrix, state, depth + 1)
+            finally:
+                if entered:
+                    expanding.discard(group_id)
+            return
+        if tag == "use":
+            href = style.get("href") or element.attrib.get("{http://www.w3.org/1999/xlink}href", "")
+            target_id = href.lstrip("#")
+            target = by_id.get(target_id)
+            # a <use> inside its own target would expand forever; like browsers, skip it
+            if target is not None and target_id not in expanding:
+                offset = multiply(matrix, (1, 0, 0, 1, _length(style.get("x")), _length(style.get("y"))))
+                children = list(target) if _local(target.tag) == "symbol" else [target]
+                expanding.add(target_id)
+                try:
+                    for child in children:
+                        walk(child, offset, state, depth + 1)
+                finally:
+                    expanding.discard(target_id)
+            return
+        if state.get("visibility") in ("hidden", "collapse"):
+            return
+
+        current = parse_color(state.get("color"), gradients)
+        full = multiply(base, matrix)
+        _check_finite(full, "Transform")
+        if tag == "text":
+            _add_text(drawing, element, style, state, full, parse_color(state.get("fill"), gradients, current))
+            return
+
+        segments = shape_segments(tag, style)
+        if not segments:
+            return
+        fill = None if tag == "line" else parse_color(state.get("fill"), gradients, current)
+        if _opacity(style, "fill-opacity") == 0:
+            fill = None
+        stroke = parse_color(state.get("stroke"), gradients, current)
+        if _opacity(style, "stroke-opacity") == 0:
+            stroke = None
+        if fill is None and stroke is None:
+            return
+        scale = math.sqrt(abs(full[0] * full[3] - full[1] * full[2]))
+        mapped = [_map_segment(segment, full) for segment in segments]
+        stroke_width = _length(state.get("stroke-width"), 1.0) * scale
+        _check_finite((stroke_width,), "Stroke width")
+        drawing.items.append(Shape(
+            mapped, fill, stroke, stroke_width,
+            state.get("fill-rule") == "evenodd",
+            _LINECAPS.get(state.get("stroke-linecap", "butt"), 0),
+            _LINEJOINS.get(state.get("stroke-linejoin", "miter"), 0),
+        ))
+
+    root_style = _style(root)
+    root_state = dict(defaults)
+    root_state.update({key: root_style[key] for key in _INHERITED if key in root_style})
+    for child in root:
+        walk(child, IDENTITY, root_state, 1)
+    return drawing
+
+
+def _opacity(style: Dict[str, str], key: str) -> float:
+    try:
+        return float(style.get(key, style.get("opacity", "1")))
+    except ValueError:
+        return 1.0
+
+
+def _map_segment(segment: Segment, matrix: Matrix) -> Segment:
+    if segment[0] == "Z":
+        return segment
+    coords: List[float] = []
+    values = segment[1:]
+    for i in range(0, len(values), 2):
+        coords.extend(apply(matrix, values[i], values[i + 1]))
+    _check_finite(coords, "Coordinate")
+    return (segment[0], *coords)
+
+
+def _add_text(drawing: Drawing, element: ET.Element, style: Dict[str, str], state: Dict[str, str],
+              matrix: Matrix, fill: Optional[Color]) -> None:
+    text = " ".join("".join(element.itertext()).split())
+    if not text or fill is None:
+        return
+    size = _length(state.get("font-size"), 16.0)
+    x, y = _length(style.get("x")), _length(style.get("y"))
+    # Helvetica averages about half an em per character; good enough for anchoring
+    width = len(text) * size * 0.5
+    x -= {"middle": width / 2, "end": width}.get(state.get("text-anchor", "start"), 0.0)
+    # Text is drawn upright: undo the page flip for the glyphs themselves
+    text_matrix = multiply(matrix, (size, 0, 0, -size, x, y))
+    _check_finite(text_matrix, "Text position")
+    drawing.items.append(Text(text, text_matrix, size, fill))
+
+
+# --- Writers ---
+
+def _fmt(value: float) -> str:
+    text = f"{value:.3f}".rstrip("0").rstrip(".")
+    return "0" if text in ("-0", "") else text
+
+
+def _path_ops(segments: Sequence[Segment], moveto: str, lineto: str, curveto: str, close: str) -> List[str]:
+    ops = []
+    for segment in segments:
+        if segment[0] == "Z":
+            ops.append(close)
+            continue
+        args = " ".join(_fmt(v) for v in segment[1:])
+        ops.append(f"{args} {dict(M=moveto, L=lineto, C=curveto)[segment[0]]}")
+    return ops
+
+
+def _escape_text(text: str) -> str:
+    text = text.encode("latin-1", "replace").decode("latin-1")
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def drawing_to_eps(drawing: Drawing) -> str:
+    lines = [
+        "%!PS-Adobe-3.0 EPSF-3.0",
+        f"%%BoundingBox: 0 0 {math.ceil(drawing.width)} {math.ceil(drawing.height)}",
+        f"%%HiResBoundingBox: 0 0 {_fmt(drawing.width)} {_fmt(drawing.height)}",
+        "%%Creator: CogniSuite",
+        "%%EndComments",
+    ]
+    for item in drawing.items:
+        if isinstance(item, Text):
+            m = item.matrix
+            lines += [
+                "gsave",
+                f"{_fmt(item.fill[0])} {_fmt(item.fill[1])} {_fmt(item.fill[2])} setrgbcolor",
+                "/Helvetica findfont 1 scalefont setfont",
+                f"[{' '.join(_fmt(v) for v in m)}] concat",
+                f"0 0 moveto ({_escape_text(item.text)}) show",
+                "grestore",
+            ]
+            continue
+        path = ["newpath"] + _path_ops(item.segments, "moveto", "lineto", "curveto", "closepath")
+        if item.fill is not None:
+            fill_op = "eofill" if item.even_odd else "fill"
+            lines += ["gsave", f"{_fmt(item.fill[0])} {_fmt(item.fill[1])} {_fmt(item.fill[2])} setrgbcolor"]
+            lines += path + [fill_op, "grestore"]
+        if item.stroke is not None:
+            lines += [
+                "gsave",
+                f"{_fmt(item.stroke[0])} {_fmt(item.stroke[1])} {_fmt(item.stroke[2])} setrgbcolor",
+                f"{_fmt(item.stroke_width)} setlinewidth {item.linecap} setlinecap {item.linejoin} setlinejoin",
+            ]
+            lines += path + ["stroke", "grestore"]
+    lines += ["showpage", "%%EOF"]
+    return "\n".join(lines) + "\n"
+
+
+def drawing_to_pdf(drawing: Drawing) -> bytes:
+    ops: List[str] = []
+    for item in drawing.items:
+        if isinstance(item, Text):
+            m = item.matrix
+            ops += [
+                "q",
+                f"{_fmt(item.fill[0])} {_fmt(item.fill[1])} {_fmt(item.fill[2])} rg",
+                "BT /F1 1 Tf",
+                f"{' '.join(_fmt(v) for v in m)} Tm",
+                f"({_escape_text(item.text)}) Tj ET",
+                "Q",
+            ]
+            continue
+        ops.append("q")
+        if item.fill is not None:
+            ops.append(f"{_fmt(item.fill[0])} {_fmt(item.fill[1])} {_fmt(item.fill[2])} rg")
+        if item.stroke is not None:
+            ops.append(f"{_fmt(item.stroke[0])} {_fmt(item.stroke[1])} {_fmt(item.stroke[2])} RG")
+            ops.append(f"{_fmt(item.stroke_width)} w {item.linecap} J {item.linejoin} j")
+        ops += _path_ops(item.segments, "m", "l", "c", "h")
+        if item.fill is not None and item.stroke is not None:
+            ops.append("B*" if item.even_odd else "B")
+        elif item.fill is not None:
+            ops.append("f*" if item.even_odd else "f")
+        else:
+            ops.append("S")
+        ops.append("Q")
+
+    content = zlib.compress("\n".join(ops).encode("latin-1"))
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {_fmt(drawing.width)} {_fmt(drawing.height)}] "
+         f"/Resources << /Font << /F1 5 0 R >> >> /Contents 4 0 R >>").encode("latin-1"),
+        f"<< /Length {len(content)} /Filter /FlateDecode >>\nstream\n".encode("latin-1") + content + b"\nendstream",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    ]
+    out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode("latin-1") + body + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    out += b"".join(f"{offset:010d} 00000 n \n".encode("latin-1") for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    return bytes(out)
+
+
+def svg_to_eps(svg_code: str) -> str:
+    return drawing_to_eps(svg_to_drawing(svg_code))
+
+
+def svg_to_pdf(svg_code: str) -> bytes:
+    return drawing_to_pdf(svg_to_drawing(svg_code))
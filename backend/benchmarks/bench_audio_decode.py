@@ -0,0 +1,117 @@
+"""Per-utterance decode latency and disk I/O: temp-file path vs in-memory ffmpeg pipe.
+
+Usage (from backend/):
+    python -m benchmarks.bench_audio_decode [--file clip.webm] [--seconds 6] [--runs 20] [--transcribe]
+
+Without --file a synthetic Opus/WebM clip is generated with ffmpeg, matching
+what browsers upload from MediaRecorder. --transcribe also runs Whisper on each
+decoded buffer so the end-to-end STT latency can be compared.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import ffmpeg
+import numpy as np
+
+from app.services.audio import decode_audio_bytes
+
+
+def make_clip(seconds: float) -> bytes:
+    """Encodes a synthetic tone to WebM/Opus in memory."""
+    out, _ = (
+        ffmpeg
+        .input(f"sine=frequency=440:duration={seconds}", f="lavfi")
+        .output("pipe:1", format="webm", acodec="libopus", ac=1, ar=48000)
+        .run(capture_stdout=True, capture_stderr=True)
+    )
+    return out
+
+
+def legacy_decode(data: bytes, io: dict) -> np.ndarray:
+    """The previous path: upload -> temp .webm -> ffmpeg -> temp .wav -> Whisper's own ffmpeg load."""
+    import whisper
+
+    temp_path = ""
+    wav_file = ""
+    try:
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".webm") as temp:
+            temp.write(data)
+            temp_path = temp.name
+        io["bytes_written"] += len(data)
+
+        wav_file = temp_path.replace(".webm", ".wav")
+        ffmpeg.input(temp_path).output(wav_file, acodec="pcm_s16le", ac=1, ar="16k").run(quiet=True, overwrite_output=True)
+        wav_size = os.path.getsize(wav_file)
+        io["bytes_written"] += wav_size
+        io["bytes_read"] += len(data) + wav_size
+        io["processes"] += 2
+
+        return whisper.load_audio(wav_file)
+    finally:
+        for path in (temp_path, wav_file):
+            if path and os.path.exists(path):
+                os.remove(path)
+
+
+def pipe_decode(data: bytes, io: dict) -> np.ndarray:
+    io["processes"] += 1
+    return decode_audio_bytes(data)
+
+
+def run(name: str, decode, data: bytes, runs: int, model=None) -> dict:
+    io = {"bytes_written": 0, "bytes_read": 0, "processes": 0}
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        audio = decode(data, io)
+        if model is not None:
+            model.transcribe(audio, fp16=False)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        "path": name,
+        "mean_ms": statistics.mean(timings),
+        "p50_ms": timings[len(timings) // 2],
+        "p95_ms": timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+        "disk_kb_per_utt": (io["bytes_written"] + io["bytes_read"]) / runs / 1024,
+        "procs_per_utt": io["processes"] / runs,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--file", help="Encoded recording to decode (default: synthetic WebM/Opus)")
+    parser.add_argument("--seconds", type=float, default=6.0, help="Length of the synthetic clip")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--transcribe", action="store_true", help="Include Whisper inference in each run")
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file, "rb") as f:
+            data = f.read()
+    else:
+        data = make_clip(args.seconds)
+
+    model = None
+    if args.transcribe:
+        import whisper
+        model = whisper.load_model(os.getenv("WHISPER_MODEL", "base"))
+
+    # Warm up ffmpeg and the page cache so the first run doesn't skew either side
+    pipe_decode(data, {"processes": 0})
+
+    results = [run("temp-file", legacy_decode, data, args.runs, model), run("in-memory", pipe_decode, data, args.runs, model)]
+    print(f"clip: {len(data) / 1024:.1f} KiB, runs: {args.runs}, transcribe: {args.transcribe}")
+    print(f"{'path':<10} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'disk KiB/utt':>13} {'procs/utt':>10}")
+    for r in results:
+        print(f"{r['path']:<10} {r['mean_ms']:>9.1f} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} "
+              f"{r['disk_kb_per_utt']:>13.1f} {r['procs_per_utt']:>10.1f}")
+    legacy, memory = results
+    print(f"speedup: {legacy['mean_ms'] / memory['mean_ms']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
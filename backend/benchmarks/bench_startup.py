@@ -0,0 +1,97 @@
+"""Cold-start profile: `import app.main` time and uvicorn time-to-first-request.
+
+Usage (from backend/):
+    python -m benchmarks.bench_startup [--runs 5] [--path /] [--warmup all]
+
+Each run starts a fresh interpreter, so module caches don't carry over.
+--warmup sets WARMUP_AGENTS for the server runs and additionally reports how
+long /health/ready takes to turn 200. Add `-X importtime` to the import command
+below when you need a per-module breakdown.
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = (
+    "import time; t = time.perf_counter(); import app.main; "
+    "print(time.perf_counter() - t)"
+)
+
+
+def measure_import() -> float:
+    out = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    )
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for(url: str, deadline: float, expect_status: int = 200) -> float:
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == expect_status:
+                    return time.perf_counter()
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.02)
+    raise TimeoutError(f"{url} not ready in time")
+
+
+def measure_server(path: str, warmup: str, timeout: float) -> dict:
+    port = _free_port()
+    env = dict(os.environ, WARMUP_AGENTS=warmup)
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        base = f"http://127.0.0.1:{port}"
+        first = _wait_for(base + path, started + timeout)
+        result = {"first_request": first - started}
+        if warmup:
+            result["ready"] = _wait_for(base + "/health/ready", started + timeout) - started
+        return result
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def _summary(values) -> str:
+    return f"mean {statistics.mean(values):.3f}s  min {min(values):.3f}s  max {max(values):.3f}s"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--path", default="/", help="Endpoint polled for the first successful request")
+    parser.add_argument("--warmup", default="", help="WARMUP_AGENTS value for the server runs")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    imports = [measure_import() for _ in range(args.runs)]
+    servers = [measure_server(args.path, args.warmup, args.timeout) for _ in range(args.runs)]
+
+    print(f"runs: {args.runs}, path: {args.path}, WARMUP_AGENTS={args.warmup!r}")
+    print(f"import app.main        {_summary(imports)}")
+    print(f"time to first request  {_summary([s['first_request'] for s in servers])}")
+    if args.warmup:
+        print(f"time to /health/ready  {_summary([s['ready'] for s in servers])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+import time
+
+from app.services.analysis_cache import AnalysisCache, analysis_key
+
+
+def test_analysis_key_covers_kind_prompt_and_model():
+    key = analysis_key("unit", "def f(): pass", "1", "gpt")
+    assert key == analysis_key("unit", "def f(): pass", "1", "gpt")
+    assert len({key, analysis_key("section", "def f(): pass", "1", "gpt"),
+                analysis_key("unit", "def f(): pass", "2", "gpt"), analysis_key("unit", "def f(): pass", "1", "x"),
+                analysis_key("unit", "def g(): pass", "1", "gpt")}) == 5
+
+
+def test_analysis_cache_round_trip_and_stats(tmp_path):
+    cache = AnalysisCache(str(tmp_path))
+    assert cache.get("k") is None
+    cache.put("k", "unit", "notes", 120)
+    assert cache.get("k") == {"result": "notes", "tokens": 120}
+    # a second instance reads the same file
+    assert AnalysisCache(str(tmp_path)).get("k")["result"] == "notes"
+    stats = cache.stats()
+    assert (stats["entries"], stats["hits"], stats["misses"], stats["tokens_saved"]) == (1, 1, 1, 120)
+
+
+def test_analysis_cache_evicts_least_recently_used(tmp_path):
+    cache = AnalysisCache(str(tmp_path), max_entries=2)
+    cache.put("a", "unit", "A", 1)
+    time.sleep(0.01)
+    cache.put("b", "unit", "B", 1)
+    time.sleep(0.01)
+    cache.get("a")
+    time.sleep(0.01)
+    cache.put("c", "unit", "C", 1)
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
@@ -0,0 +1,65 @@
+import asyncio
+from types import SimpleNamespace
+
+from app.services.chat_history import HistoryManager, message_tokens
+
+
+class FakeLLM:
+    def __init__(self):
+        self.calls = 0
+
+    async def ainvoke(self, prompt):
+        self.calls += 1
+        return SimpleNamespace(content="The user chatted about numbers.")
+
+
+def make_state(turns: int):
+    history = [{"role": "system", "content": "You are helpful."}]
+    history += [{"role": "user" if i % 2 == 0 else "assistant", "content": f"message {i} " + "word " * 40}
+                for i in range(turns)]
+    return SimpleNamespace(chat_history=history, history_summary="", folded_tokens=0)
+
+
+def history_tokens(manager, state):
+    return sum(message_tokens(m) for m in manager._summary_messages(state) + state.chat_history[1:])
+
+
+def test_prompt_keeps_the_system_message_and_newest_turns():
+    manager = HistoryManager(FakeLLM, budget=200, min_recent=2)
+    state = make_state(10)
+    messages, metrics = manager.build_prompt(state, "next question")
+    assert messages[0]["content"] == "You are helpful."
+    assert messages[-1] is state.chat_history[-1]
+    assert metrics["window_messages"] < 10 and metrics["saved_tokens"] > 0
+
+
+def test_history_within_budget_is_not_compacted():
+    llm = FakeLLM()
+    manager = HistoryManager(lambda: llm, budget=10000)
+
+    async def scenario():
+        manager.schedule_compaction("t", make_state(6))
+        await asyncio.sleep(0)
+
+    asyncio.run(scenario())
+    assert llm.calls == 0
+
+
+def test_compaction_folds_down_to_the_target_and_leaves_headroom():
+    llm = FakeLLM()
+    manager = HistoryManager(lambda: llm, budget=400, min_recent=2, compaction_target=0.5)
+    state = make_state(12)
+
+    async def scenario():
+        manager.schedule_compaction("t", state)
+        await asyncio.gather(*manager._tasks.values())
+        assert state.history_summary and state.folded_tokens > 0
+        assert history_tokens(manager, state) <= 200
+        # the next turn fits in the freed headroom without another summary call
+        state.chat_history.append({"role": "user", "content": "one more " + "word " * 40})
+        manager.schedule_compaction("t", state)
+        await asyncio.sleep(0)
+
+    asyncio.run(scenario())
+    assert llm.calls == 1
+    assert state.chat_history[0]["role"] == "system"
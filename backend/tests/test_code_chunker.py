@@ -0,0 +1,101 @@
+import pytest
+
+from app.services import code_chunker
+from app.services.code_chunker import MAX_UNIT_TOKENS, chunk_code
+from app.services.tokens import count_tokens
+
+PYTHON = '''import os
+
+LIMIT = 3
+
+
+@decorated
+def first(a):
+    return a + 1
+
+
+class Thing:
+    size = 2
+
+    def method(self):
+        return self.size
+'''
+
+
+def covered_lines(units):
+    return sorted(line for unit in units for line in range(unit.start_line, unit.end_line + 1))
+
+
+def test_python_units_follow_top_level_definitions():
+    units = chunk_code(PYTHON, "thing.py")
+    assert [(u.kind, u.name) for u in units] == [("module", "module level"), ("function", "first"),
+                                                 ("class", "Thing")]
+    # decorators belong to the function they decorate
+    assert units[1].start_line == 6 and units[1].source.startswith("@decorated")
+
+
+def test_large_classes_are_split_into_methods():
+    body = "".join(f"    def m{i}(self):\n" + "".join(f"        value_{j} = {j} * {i}\n" for j in range(400))
+                   for i in range(3))
+    units = chunk_code("class Big:\n    '''doc'''\n" + body, "big.py")
+    assert [u.kind for u in units][:1] == ["class"]
+    assert {u.name.split(" [")[0] for u in units if u.kind == "method"} == {"Big.m0", "Big.m1", "Big.m2"}
+    assert all(u.tokens <= MAX_UNIT_TOKENS for u in units)
+
+
+def test_oversized_functions_are_split_by_lines_without_overlap():
+    code = "def huge():\n" + "".join(f"    x_{i} = {i} + {i} * {i}\n" for i in range(3000))
+    units = chunk_code(code, "huge.py")
+    assert len(units) > 1
+    assert all(u.tokens <= MAX_UNIT_TOKENS for u in units)
+    assert covered_lines(units) == list(range(1, 3002))
+    assert units[0].name == "huge [1]"
+
+
+def test_other_languages_are_cut_at_definitions():
+    js = "".join(f"export function f{i}() {{\n" + "  work();\n" * 300 + "}\n\n" for i in range(3))
+    js += "const c = () => 1;\n"
+    units = chunk_code(js, "app.js")
+    assert all(u.kind == "block" for u in units)
+    assert covered_lines(units) == list(range(1, js.count("\n") + 1))
+    assert units[0].name.startswith("export function f0")
+
+
+def test_small_blocks_are_merged():
+    js = "".join(f"function f{i}() {{ return {i}; }}\n" for i in range(20))
+    units = chunk_code(js, "small.js")
+    assert len(units) == 1
+    assert units[0].start_line == 1 and units[0].end_line == 20
+
+
+@pytest.mark.parametrize("code", ["def broken(:\n    pass\n", "x = " + "(" * 300 + "1" + ")" * 300 + "\n"])
+def test_invalid_python_falls_back_to_line_blocks(code):
+    units = chunk_code(code, "broken.py")
+    assert [u.kind for u in units] == ["block"]
+
+
+def test_minified_lines_are_split_by_characters():
+    js = "var a=" + ",".join(f'"k{i}":{i * 7}' for i in range(20000)) + ";\nfunction f() {}\n"
+    units = chunk_code(js, "app.min.js")
+    assert len(units) > 1
+    assert all(u.tokens <= MAX_UNIT_TOKENS for u in units)
+    assert "".join(u.source for u in units) == js
+    assert units[0].start_line == units[0].end_line == 1
+
+
+def test_empty_source():
+    assert chunk_code("", "empty.py") == []
+
+
+def test_split_lines_prefers_blank_lines():
+    lines = ["a = 1\n"] * 10 + ["\n"] + ["b = 2\n"] * 10
+    budget = count_tokens("".join(lines[:12]))
+    units = code_chunker._split_lines("block", "block", lines, list(range(1, len(lines) + 1)), budget)
+    assert [(u.start_line, u.end_line) for u in units] == [(1, 11), (12, 21)]
+
+
+def test_split_lines_cuts_after_a_leading_blank_line():
+    lines = ["\n"] + ["a = 1\n"] * 10
+    budget = sum(count_tokens(line) for line in lines[1:])
+    units = code_chunker._split_lines("block", "block", lines, list(range(1, len(lines) + 1)), budget)
+    assert [(u.start_line, u.end_line) for u in units] == [(2, 11)]
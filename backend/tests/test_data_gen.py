@@ -0,0 +1,53 @@
+import os
+
+import pytest
+
+pytest.importorskip("langgraph")
+pytest.importorskip("langchain_openai")
+pytest.importorskip("pydantic")
+
+# The agent builds its LLM client at import time; it is never called here
+os.environ.setdefault("AZURE_OPENAI_ENDPOINT", "https://example.invalid")
+os.environ.setdefault("AZURE_OPENAI_API_KEY", "test")
+os.environ.setdefault("AZURE_OPENAI_DEPLOYMENT", "test")
+os.environ.setdefault("OPENAI_API_VERSION", "2024-10-21")
+
+from app.agents.data_gen_agent import ShardMerger, parse_records, plan_shards  # noqa: E402
+
+
+@pytest.mark.parametrize("count, size, expected", [
+    (0, 50, []),
+    (10, 50, [10]),
+    (100, 50, [50, 50]),
+    (101, 50, [34, 34, 33]),
+    (1000, 300, [250, 250, 250, 250]),
+])
+def test_plan_shards(count, size, expected):
+    shards = plan_shards(count, size)
+    assert shards == expected
+    assert sum(shards) == count and all(shard <= size for shard in shards)
+
+
+def test_parse_records_accepts_fenced_and_wrapped_arrays():
+    assert parse_records('```json\n[{"a": 1}, {"a": 2}]\n```') == [{"a": 1}, {"a": 2}]
+    assert parse_records('{"items": [{"a": 1}, 3]}') == [{"a": 1}]
+    assert parse_records('{"a": 1}') == [{"a": 1}]
+
+
+def test_parse_records_salvages_truncated_output():
+    assert parse_records('[{"a": 1}, {"a": 2}, {"a": 3, "b": "cut off') == [{"a": 1}, {"a": 2}]
+    assert parse_records("I cannot do that") == []
+
+
+def test_merger_drops_duplicate_keys():
+    merger = ShardMerger(4, ["email"])
+    fresh = merger.add([{"email": "A@x.com", "n": 1}, {"email": "a@x.com ", "n": 2}, {"email": "b@x.com"}])
+    assert [record.get("n") for record in fresh] == [1, None]
+    assert merger.duplicates == 1 and merger.missing == 2
+
+
+def test_merger_falls_back_to_whole_records_and_stops_when_full():
+    merger = ShardMerger(2, ["id"])
+    merger.add([{"name": "x"}, {"name": "x"}, {"name": "y"}, {"name": "z"}])
+    assert merger.full and merger.missing == 0
+    assert merger.records == [{"name": "x"}, {"name": "y"}]
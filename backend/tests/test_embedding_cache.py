@@ -0,0 +1,32 @@
+import pytest
+
+
+def test_embedding_cache_round_trip(tmp_path):
+    pytest.importorskip("langchain_core")
+    from app.services.embedding_cache import EmbeddingCache
+
+    cache = EmbeddingCache(str(tmp_path))
+    assert cache.get_many(["a", "b"], "m") == [None, None]
+    cache.put_many(["a", "b"], [[0.5, 1.0], [2.0, -1.0]], "m")
+    assert EmbeddingCache(str(tmp_path)).get_many(["b", "a", "c"], "m") == [[2.0, -1.0], [0.5, 1.0], None]
+    assert cache.get_many(["a"], "other model") == [None]
+    assert cache.stats()["entries"] == 2 and cache.stats()["blob_bytes"] == 16
+
+
+def test_cached_embeddings_only_embed_misses(tmp_path):
+    pytest.importorskip("langchain_core")
+    from app.services.embedding_cache import CachedEmbeddings, EmbeddingCache
+
+    class Counting:
+        def __init__(self):
+            self.embedded = []
+
+        def embed_documents(self, texts):
+            self.embedded.extend(texts)
+            return [[float(len(text))] for text in texts]
+
+    inner = Counting()
+    embeddings = CachedEmbeddings(inner, "m", EmbeddingCache(str(tmp_path)))
+    assert embeddings.embed_documents(["aa", "b", "aa"]) == [[2.0], [1.0], [2.0]]
+    assert embeddings.embed_documents(["b", "ccc"]) == [[1.0], [3.0]]
+    assert inner.embedded == ["aa", "b", "ccc"]
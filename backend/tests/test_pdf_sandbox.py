@@ -0,0 +1,37 @@
+import pytest
+
+pytest.importorskip("reportlab")
+
+from app.services.pdf_sandbox import PdfSandbox
+
+SAVE = "from reportlab.pdfgen import canvas\ncanvas.Canvas('out.pdf').save()"
+
+
+@pytest.fixture(scope="module")
+def sandbox():
+    pool = PdfSandbox(workers=1, timeout=5)
+    yield pool
+    pool.shutdown()
+
+
+def test_renders_a_pdf(sandbox):
+    result = sandbox.render(SAVE)
+    assert result.ok and result.pdf.startswith(b"%PDF")
+
+
+def test_generated_code_cannot_forge_a_response(sandbox):
+    forge = ("import os\n"
+             "for fd in range(64):\n"
+             "    try:\n"
+             "        os.write(fd, b'{\"ok\": true, \"pdf\": \"JVBERg==\"}\\n')\n"
+             "    except OSError:\n"
+             "        pass\n")
+    result = sandbox.render(forge)
+    assert not result.ok
+    # the next job still gets its own answer
+    assert sandbox.render(SAVE + "\n# again").ok
+
+
+def test_reads_outside_the_workdir_are_refused(sandbox):
+    result = sandbox.render("open('/etc/hostname').read()\n" + SAVE)
+    assert not result.ok and "not allowed" in result.error
@@ -0,0 +1,109 @@
+import io
+import tarfile
+import zipfile
+
+import pytest
+
+from app.services import repo_index
+from app.services.tokens import count_tokens
+
+FILES = {
+    "proj/app/__init__.py": "",
+    "proj/app/core.py": "def compute(x):\n    if x:\n        return helper(x)\n    return 0\n\n\ndef helper(x):\n    return x\n",
+    "proj/app/main.py": "from app.core import compute\n\n\ndef serve():\n    return compute(1)\n",
+    "proj/tests/test_core.py": "from app.core import compute\n\n\ndef test_compute():\n    assert compute(0) == 0\n",
+    "proj/web/index.js": "import { util } from './util';\nfunction start() { if (a && b) { util(); } }\n",
+    "proj/web/util.js": "export function util() { return 1; }\n",
+    "proj/node_modules/lib/index.js": "module.exports = 1;\n",
+    "proj/web/bundle.min.js": "var a=1;\n",
+    "proj/README.md": "# readme\n",
+}
+
+
+@pytest.fixture(scope="module", autouse=True)
+def pool():
+    yield
+    repo_index.shutdown_pool()
+
+
+def make_zip(files):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, text in files.items():
+            archive.writestr(name, text)
+    buffer.seek(0)
+    return buffer
+
+
+def make_tar(files):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+        for name, text in files.items():
+            data = text.encode("utf-8")
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    buffer.seek(0)
+    return buffer
+
+
+def test_archive_detection():
+    assert repo_index.is_archive("repo.tar.gz")
+    assert repo_index.is_archive("upload", make_zip({"a.py": ""}).read(512))
+    assert not repo_index.is_archive("main.py", b"import os\n")
+
+
+@pytest.mark.parametrize("path, reason", [
+    ("src/app.py", None),
+    ("node_modules/x/index.js", "vendored"),
+    (".github/scripts/x.py", "vendored"),
+    ("web/app.min.js", "generated"),
+    ("api/service_pb2.py", "generated"),
+    ("docs/readme.md", "unsupported"),
+])
+def test_skip_reason(path, reason):
+    assert repo_index.skip_reason(path) == reason
+
+
+@pytest.mark.parametrize("make", [make_zip, make_tar])
+def test_build_index_links_imports_and_calls(make):
+    index, _ = repo_index.build_index(make(FILES), "proj.zip")
+    assert set(index.files) == {path for path in FILES if repo_index.skip_reason(path) is None}
+    assert index.skipped == {"vendored": 1, "generated": 1, "unsupported": 1}
+    assert index.imports["proj/app/main.py"] == {"proj/app/core.py"}
+    assert index.imports["proj/web/index.js"] == {"proj/web/util.js"}
+    assert index.calls["proj/app/main.py"]["proj/app/core.py"] == 1
+    assert index.files["proj/app/core.py"]["complexity"] == 2  # 1 + the branch in compute
+    assert index.files["proj/tests/test_core.py"]["test"]
+    # the module everything depends on ranks above the test that uses it
+    ranked = index.ranked()
+    assert ranked.index("proj/app/core.py") < ranked.index("proj/tests/test_core.py")
+
+
+def test_unsafe_and_binary_members_are_skipped():
+    index, _ = repo_index.build_index(make_zip({"../evil.py": "x = 1\n", "blob.c": "\0\1\2", "ok.py": "y = 2\n"}),
+                                      "x.zip")
+    assert list(index.files) == ["ok.py"]
+    assert index.skipped == {"unsafe_path": 1, "binary": 1}
+
+
+def test_invalid_archives_raise_archive_error():
+    with pytest.raises(repo_index.ArchiveError):
+        repo_index.build_index(io.BytesIO(b"PK\x03\x04 not really a zip"), "bad.zip")
+
+
+@pytest.mark.parametrize("prefix", ["def broken(:\n", "x = " + "(" * 300 + "1" + ")" * 300 + "\n"])
+def test_unparsable_python_uses_generic_analysis(prefix):
+    facts = repo_index.analyze_file("bad.py", prefix + "def f():\n    if x: pass\n")
+    assert facts["language"] == "python"
+    assert {"name": "f", "line": 2, "complexity": 0} in facts["functions"]
+
+
+def test_summary_respects_the_token_budget():
+    files = {f"pkg/mod_{i}.py": f"import pkg.mod_{(i + 1) % 200}\n\n\ndef fn_{i}(a):\n    return a\n"
+             for i in range(200)}
+    summary = repo_index.summarize_archive(make_zip(files), "pkg.zip")
+    assert summary["stats"]["files_analyzed"] == 200
+    assert count_tokens(summary["index"]) <= repo_index.INDEX_TOKENS
+    assert summary["index"].startswith("Repository: pkg")
+    assert summary["hot_files"].count("### ") == repo_index.HOT_FILES
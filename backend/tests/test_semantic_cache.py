@@ -0,0 +1,65 @@
+import asyncio
+import time
+
+import numpy as np
+
+from app.services.semantic_cache import SemanticCache, replay_chunks
+
+
+class FakeEmbeddings:
+    """Maps each known question to a fixed direction."""
+
+    vectors = {
+        "what is the capital of france": [1.0, 0.0, 0.0],
+        "tell me france's capital": [0.99, 0.1, 0.0],
+        "how do magnets work": [0.0, 1.0, 0.0],
+    }
+
+    def __init__(self):
+        self.calls = 0
+
+    async def aembed_query(self, text):
+        self.calls += 1
+        return self.vectors.get(text, [0.0, 0.0, 1.0])
+
+
+def test_semantic_cache_matches_similar_questions():
+    embeddings = FakeEmbeddings()
+    cache = SemanticCache(lambda: embeddings, threshold=0.9)
+
+    async def scenario():
+        answer, vector = await cache.lookup("prompt", "What is the capital of France?")
+        assert answer is None
+        cache.store("prompt", "What is the capital of France?", "Paris.", vector)
+        assert (await cache.lookup("prompt", "what is the capital of france"))[0] == "Paris."
+        assert (await cache.lookup("prompt", "Tell me France's capital"))[0] == "Paris."
+        assert (await cache.lookup("prompt", "How do magnets work?"))[0] is None
+        assert (await cache.lookup("other prompt", "What is the capital of France?"))[0] is None
+
+    asyncio.run(scenario())
+    stats = cache.stats()
+    assert (stats["hits"], stats["exact_hits"], stats["misses"]) == (2, 1, 3)
+    assert embeddings.calls == 4  # the exact hit skipped the embedding call
+
+
+def test_semantic_cache_bounds_entries_and_expires():
+    cache = SemanticCache(FakeEmbeddings, max_entries=2, ttl=0)
+    for i in range(3):
+        cache.store("p", f"question {i}", "answer", np.array([1.0, 0.0], dtype=np.float32))
+    assert cache.stats()["entries"] == 2 and cache.stats()["evictions"] == 1
+    time.sleep(0.01)
+    assert asyncio.run(cache.lookup("p", "question 2"))[0] is None
+    assert cache.stats()["expirations"] == 2
+
+
+def test_semantic_cache_only_caches_short_questions():
+    cache = SemanticCache(FakeEmbeddings)
+    assert cache.cacheable("What time is it?")
+    assert not cache.cacheable("   ")
+    assert not cache.cacheable("x" * 10000)
+
+
+def test_replay_chunks_preserve_the_answer():
+    answer = "The capital of France is Paris, which is also its largest city.\n\nIt sits on the Seine."
+    chunks = replay_chunks(answer)
+    assert "".join(chunks) == answer and len(chunks) > 1
@@ -0,0 +1,129 @@
+import asyncio
+import threading
+
+import pytest
+
+pytest.importorskip("pydantic")
+
+from app.services import session_store as store_module  # noqa: E402
+from app.services.session_store import SessionStore  # noqa: E402
+
+
+class ChatState:
+    def __init__(self, text: str = ""):
+        self.text = text
+
+
+class VoiceState(ChatState):
+    pass
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(store_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_get_returns_stored_state_of_the_expected_type():
+    store = SessionStore(ttls={})
+    state = ChatState("hi")
+    store.put("t1", state)
+    assert store.get("t1") is state
+    assert store.get("t1", ChatState) is state
+    assert store.get("t1", VoiceState) is None
+    assert store.get("missing") is None
+    assert store.stats()["hits"] == 2 and store.stats()["misses"] == 2
+
+
+def test_idle_sessions_expire_per_type(clock):
+    store = SessionStore(ttls={"ChatState": 10, "VoiceState": 100})
+    store.put("chat", ChatState())
+    store.put("voice", VoiceState())
+    clock[0] += 50
+    assert store.get("chat") is None
+    assert store.get("voice") is not None
+    clock[0] += 99
+    assert store.sweep() == 0  # the get above refreshed "voice"
+    clock[0] += 2
+    assert store.sweep() == 1
+    assert len(store) == 0
+    assert store.stats()["evictions"]["ttl"] == 2
+
+
+def test_least_recently_used_sessions_are_evicted_first():
+    evicted = []
+    store = SessionStore(ttls={}, max_sessions=2)
+    store.on_evict(ChatState, lambda thread_id, state: evicted.append(thread_id))
+    store.put("a", ChatState())
+    store.put("b", ChatState())
+    store.get("a")
+    store.put("c", ChatState())
+    assert evicted == ["b"]
+    assert "a" in store and "c" in store
+
+
+def test_memory_limit_keeps_the_session_being_stored():
+    store = SessionStore(ttls={}, max_bytes=store_module.estimate_state_bytes(ChatState("x" * 1000)) + 10)
+    store.put("a", ChatState("x" * 1000))
+    store.put("b", ChatState("y" * 5000))
+    assert "b" in store and "a" not in store
+    assert store.stats()["evictions"]["memory"] == 1
+
+
+def test_pop_is_not_an_eviction():
+    evicted = []
+    store = SessionStore(ttls={})
+    store.on_evict(ChatState, lambda thread_id, state: evicted.append(thread_id))
+    store.put("a", ChatState())
+    assert isinstance(store.pop("a"), ChatState)
+    assert evicted == [] and store.stats()["estimated_bytes"] == 0
+
+
+def test_failing_hooks_do_not_stop_eviction(clock):
+    store = SessionStore(ttls={"ChatState": 1})
+    store.on_evict(ChatState, lambda thread_id, state: 1 / 0)
+    store.put("a", ChatState())
+    clock[0] += 5
+    assert store.sweep() == 1 and len(store) == 0
+
+
+def test_hooks_can_be_limited_to_eviction_reasons(clock):
+    calls = []
+    store = SessionStore(ttls={"ChatState": 10}, max_sessions=1)
+    store.on_evict(ChatState, lambda thread_id, state: calls.append(("hibernate", thread_id)), reasons=("lru",))
+    store.on_evict(ChatState, lambda thread_id, state: calls.append(("delete", thread_id)), reasons=("ttl",))
+    store.put("a", ChatState())
+    store.put("b", ChatState())
+    clock[0] += 20
+    store.sweep()
+    assert calls == [("hibernate", "a"), ("delete", "b")]
+
+
+def test_hooks_run_off_the_event_loop():
+    threads = []
+    store = SessionStore(ttls={}, max_sessions=1)
+    store.on_evict(ChatState, lambda thread_id, state: threads.append(threading.current_thread()))
+
+    async def scenario():
+        store.put("a", ChatState())
+        store.put("b", ChatState())
+        for _ in range(100):
+            if threads:
+                break
+            await asyncio.sleep(0.01)
+        return threading.current_thread()
+
+    loop_thread = asyncio.run(scenario())
+    assert len(threads) == 1 and threads[0] is not loop_thread
+
+
+def test_sweep_hooks_run_after_each_sweep():
+    calls = []
+    store = SessionStore(ttls={})
+    store.on_sweep(lambda: calls.append(len(store)))
+    store.on_sweep(lambda: 1 / 0)
+    store.put("a", ChatState())
+    store.sweep()
+    assert calls == [1]
+    assert store.ttl_for(ChatState) == store.default_ttl
@@ -0,0 +1,42 @@
+import asyncio
+import time
+
+import numpy as np
+
+from app.services.stt import STTService
+
+
+class FakeSTT(STTService):
+    """Transcribes every clip as its length, slowly enough to keep batches in flight."""
+
+    def _transcribe_batch(self, audios):
+        time.sleep(0.2)
+        return [str(len(audio)) for audio in audios]
+
+
+def test_concurrent_requests_are_batched():
+    service = FakeSTT(lambda: None, workers=1, max_batch=8, batch_window_ms=50)
+
+    async def scenario():
+        texts = await asyncio.gather(*(service.transcribe(np.zeros(n)) for n in range(1, 5)))
+        await service.stop()
+        return texts
+
+    assert asyncio.run(scenario()) == ["1", "2", "3", "4"]
+    assert service.stats()["batches"] == 1
+
+
+def test_stop_fails_queued_and_running_requests():
+    service = FakeSTT(lambda: None, workers=1, max_batch=1, batch_window_ms=1)
+
+    async def scenario():
+        pending = [asyncio.ensure_future(service.transcribe(np.zeros(10))) for _ in range(4)]
+        await asyncio.sleep(0.05)
+        assert len(service._batch_tasks) == 1
+        await service.stop()
+        results = await asyncio.wait_for(asyncio.gather(*pending, return_exceptions=True), 1)
+        assert not service._batch_tasks
+        return results
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, RuntimeError) and "stopped" in str(result) for result in results)
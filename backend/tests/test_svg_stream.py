@@ -0,0 +1,59 @@
+import pytest
+
+from app.services.svg_stream import MalformedSvgError, ProgressiveSvgParser
+
+DOCUMENT = ('Here you go:\n```svg\n<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 10 10">'
+            '<rect width="5" height="5" fill="red"/><g><circle r="2"/></g><text>A &amp; B & C</text>'
+            '</svg>\n```')
+
+
+def feed_all(parser: ProgressiveSvgParser, chunks):
+    events = []
+    for chunk in chunks:
+        events.extend(parser.feed(chunk))
+    return events
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, len(DOCUMENT)])
+def test_events_do_not_depend_on_chunking(size):
+    parser = ProgressiveSvgParser()
+    events = feed_all(parser, [DOCUMENT[i:i + size] for i in range(0, len(DOCUMENT), size)])
+    parser.close()
+    assert [kind for kind, _ in events] == ["root", "element", "element", "element"]
+    assert events[0][1] == {"viewBox": "0 0 10 10"}
+    assert events[1][1].startswith("<rect")
+    assert "<circle" in events[2][1]
+    assert parser.finished and parser.elements == 3
+
+
+def test_chatter_is_dropped_and_bare_ampersands_escaped():
+    parser = ProgressiveSvgParser()
+    events = feed_all(parser, [DOCUMENT])
+    assert parser.code.startswith("<svg") and parser.code.endswith("</svg>")
+    assert "A &amp; B &amp; C" in events[-1][1]
+
+
+def test_feeding_after_the_root_closes_is_ignored():
+    parser = ProgressiveSvgParser()
+    feed_all(parser, [DOCUMENT])
+    assert parser.feed("<rect/>") == []
+
+
+def test_wrong_root_element():
+    with pytest.raises(MalformedSvgError):
+        ProgressiveSvgParser().feed("<svgx><rect/></svgx>")
+
+
+def test_mismatched_tags():
+    parser = ProgressiveSvgParser()
+    with pytest.raises(MalformedSvgError):
+        feed_all(parser, ["<svg><g><rect></g>"])
+
+
+def test_close_reports_incomplete_streams():
+    with pytest.raises(MalformedSvgError, match="No <svg>"):
+        ProgressiveSvgParser().close()
+    parser = ProgressiveSvgParser()
+    parser.feed("<svg><rect/>")
+    with pytest.raises(MalformedSvgError, match="before </svg>"):
+        parser.close()
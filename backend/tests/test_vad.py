@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("ffmpeg")  # app.services.audio decodes with ffmpeg-python
+
+from app.services import vad  # noqa: E402
+
+RATE = 16000
+
+
+def tone(seconds: float, amplitude: float = 0.3) -> np.ndarray:
+    t = np.arange(int(seconds * RATE)) / RATE
+    return (amplitude * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+
+def speech(seconds: float) -> np.ndarray:
+    """A tone broken into 300 ms syllables by 100 ms dips, like continuous speech."""
+    audio = tone(seconds)
+    dips = np.arange(len(audio)) % int(0.4 * RATE) >= int(0.3 * RATE)
+    audio[dips] *= 0.001
+    return audio
+
+
+def noise(seconds: float, amplitude: float = 0.001) -> np.ndarray:
+    return (amplitude * np.random.default_rng(0).standard_normal(int(seconds * RATE))).astype(np.float32)
+
+
+def test_silence_yields_no_chunks():
+    assert vad.split_for_inference(np.zeros(RATE * 3, dtype=np.float32), RATE) == []
+    assert vad.split_for_inference(noise(3), RATE) == []
+
+
+@pytest.mark.parametrize("steady", [tone(3), noise(3, amplitude=0.1)])
+def test_steady_sounds_without_speech_are_silent(steady):
+    # a fan or mains hum is loud but never rises above its own floor
+    assert vad.split_for_inference(steady, RATE) == []
+
+
+def test_leading_and_trailing_silence_is_trimmed():
+    audio = np.concatenate([noise(2), speech(1), noise(2)])
+    chunks = vad.split_for_inference(audio, RATE)
+    assert len(chunks) == 1
+    # one second of speech plus at most PAD_MS (and a frame) on each side
+    assert RATE <= len(chunks[0]) <= RATE + 2 * RATE * (vad.PAD_MS + vad.FRAME_MS) / 1000
+
+
+def test_clicks_shorter_than_min_speech_are_dropped():
+    audio = np.concatenate([noise(1), tone(0.03), noise(1)])
+    assert vad.speech_segments(audio, RATE) == []
+
+
+def test_short_pauses_are_bridged():
+    audio = np.concatenate([noise(1), tone(1), noise(0.3), tone(1), noise(1)])
+    assert len(vad.speech_segments(audio, RATE)) == 1
+
+
+def test_long_recordings_are_split_at_pauses():
+    recording = [speech(4), noise(2)] * 4
+    chunks = vad.split_for_inference(np.concatenate(recording), RATE, max_seconds=12)
+    assert len(chunks) == 2
+    assert all(len(chunk) <= 12 * RATE for chunk in chunks)
+
+
+def test_continuous_speech_is_cut_to_the_window():
+    chunks = vad.split_for_inference(speech(25), RATE, max_seconds=10)
+    assert [len(chunk) for chunk in chunks][:2] == [10 * RATE, 10 * RATE]
+    assert sum(len(chunk) for chunk in chunks) == 25 * RATE
@@ -0,0 +1,65 @@
+import os
+import time
+
+from app.services.vector_cache import VectorResultCache, cache_key
+
+VALID = [("generator", {"svg_code": "<svg/>"}), ("validator", {"is_valid": True, "svg_code": "<svg/>"})]
+
+
+def test_vector_cache_key_normalizes_inputs():
+    base = {"prompt": "A red  Circle", "vector_format": "svg", "style": "flat"}
+    assert cache_key(base) == cache_key({**base, "prompt": "  A red Circle "})
+    assert cache_key(base) != cache_key({**base, "prompt": "A RED CIRCLE"})
+    assert cache_key(base) != cache_key({**base, "style": "outline"})
+    assert cache_key(base) != cache_key(base, model="other")
+
+
+def test_vector_cache_memory_and_disk_hits(tmp_path):
+    cache = VectorResultCache(str(tmp_path), memory_entries=1)
+    assert cache.put("k1", VALID)
+    assert cache.get("k1") == VALID
+    cache.put("k2", VALID)  # pushes k1 out of memory
+    assert VectorResultCache(str(tmp_path)).get("k1") == VALID
+    assert cache.get("k1") == VALID
+    stats = cache.stats()
+    assert (stats["memory_hits"], stats["disk_hits"], stats["stores"]) == (1, 1, 2)
+
+
+def test_vector_cache_rejects_invalid_results_and_expires(tmp_path):
+    cache = VectorResultCache(str(tmp_path), ttl=0)
+    assert not cache.put("bad", [("validator", {"is_valid": False})])
+    assert cache.put("k", VALID)
+    time.sleep(0.01)
+    assert cache.get("k") is None
+    assert cache.stats()["rejected_invalid"] == 1
+
+
+def test_vector_cache_ignores_corrupt_entries(tmp_path):
+    cache = VectorResultCache(str(tmp_path))
+    path = cache._path("k")
+    os.makedirs(os.path.dirname(path))
+    with open(path, "w") as f:
+        f.write("{not json")
+    assert cache.get("k") is None
+    assert cache.stats()["errors"] == 1
+
+
+def test_vector_cache_prunes_expired_and_least_recently_used_files(tmp_path):
+    cache = VectorResultCache(str(tmp_path), ttl=3600, disk_entries=2)
+    for key in ("expired", "a", "b", "c"):
+        cache.put(key, VALID)
+    now = time.time()
+    for key, age in (("expired", 7200), ("a", 60), ("b", 30), ("c", 0)):
+        os.utime(cache._path(key), (now - age, now - age))
+    assert cache.prune() == 2
+    assert [os.path.exists(cache._path(key)) for key in ("expired", "a", "b", "c")] == [False, False, True, True]
+    assert cache.stats()["pruned"] == 2
+
+
+def test_vector_cache_deletes_expired_files_on_read(tmp_path):
+    cache = VectorResultCache(str(tmp_path))
+    cache.put("k", VALID)
+    assert os.path.exists(cache._path("k"))
+    time.sleep(0.01)
+    assert VectorResultCache(str(tmp_path), ttl=0).get("k") is None
+    assert not os.path.exists(cache._path("k"))
@@ -0,0 +1,106 @@
+import zlib
+
+import pytest
+
+from app.services import vector_convert
+from app.services.vector_convert import ConversionError
+
+SVG = '<svg xmlns="http://www.w3.org/2000/svg" {attrs}>{body}</svg>'
+
+
+def svg(body: str, attrs: str = 'viewBox="0 0 100 50"') -> str:
+    return SVG.format(attrs=attrs, body=body)
+
+
+def test_page_size_follows_viewbox_in_points():
+    drawing = vector_convert.svg_to_drawing(svg('<rect width="10" height="10" fill="red"/>'))
+    assert (drawing.width, drawing.height) == (75.0, 37.5)
+    assert len(drawing.items) == 1
+    assert drawing.items[0].fill == (1, 0, 0)
+
+
+def test_y_axis_is_flipped_to_a_bottom_left_origin():
+    drawing = vector_convert.svg_to_drawing(svg('<rect x="0" y="0" width="10" height="10"/>'))
+    moveto = drawing.items[0].segments[0]
+    assert moveto[0] == "M"
+    assert moveto[1:] == pytest.approx((0.0, 37.5))
+
+
+def test_eps_and_pdf_writers():
+    drawing = vector_convert.svg_to_drawing(svg('<circle cx="50" cy="25" r="20" stroke="blue" fill="none"/>'))
+    eps = vector_convert.drawing_to_eps(drawing)
+    assert eps.startswith("%!PS-Adobe-3.0 EPSF-3.0")
+    assert "%%BoundingBox: 0 0 75 38" in eps
+    assert "stroke" in eps and "fill\n" not in eps
+    pdf = vector_convert.drawing_to_pdf(drawing)
+    assert pdf.startswith(b"%PDF-1.4") and pdf.rstrip().endswith(b"%%EOF")
+    stream = pdf.split(b"stream\n", 1)[1].split(b"\nendstream", 1)[0]
+    assert b" c" in zlib.decompress(stream)
+
+
+def test_arcs_become_curves():
+    segments = vector_convert.parse_path("M0 0 A10 10 0 0 1 20 0")
+    assert [s[0] for s in segments] == ["M", "C", "C"]
+    assert segments[-1][-2:] == pytest.approx((20.0, 0.0))
+
+
+def test_hidden_and_skipped_elements_are_not_drawn():
+    body = ('<defs><rect id="r" width="5" height="5"/></defs>'
+            '<rect width="5" height="5" display="none"/>'
+            '<rect width="5" height="5" visibility="hidden"/>'
+            '<rect width="5" height="5" fill="none"/>')
+    assert vector_convert.svg_to_drawing(svg(body)).items == []
+
+
+def test_use_places_a_copy_of_its_target():
+    body = '<defs><rect id="r" width="5" height="5"/></defs><use href="#r" x="10"/><use href="#r" x="20"/>'
+    drawing = vector_convert.svg_to_drawing(svg(body))
+    assert len(drawing.items) == 2
+    assert drawing.items[1].segments[0][1] == pytest.approx(20 * vector_convert.PX_TO_PT)
+
+
+def test_self_referencing_use_expands_once():
+    body = '<g id="a"><use href="#a"/><use href="#a"/><rect width="5" height="5"/></g>'
+    assert len(vector_convert.svg_to_drawing(svg(body)).items) == 1
+
+
+def test_nested_use_fan_out_is_bounded():
+    levels = "".join(f'<g id="l{i}">' + f'<use href="#l{i - 1}"/>' * 10 + "</g>" for i in range(1, 9))
+    body = f'<defs><rect id="l0" width="1" height="1"/>{levels}</defs><use href="#l8"/>'
+    with pytest.raises(ConversionError, match="more than"):
+        vector_convert.svg_to_drawing(svg(body))
+
+
+@pytest.mark.parametrize("attrs", [
+    'width="0" height="10"',
+    'viewBox="0 0 0 0"',
+    'viewBox="0 0 -10 10"',
+    'width="1e400" height="10"',
+])
+def test_degenerate_viewports_are_rejected(attrs):
+    with pytest.raises(ConversionError):
+        vector_convert.svg_to_drawing(svg('<rect width="5" height="5"/>', attrs))
+
+
+def test_huge_arc_radii_are_rejected():
+    with pytest.raises(ConversionError):
+        vector_convert.svg_to_drawing(svg('<path d="M0 0 A1e308 1e308 0 0 1 5 5"/>'))
+
+
+@pytest.mark.parametrize("body", [
+    '<path d="M0 0 L1e400 0"/>',
+    '<rect width="5" height="5" transform="scale(1e308) scale(1e308)"/>',
+    '<polygon points="0,0 5,5 1e999,5"/>',
+    '<rect width="1e400" height="5"/>',
+    '<circle r="5" stroke="red" stroke-width="1e308" transform="scale(1e200)"/>',
+    '<text x="1e400" y="5">hi</text>',
+])
+def test_non_finite_numbers_are_rejected(body):
+    with pytest.raises(ConversionError):
+        vector_convert.svg_to_eps(svg(body))
+
+
+@pytest.mark.parametrize("code", ["<svg", "<html></html>", '<svg><path d="M0 0 Q"/></svg>'])
+def test_invalid_documents_raise_conversion_error(code):
+    with pytest.raises(ConversionError):
+        vector_convert.svg_to_drawing(code)
@@ -69,7 +69,9 @@ export default function CodeAnalyzerPage() {
         }
         try {
           const data = JSON.parse(event.data);
-          if (data.analysis) {
+          if (data.delta) {
+            setAnalysis(prev => prev + data.delta);
+          } else if (data.analysis) {
             setAnalysis(data.analysis);
           }
         } catch (e) {
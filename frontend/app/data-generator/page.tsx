@@ -16,6 +16,7 @@ export default function DataGeneratorPage() {
 
     const url = `http://localhost:8000/api/generate-data?prompt=${encodeURIComponent(prompt)}&count=${encodeURIComponent(count)}`;
     const eventSource = new EventSource(url);
+    const streamedRecords: unknown[] = [];
 
     // Using your provided EventSource handler logic
     eventSource.onmessage = (event) => {
@@ -43,6 +44,12 @@ export default function DataGeneratorPage() {
       
       try {
         const data = JSON.parse(rawData);
+        // Large counts arrive shard by shard before the merged array
+        if (data.step === "records" && Array.isArray(data.records)) {
+          streamedRecords.push(...data.records);
+          setJsonData(JSON.stringify(streamedRecords, null, 2));
+          return;
+        }
         // Modified to handle the data generator's output
         if (data.output?.generated_json) {
           const parsedInnerJson = JSON.parse(data.output.generated_json);
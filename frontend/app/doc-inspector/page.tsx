@@ -73,8 +73,8 @@ export default function DocInspectorPage() {
       }
       try {
         const data = JSON.parse(event.data);
-        if (data.answer) {
-          botMessage = data.answer;
+        if (data.delta || data.answer) {
+          botMessage = data.answer ?? botMessage + data.delta;
           setChatHistory(prev => [...prev.slice(0, -1), userMessage, { sender: 'bot', text: botMessage }]);
         }
       } catch (e) {